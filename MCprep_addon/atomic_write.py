@@ -0,0 +1,49 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Writing cache and data files atomically, via a temporary file which then
+replaces the target, so readers never see a partially written file.
+"""
+
+import json
+import os
+
+
+def write_bytes(path, data):
+	"""Write bytes to a file, creating its folder if needed.
+
+	Raises OSError if the file can't be written, leaving any old file as is.
+	"""
+	folder = os.path.dirname(path)
+	if folder and not os.path.isdir(folder):
+		os.makedirs(folder)
+	tmp_path = path + ".tmp"
+	try:
+		with open(tmp_path, 'wb') as fd:
+			fd.write(data)
+		os.replace(tmp_path, path)
+	except OSError:
+		if os.path.isfile(tmp_path):
+			os.remove(tmp_path)
+		raise
+
+
+def write_json(path, data):
+	"""Write json compatible data to a file, see write_bytes."""
+	write_bytes(path, json.dumps(data).encode("utf-8"))
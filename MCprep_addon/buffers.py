@@ -0,0 +1,52 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Zeroed flat buffers for reading and writing blender data in bulk.
+
+Buffers are filled with foreach_get and written back with foreach_set, as
+NumPy arrays when available, falling back to the array module otherwise.
+"""
+
+import array
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+def float_buffer(count):
+	"""Returns a zeroed flat float buffer that foreach_get can fill."""
+	if numpy is not None:
+		return numpy.zeros(count, dtype=numpy.float32)
+	return array.array('f', bytes(4 * count))
+
+
+def int_buffer(count):
+	"""Returns a zeroed flat int buffer that foreach_get can fill."""
+	if numpy is not None:
+		return numpy.zeros(count, dtype=numpy.int32)
+	return array.array('i', bytes(4 * count))
+
+
+def bool_buffer(count):
+	"""Returns a zeroed flat buffer for boolean properties like select."""
+	if numpy is not None:
+		return numpy.zeros(count, dtype=bool)
+	return array.array('b', bytes(count))
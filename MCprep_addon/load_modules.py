@@ -20,13 +20,19 @@
 import importlib
 
 if "bpy" in locals():
+	importlib.reload(atomic_write)
+	importlib.reload(buffers)
 	importlib.reload(conf)
 	importlib.reload(tracking)
 	importlib.reload(util_operators)
 	importlib.reload(prep)
 	importlib.reload(skin)
+	importlib.reload(sequence_frames)
+	importlib.reload(frame_cache)
 	importlib.reload(sequences)
 	importlib.reload(spawn_util)
+	importlib.reload(meshswap_engine)
+	importlib.reload(meshswap_manifest)
 	importlib.reload(meshswap)
 	importlib.reload(mobs)
 	importlib.reload(world_tools)
@@ -37,6 +43,11 @@ if "bpy" in locals():
 	importlib.reload(tracking)
 	importlib.reload(addon_updater)
 	importlib.reload(addon_updater_ops)
+	importlib.reload(canon_index)
+	importlib.reload(texturepack_index)
+	importlib.reload(image_stats)
+	importlib.reload(uv_tools)
+	importlib.reload(prep_engine)
 	importlib.reload(generate)
 
 	conf.log("Reload, verbose is enabled")
@@ -44,6 +55,8 @@ if "bpy" in locals():
 else:
 	import bpy
 	from . import (
+		atomic_write,
+		buffers,
 		conf,
 		tracking,
 		mcprep_ui,
@@ -58,12 +71,21 @@ else:
 	from .materials import(
 		prep,
 		skin,
+		sequence_frames,
+		frame_cache,
 		sequences,
+		canon_index,
+		texturepack_index,
+		image_stats,
+		uv_tools,
+		prep_engine,
 		generate
 		)
 	from .spawner import(
 		spawn_util,
 		mobs,
+		meshswap_engine,
+		meshswap_manifest,
 		meshswap,
 		item
 		)
@@ -0,0 +1,154 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Lookup structures precompiled from the mcprep_data.json block data.
+"""
+
+import collections
+import re
+
+
+# Mapping keys of the json in order of lookup priority, with the form each
+# mapping indicates.
+MAPPING_KEYS = (
+	("block_mapping_mc", "mc"),
+	("block_mapping_jmc", "jmc2obj"),
+	("block_mapping_mineways", "mineways"))
+
+# Json block lists which canonical names are classified against.
+BLOCK_LISTS = ("reflective", "water", "solid", "emit", "desaturated",
+	"animated", "metallic")
+
+
+class canonical_resolver():
+	"""Resolves material names to canonical names, built once per json load.
+
+	The mc, jmc2obj and Mineways mappings are merged into a single table of
+	generalized name -> (canon, form), where the mc mapping wins over jmc2obj
+	which wins over Mineways, same as looking each up in turn. Raw datablock
+	names are further held in an LRU, so repeat calls skip generalizing.
+	"""
+
+	def __init__(self, json_data, generalize, lru_size=4096):
+		"""Build the merged table.
+
+		Args:
+			json_data: the loaded mcprep json dict, kept to detect reloads
+			generalize: function to get the base name of a datablock name
+			lru_size: max number of raw names to remember
+		"""
+		self.source = json_data
+		self.generalize = generalize
+		self.lru_size = lru_size
+		self.table = {}
+		self._lru = collections.OrderedDict()
+
+		blocks = json_data.get("blocks") if json_data else None
+		self.valid = bool(blocks) and all(
+			key in blocks for key, _ in MAPPING_KEYS)
+		if not self.valid:
+			return
+
+		# insert lowest priority first, so higher priority overwrites
+		for key, form in reversed(MAPPING_KEYS):
+			mapping = blocks[key]
+			for name in mapping:
+				self.table[name] = (mapping[name], form)
+
+	def resolve(self, name):
+		"""Returns canonical name and form (mc, jmc2obj, mineways, or None)."""
+		res = self._lru.get(name)
+		if res is not None:
+			self._lru.move_to_end(name)
+			return res
+
+		general_name = self.generalize(name)
+		res = self.table.get(general_name)
+		if res is None:
+			res = (general_name, None)
+
+		self._lru[name] = res
+		if len(self._lru) > self.lru_size:
+			self._lru.popitem(last=False)
+		return res
+
+	def resolve_many(self, names):
+		"""Batch resolve, returns list of (canon, form) in order of input."""
+		return [self.resolve(name) for name in names]
+
+
+class block_list_matcher():
+	"""Precompiled membership test of canonical names in the json block lists.
+
+	Each list is compiled once per json load into a set of exact names plus a
+	single regex of the wildcard entries. An entry matches any name containing
+	all of its fragments in order, so "wool_*" or "*_ore" match names
+	containing "wool_" or "_ore" as the original checklist did, while an entry
+	such as "stained_*_pane" needs both fragments. Answers are cached per
+	canonical name for all lists.
+	"""
+
+	def __init__(self, json_data):
+		self.source = json_data
+		self.lists = {}  # list name: (set of exact names, regex or None)
+		self._cache = {}
+
+		blocks = json_data.get("blocks") if json_data else None
+		if not blocks:
+			return
+		for list_name in BLOCK_LISTS:
+			if list_name not in blocks:
+				continue
+			exact = set(blocks[list_name])
+			wildcards = set()
+			for name in exact:
+				if '*' not in name:
+					continue
+				parts = [re.escape(part) for part in name.split('*') if part]
+				if parts:
+					wildcards.add(".*".join(parts))
+			pattern = None
+			if wildcards:
+				# longest first, so the alternation reads deterministically
+				pattern = re.compile("|".join(
+					"(?:{})".format(exp) for exp in sorted(
+						wildcards, key=lambda exp: (-len(exp), exp))))
+			self.lists[list_name] = (exact, pattern)
+
+	def has_list(self, list_name):
+		return list_name in self.lists
+
+	def classify(self, canon):
+		"""Returns frozenset of all list names the canonical name belongs to."""
+		if not canon:
+			return frozenset()
+		res = self._cache.get(canon)
+		if res is not None:
+			return res
+		members = []
+		for list_name, (exact, pattern) in self.lists.items():
+			if canon in exact or (pattern and pattern.search(canon)):
+				members.append(list_name)
+		res = frozenset(members)
+		self._cache[canon] = res
+		return res
+
+	def check(self, canon, list_name):
+		"""Returns whether the canonical name is part of the given list."""
+		return list_name in self.classify(canon)
@@ -0,0 +1,292 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Content addressed cache of exported animated texture frames.
+
+Frames are keyed by the hash of the tiled source image's content and its
+.mcmeta animation settings, so each unique animation is exported once into
+the user cache folder and shared by all blend files and resource packs.
+Projects get hard links to the distinct cached frames (copies where linking
+is not possible), and a stamp of the key and frame timing next to them,
+which tells whether frames already in a project folder are still current.
+The least recently used animations are evicted once the cache exceeds its
+size limit.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+from .. import atomic_write
+
+
+# Bump to invalidate all cached frames, e.g. if the frame export changes
+CACHE_VERSION = 2
+INDEX_FILENAME = "frames.json"
+STAMP_SUFFIX = ".frames.json"
+
+# Cache size above which least recently used animations are evicted
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+# path: [(mtime, size), md5 hex digest]
+_hashes = {}
+
+# cache_dir: frame_cache
+_caches = {}
+
+
+def source_hash(path):
+	"""md5 of a file's content, re-read only when its mtime or size change."""
+	try:
+		stat = os.stat(path)
+	except OSError:
+		return None
+	key = [stat.st_mtime, stat.st_size]
+	known = _hashes.get(path)
+	if known and known[0] == key:
+		return known[1]
+	md5 = hashlib.md5()
+	with open(path, 'rb') as fd:
+		for chunk in iter(lambda: fd.read(1 << 20), b""):
+			md5.update(chunk)
+	_hashes[path] = [key, md5.hexdigest()]
+	return md5.hexdigest()
+
+
+def cache_key(path, animation):
+	"""Key of the frames of a tiled image with its .mcmeta animation settings.
+
+	Returns None if the image can't be read.
+	"""
+	digest = source_hash(path)
+	if digest is None:
+		return None
+	data = json.dumps([CACHE_VERSION, digest, animation], sort_keys=True)
+	return hashlib.md5(data.encode("utf-8")).hexdigest()
+
+
+def sequence_files(folder, basename):
+	"""Sorted frame file names of basename in a folder, e.g. lava_0001.png."""
+	if not os.path.isdir(folder):
+		return []
+	exp = re.compile(r"^" + re.escape(basename) + r"_[0-9]{1,5}[.](png|jpg|jpeg)$", re.I)
+	return sorted(name for name in os.listdir(folder)
+		if exp.match(name) and os.path.isfile(os.path.join(folder, name)))
+
+
+def read_stamp(folder, basename):
+	"""Stamp of the frames of basename in a project folder, None if unknown.
+
+	Returns dict of the "key" the frames were exported with, and the frame
+	index shown at each game tick as "ticks".
+	"""
+	try:
+		with open(os.path.join(folder, basename + STAMP_SUFFIX), 'r') as fd:
+			data = json.load(fd)
+	except (OSError, ValueError):
+		return None
+	if data.get("frames") != sequence_files(folder, basename):
+		return None  # frames since removed or added
+	return data
+
+
+def write_stamp(folder, basename, key, ticks=None):
+	"""Record the key and per tick frame indices of basename's frames."""
+	atomic_write.write_json(os.path.join(folder, basename + STAMP_SUFFIX), {
+		"key": key, "frames": sequence_files(folder, basename), "ticks": ticks})
+
+
+def remove_frames(folder, basename):
+	"""Remove the frames and stamp of basename from a project folder."""
+	for name in sequence_files(folder, basename) + [basename + STAMP_SUFFIX]:
+		path = os.path.join(folder, name)
+		if os.path.isfile(path):
+			os.remove(path)
+
+
+def link_frames(frames, folder, basename):
+	"""Hard link cached frames into a folder as a sequence named basename.
+
+	Copies instead where hard links are not possible, e.g. across drives.
+	Returns the list of paths in the folder.
+	"""
+	paths = []
+	for ind, src in enumerate(frames):
+		ext = os.path.splitext(src)[1]
+		dst = os.path.join(folder, "{}_{}{}".format(
+			basename, str(ind + 1).zfill(4), ext))
+		if os.path.isfile(dst):
+			if os.path.samefile(src, dst):
+				paths.append(dst)
+				continue
+			os.remove(dst)
+		try:
+			os.link(src, dst)
+		except (OSError, AttributeError, NotImplementedError):
+			shutil.copyfile(src, dst)
+		paths.append(dst)
+	return paths
+
+
+class frame_cache():
+	"""Exported frames per animation key, with size based LRU eviction."""
+
+	def __init__(self, cache_dir, max_bytes=MAX_CACHE_BYTES):
+		self.cache_dir = cache_dir
+		self.max_bytes = max_bytes
+		# key: {"frames": [names], "ticks": [name per tick], "bytes", "used"}
+		self.entries = {}
+		self.loaded = False
+
+	def index_file(self):
+		return os.path.join(self.cache_dir, INDEX_FILENAME)
+
+	def entry_dir(self, key):
+		return os.path.join(self.cache_dir, key)
+
+	def load(self):
+		"""Load the index of cached animations, once."""
+		if self.loaded:
+			return
+		self.loaded = True
+		try:
+			with open(self.index_file(), 'r') as fd:
+				data = json.load(fd)
+		except (OSError, ValueError):
+			return
+		if data.get("version") == CACHE_VERSION:
+			self.entries = data.get("entries", {})
+
+	def save(self):
+		"""Write the index, atomically replacing any old one."""
+		data = {"version": CACHE_VERSION, "entries": self.entries}
+		try:
+			atomic_write.write_json(self.index_file(), data)
+		except OSError:
+			return False
+		return True
+
+	def total_bytes(self):
+		self.load()
+		return sum(entry["bytes"] for entry in self.entries.values())
+
+	def get(self, key):
+		"""Paths of the cached frame of each tick of key's animation.
+
+		Returns None if not (fully) cached, else marks the entry as recently
+		used.
+		"""
+		self.load()
+		entry = self.entries.get(key)
+		if not entry:
+			return None
+		folder = self.entry_dir(key)
+		paths = [os.path.join(folder, name) for name in entry["frames"]]
+		if not paths or not all(os.path.isfile(path) for path in paths):
+			self.discard(key)
+			return None
+		entry["used"] = time.time()
+		self.save()
+		return [os.path.join(folder, name)
+			for name in entry.get("ticks") or entry["frames"]]
+
+	def new_entry_dir(self, key):
+		"""Empty temporary folder to export the frames of key into."""
+		folder = self.entry_dir(key) + ".tmp"
+		if os.path.isdir(folder):
+			shutil.rmtree(folder)
+		os.makedirs(folder)
+		return folder
+
+	def commit(self, key, folder, ticks=None):
+		"""Move frames exported into new_entry_dir into the cache.
+
+		Args:
+			key: the animation's cache key
+			folder: the folder from new_entry_dir, with the distinct frames
+			ticks: frame file name per game tick, default each file once
+		Returns the cached frame path per tick, after evicting older
+		animations if the cache is over its size limit.
+		"""
+		self.load()
+		target = self.entry_dir(key)
+		if os.path.isdir(target):
+			shutil.rmtree(target)
+		os.rename(folder, target)
+		names = sorted(os.listdir(target))
+		ticks = list(ticks) if ticks else names
+		self.entries[key] = {
+			"frames": names,
+			"ticks": ticks,
+			"bytes": sum(os.path.getsize(os.path.join(target, name))
+				for name in names),
+			"used": time.time()}
+		self.evict(keep=key)
+		self.save()
+		return [os.path.join(target, name) for name in ticks]
+
+	def _remove(self, key):
+		self.entries.pop(key, None)
+		for folder in (self.entry_dir(key), self.entry_dir(key) + ".tmp"):
+			if os.path.isdir(folder):
+				shutil.rmtree(folder, ignore_errors=True)
+
+	def discard(self, key):
+		"""Remove an animation's frames from the cache."""
+		self.load()
+		self._remove(key)
+		self.save()
+
+	def evict(self, keep=None):
+		"""Remove least recently used animations until within max_bytes.
+
+		Frames hard linked into projects stay valid, as links keep the data.
+		Returns the list of evicted keys.
+		"""
+		self.load()
+		total = self.total_bytes()
+		evicted = []
+		for key in sorted(self.entries, key=lambda key: self.entries[key]["used"]):
+			if total <= self.max_bytes:
+				break
+			if key == keep:
+				continue
+			total -= self.entries[key]["bytes"]
+			self._remove(key)
+			evicted.append(key)
+		return evicted
+
+
+def get_cache(cache_dir, max_bytes=MAX_CACHE_BYTES):
+	"""Returns the shared frame cache for the given folder."""
+	cache = _caches.get(cache_dir)
+	if cache is None:
+		cache = frame_cache(cache_dir, max_bytes)
+		_caches[cache_dir] = cache
+	cache.max_bytes = max_bytes
+	return cache
+
+
+def clear_caches():
+	"""Forget the in memory caches and hashes."""
+	_caches.clear()
+	_hashes.clear()
@@ -19,8 +19,17 @@
 import os
 import bpy
 
+from .. import buffers
 from .. import conf
 from .. import util
+from . import canon_index
+from . import image_stats
+from . import texturepack_index
+
+# Built from conf.json_data on first use, see get_canonical_resolver
+# and get_block_list_matcher
+_canon_resolver = None
+_list_matcher = None
 
 
 # -----------------------------------------------------------------------------
@@ -33,39 +42,50 @@ def update_mcprep_texturepack_path(self, context):
 	bpy.ops.mcprep.reload_items()
 
 
+def get_canonical_resolver():
+	"""Returns the canonical name resolver for the loaded json data.
+
+	Lazy loads the json if needed, and rebuilds the resolver whenever the json
+	data has been reloaded or updated since the resolver was last built.
+	"""
+	global _canon_resolver
+	if not conf.json_data:
+		util.load_mcprep_json()
+	if _canon_resolver is None or _canon_resolver.source is not conf.json_data:
+		_canon_resolver = canon_index.canonical_resolver(
+			conf.json_data, util.nameGeneralize)
+		if not _canon_resolver.valid:
+			conf.log("Missing key values in json")
+	return _canon_resolver
+
+
 def get_mc_canonical_name(name):
 	"""Convert a material name to standard MC name.
 
 	Returns: canonical name, and form (mc, jmc, or mineways)
 	"""
-	general_name = util.nameGeneralize(name)
-	if not conf.json_data:
-		res = util.load_mcprep_json()
-		if not res:
-			return general_name, None
-	if ("blocks" not in conf.json_data
-			or "block_mapping_mc" not in conf.json_data["blocks"]
-			or "block_mapping_jmc" not in conf.json_data["blocks"]
-			or "block_mapping_mineways" not in conf.json_data["blocks"]):
-		conf.log("Missing key values in json")
-		return general_name, None
-	if general_name in conf.json_data["blocks"]["block_mapping_mc"]:
-		canon = conf.json_data["blocks"]["block_mapping_mc"][general_name]
-		form = "mc"
-	elif general_name in conf.json_data["blocks"]["block_mapping_jmc"]:
-		canon = conf.json_data["blocks"]["block_mapping_jmc"][general_name]
-		form = "jmc2obj"
-	elif general_name in conf.json_data["blocks"]["block_mapping_mineways"]:
-		canon = conf.json_data["blocks"]["block_mapping_mineways"][general_name]
-		form = "mineways"
-	else:
-		conf.log("Canonical name not matched: "+general_name, True)
-		canon = general_name
-		form = None
-
+	canon, form = get_canonical_resolver().resolve(name)
+	if form is None:
+		conf.log("Canonical name not matched: "+canon, True)
 	return canon, form
 
 
+def get_texturepack_index(resource_folder=None, refresh=False):
+	"""Returns the file index of a resource pack, default the scene's pack.
+
+	The index is persisted in the user cache folder, and only directories
+	changed since the last scan are re-read. Returns None if the folder does
+	not exist.
+	"""
+	if not resource_folder:
+		# default to internal pack
+		resource_folder = bpy.context.scene.mcprep_texturepack_path
+	return texturepack_index.get_index(
+		resource_folder,
+		cache_dir=lambda: util.get_cache_dir("texturepacks"),
+		refresh=refresh)
+
+
 def find_from_texturepack(blockname, resource_folder=None):
 	"""Given a blockname (and resource folder), find image filepath.
 
@@ -73,65 +93,15 @@ def find_from_texturepack(blockname, resource_folder=None):
 	the input folder or default resource folder could target at any of the
 	following sublevels above the <subfolder> level.
 	//pack_name/assets/minecraft/textures/<subfolder>/<blockname.png>
-	"""
-	if not resource_folder:
-		# default to internal pack
-		resource_folder = bpy.context.scene.mcprep_texturepack_path
 
-	if not os.path.isdir(resource_folder):
+	Answered from the pack's file index, see texturepack_index.find for the
+	search order.
+	"""
+	index = get_texturepack_index(resource_folder)
+	if index is None:
 		conf.log("Error, resource folder does not exist")
 		return
-	elif os.path.isdir(os.path.join(resource_folder,"textures")):
-		resource_folder = os.path.join(resource_folder,"textures")
-	elif os.path.isdir(os.path.join(resource_folder,"minecraft","textures")):
-		resource_folder = os.path.join(resource_folder,"minecraft","textures")
-	elif os.path.isdir(os.path.join(resource_folder,"assets","minecraft","textures")):
-		resource_folder = os.path.join(resource_folder,"assets","minecraft","textures")
-
-	# if conf.vv:print("\tFinal resource folder/subfolder checking:",resource_folder)
-
-	search_paths = [resource_folder,
-					os.path.join(resource_folder,"blocks"),
-					os.path.join(resource_folder,"block"),
-					os.path.join(resource_folder,"items"),
-					os.path.join(resource_folder,"item"),
-					os.path.join(resource_folder,"entity"),
-					os.path.join(resource_folder,"models"),
-					os.path.join(resource_folder,"model"),
-					]
-	res = None
-
-	# first see if subpath included is found, prioritize use of that
-	extensions = [".png",".jpg",".jpeg"]
-	if "/" in blockname:
-		newpath = blockname.replace("/", os.path.sep)
-		for ext in extensions:
-			if os.path.isfile(os.path.join(resource_folder,newpath+ext)):
-				res = os.path.join(resource_folder,newpath+ext)
-				return res
-		newpath = os.path.basename(blockname) # case where goes into other subpaths
-		for ext in extensions:
-			if os.path.isfile(os.path.join(resource_folder,newpath+ext)):
-				res = os.path.join(resource_folder,newpath+ext)
-				return res
-
-	# fallback (more common case), wide-search for
-	for path in search_paths:
-		if not os.path.isdir(path):
-			continue
-		for ext in extensions:
-			if os.path.isfile(os.path.join(path, blockname+ext)):
-				res = os.path.join(path, blockname+ext)
-				return res
-	# Mineways fallback
-	for suffix in ["-Alpha", "-RGB", "-RGBA"]:
-		if blockname.endswith(suffix):
-			res = os.path.join(resource_folder,"mineways_assets",
-								"mineways"+suffix+".png")
-			if os.path.isfile(res):
-				return res
-
-	return res
+	return index.find(blockname)
 
 
 def detect_form(materials):
@@ -143,11 +113,8 @@ def detect_form(materials):
 	jmc2obj = 0
 	mc = 0
 	mineways = 0
-	for mat in materials:
-		if not mat:
-			continue
-		name = util.nameGeneralize(mat.name)
-		_, form = get_mc_canonical_name(name)
+	names = [util.nameGeneralize(mat.name) for mat in materials if mat]
+	for _, form in get_canonical_resolver().resolve_many(names):
 		if form == "jmc2obj":
 			jmc2obj+=1
 		elif form == "mineways":
@@ -174,24 +141,32 @@ def detect_form(materials):
 	return res  # one of jmc2obj, mineways, or None
 
 
+def get_block_list_matcher():
+	"""Returns the json block list matcher, rebuilt if the json was reloaded."""
+	global _list_matcher
+	if not conf.json_data:
+		util.load_mcprep_json()
+	if _list_matcher is None or _list_matcher.source is not conf.json_data:
+		_list_matcher = canon_index.block_list_matcher(conf.json_data)
+	return _list_matcher
+
+
+def classify(canon):
+	"""Returns the set of all json block lists a canonical name is part of.
+
+	Lets material generators check e.g. solid, emit and reflective in one
+	pass, instead of one checklist call per list.
+	"""
+	return get_block_list_matcher().classify(canon)
+
+
 def checklist(matName, listName):
 	"""Helper to expand single wildcard within generalized material names"""
-	if not conf.json_data:
-		conf.log("No json_data for checklist to call from!")
-	if not "blocks" in conf.json_data or not listName in conf.json_data["blocks"]:
+	matcher = get_block_list_matcher()
+	if not matcher.has_list(listName):
 		conf.log("conf.json_data is missing blocks or listName "+str(listName))
 		return False
-	if matName in conf.json_data["blocks"][listName]:
-		return True
-	for name in conf.json_data["blocks"][listName]:
-		if not '*' in name:
-			continue
-		x = name.split('*')
-		if x[0] != '' and x[0] in matName:
-			return True
-		elif x[1] != '' and x[1] in matName:
-			return True
-	return False
+	return matcher.check(matName, listName)
 
 
 def matprep_internal(mat, passes, use_reflections, only_solid):
@@ -249,6 +224,7 @@ def matprep_internal(mat, passes, use_reflections, only_solid):
 
 	# strip out the .00#
 	canon, _ = get_mc_canonical_name(util.nameGeneralize(mat.name))
+	block_lists = classify(canon)
 	mat.use_nodes = False
 
 	mat.use_transparent_shadows = True #all materials receive trans
@@ -259,7 +235,7 @@ def matprep_internal(mat, passes, use_reflections, only_solid):
 	mat.texture_slots[diff_layer].use_map_color_diffuse = True
 	mat.texture_slots[diff_layer].diffuse_color_factor = 1
 
-	if only_solid is False and not checklist(canon, "solid"): # alpha default on
+	if only_solid is False and "solid" not in block_lists: # alpha default on
 		bpy.data.textures[newName].use_alpha = True
 		mat.texture_slots[diff_layer].use_map_alpha = True
 		mat.use_transparency = True
@@ -269,7 +245,7 @@ def matprep_internal(mat, passes, use_reflections, only_solid):
 			if index:
 				mat.texture_slots[index].use_map_alpha = False
 
-	if use_reflections and checklist(canon, "reflective"):
+	if use_reflections and "reflective" in block_lists:
 		mat.alpha = 0
 		mat.raytrace_mirror.use = True
 		mat.raytrace_mirror.reflect_factor = 0.15
@@ -277,10 +253,10 @@ def matprep_internal(mat, passes, use_reflections, only_solid):
 		mat.raytrace_mirror.use = False
 		mat.alpha = 0
 
-	mat.emit = 1 if checklist(canon, "emit") else 0
+	mat.emit = 1 if "emit" in block_lists else 0
 
 	# cycle through and see if the layer exists to enable/disable blend
-	if not checklist(canon, "desaturated"):
+	if "desaturated" not in block_lists:
 		pass
 	else:
 		diff_img = mat.texture_slots[diff_layer].texture.image
@@ -332,7 +308,8 @@ def matprep_cycles(mat, passes, use_reflections, use_principled, only_solid):
 
 	matGen = util.nameGeneralize(mat.name)
 	canon, form = get_mc_canonical_name(matGen)
-	if checklist(canon, "emit"):
+	block_lists = classify(canon)
+	if "emit" in block_lists:
 		res = matgen_cycles_emit(mat, passes)
 	elif use_principled and hasattr(bpy.types, 'ShaderNodeBsdfPrincipled'):
 		res = matgen_cycles_principled(mat, passes, use_reflections, only_solid)
@@ -398,7 +375,8 @@ def set_cycles_texture(image, material, extra_passes=False):
 	is_grayscale = False
 
 	canon, _ = get_mc_canonical_name(util.nameGeneralize(material.name))
-	if checklist(canon, "desaturated"):
+	block_lists = classify(canon)
+	if "desaturated" in block_lists:
 		is_grayscale = is_image_grayscale(image)
 
 	for node in material.node_tree.nodes:
@@ -460,6 +438,12 @@ def set_cycles_texture(image, material, extra_passes=False):
 
 		changed = True
 
+	# template materials only use the normal image while linked into the group
+	if "MCPREP_template" in material:
+		roles = get_template_nodes(material)
+		if "normal" in roles and "shader" in roles:
+			set_template_normal_link(material, roles, "normal" in img_sets)
+
 	return changed
 
 
@@ -471,9 +455,10 @@ def set_internal_texture(image, material, extra_passes=False):
 
 	# check if there is more data to see pass types
 	canon, _ = get_mc_canonical_name(util.nameGeneralize(material.name))
+	block_lists = classify(canon)
 
 	is_grayscale = False
-	if checklist(canon, "desaturated"):
+	if "desaturated" in block_lists:
 		is_grayscale = is_image_grayscale(image)
 
 	img_sets = {}
@@ -561,7 +546,7 @@ def set_internal_texture(image, material, extra_passes=False):
 		elif "saturate" in img_sets:
 			img_sets.pop("saturate")
 			print("Running saturate")
-			if not checklist(canon, "desaturated"):
+			if "desaturated" not in block_lists:
 				continue
 			if tex and tex.name+"_saturate" in bpy.data.textures:
 				new_tex = bpy.data.textures[tex.name+"_saturate"]
@@ -681,40 +666,30 @@ def get_textures(material):
 
 
 def find_additional_passes(image_file):
-	"""Find relevant passes like normal and spec in same folder as image."""
+	"""Find relevant passes like normal and spec in same folder as image.
+
+	See texturepack_index.get_pass_map for the suffixes of each pass type.
+	"""
 	abs_img_file = bpy.path.abspath(image_file)
 	if conf.vv:
 		print("\tFind additional passes for: "+image_file)
-	if not os.path.isfile(abs_img_file):
+	index = texturepack_index.get_index_for_path(abs_img_file)
+	exists = index.contains_file(abs_img_file) if index else None
+	if exists is None:
+		exists = os.path.isfile(abs_img_file)
+	if not exists:
 		return {}
 
 	img_dir = os.path.dirname(abs_img_file)
 	img_base = os.path.basename(abs_img_file)
 	base_name = os.path.splitext(img_base)[0] # remove extension
 
-	# valid extentsions and ending names for pass types
-	exts = [".png",".jpg",".jpeg",".tiff"]
-	normal = [" n","_n","-n","normal","norm","nrm","normals"]
-	spec = [" s","_s","-s","specular","spec"]
-	disp = [" d","_d","-d","displace","disp","bump"," b","_b","-b"]
+	# map of pass files per folder, shared by all materials until the
+	# folder's mtime changes
+	passes = texturepack_index.get_pass_map(img_dir)
 	res = {"diffuse":image_file}
-
-	# find lowercase base name matching with valid extentions
-	filtered_files = [f for f in os.listdir(img_dir)
-					if os.path.isfile(os.path.join(img_dir,f)) and
-					f.lower().startswith(base_name.lower()) and
-					os.path.splitext(f)[-1].lower() in exts
-					]
-	for filtered in filtered_files:
-		for npass in normal:
-			if os.path.splitext(filtered)[0].lower().endswith(npass):
-				res["normal"]=os.path.join(img_dir,filtered)
-		for spass in spec:
-			if os.path.splitext(filtered)[0].lower().endswith(spass):
-				res["specular"]=os.path.join(img_dir,filtered)
-		for dpass in disp:
-			if os.path.splitext(filtered)[0].lower().endswith(dpass):
-				res["displace"]=os.path.join(img_dir,filtered)
+	if passes:
+		res.update(passes.find(base_name))
 	return res
 
 
@@ -759,34 +734,99 @@ def replace_missing_texture(image):
 	return True  # updated image block
 
 
-def is_image_grayscale(image):
-	"""Returns true if image data is all grayscale, false otherwise"""
-	if not image:
-		return None
-	conf.log("Checking image for grayscale "+image.name, vv_only=True)
+def get_image_stats_cache():
+	"""Returns the persistent cache of image analysis results."""
+	return image_stats.get_cache(util.get_cache_dir("images"))
+
+
+def read_image_pixels(image):
+	"""Read all pixels of an image at once into a flat float buffer."""
+	if not hasattr(image.pixels, "foreach_get"):
+		# blender 2.82 and below, slicing is still a single bulk read
+		return image.pixels[:]
+	pixels = buffers.float_buffer(len(image.pixels))
+	image.pixels.foreach_get(pixels)
+	return pixels
+
+
+def _image_file_key(image):
+	"""Returns (path, (mtime, size)) of an unmodified image file, else None.
+
+	Only then does the on-disk cache apply; packed, generated or edited
+	images are analyzed from their pixels each session.
+	"""
+	if image.source != 'FILE' or image.packed_file or image.is_dirty:
+		return None, None
+	path = bpy.path.abspath(image.filepath, library=image.library)
+	if not path:
+		return None, None
+	path = os.path.normpath(path)
+	return path, image_stats.file_key(path)
+
+
+def _classify_grayscale(image, cache):
+	"""Check image for grayscale, without saving the on-disk cache."""
 	if 'grayscale' in image: # cache
 		return image['grayscale']
+
+	path, key = _image_file_key(image)
+	res = cache.get(path, key, "grayscale")
+	if res is not None:
+		conf.log("Grayscale from cache: "+image.name, vv_only=True)
+		image['grayscale'] = res
+		return res
+
 	if not image.pixels:
 		conf.log("Not an image / no pixels", vv_only=True)
 		return None
 
-	# setup sampling to limit number of processed pixels
-	max_samples = 1000 #
-	pxl_count = len(image.pixels)/image.channels
-	interval = int(pxl_count/max_samples) if pxl_count>max_samples else 1
-
-	# Strict way: find any pixels where rgb values are not the same (non gray)
-	for ind in range(int(pxl_count))[::interval]:
-		ind = ind*image.channels
-		if (image.pixels[ind] != image.pixels[ind+1] or
-				image.pixels[ind+1] != image.pixels[ind+2] or
-				image.pixels[ind] != image.pixels[ind+2]):
-			image['grayscale'] = False
-			conf.log("Image not grayscale: "+image.name, vv_only=True)
-			return False
-	image['grayscale'] = True # set cache
-	conf.log("Image is grayscale: "+image.name, vv_only=True)
-	return True
+	res = image_stats.is_grayscale_buffer(
+		read_image_pixels(image), image.channels)
+	if res is None:
+		return None
+	image['grayscale'] = res # set cache
+	cache.set(path, key, "grayscale", res)
+	conf.log("Image is {}grayscale: {}".format(
+		"" if res else "not ", image.name), vv_only=True)
+	return res
+
+
+def is_image_grayscale(image):
+	"""Returns true if image data is all grayscale, false otherwise
+
+	Results are cached on the image and on disk per file, see image_stats.
+	"""
+	if not image:
+		return None
+	conf.log("Checking image for grayscale "+image.name, vv_only=True)
+	cache = get_image_stats_cache()
+	res = _classify_grayscale(image, cache)
+	cache.save()
+	return res
+
+
+def classify_grayscale_images(materials, passes=("diffuse",)):
+	"""Check all images of the given passes of materials in one go.
+
+	Each unique image is analyzed once and the on-disk cache written once.
+	Returns dict of image name: True, False, or None if not an image.
+	"""
+	images = {}
+	for mat in materials:
+		if not mat:
+			continue
+		textures = get_textures(mat)
+		for pass_name in passes:
+			image = textures.get(pass_name)
+			if image:
+				images[image.as_pointer()] = image
+
+	cache = get_image_stats_cache()
+	res = {}
+	for image in images.values():
+		res[image.name] = _classify_grayscale(image, cache)
+	cache.save()
+	return res
 
 
 def set_saturation_material(mat):
@@ -795,7 +835,8 @@ def set_saturation_material(mat):
 		return
 
 	canon, _ = get_mc_canonical_name(mat.name)
-	if not checklist(canon, "desaturated"):
+	block_lists = classify(canon)
+	if "desaturated" not in block_lists:
 		conf.log("debug: not eligible for saturation", vv_only=True)
 		return
 
@@ -882,7 +923,8 @@ def copy_texture_animation_pass_settings(mat):
 		animated_data[passname] = {
 			"frame_duration": node.image_user.frame_duration,
 			"frame_start": node.image_user.frame_start,
-			"frame_offset": node.image_user.frame_offset
+			"frame_offset": node.image_user.frame_offset,
+			"offset_keyframes": get_offset_keyframes(node)
 		}
 	return animated_data
 
@@ -915,328 +957,421 @@ def apply_texture_animation_pass_settings(mat, animated_data):
 		anim_node.image_user.frame_offset = animated_data[itm]["frame_offset"]
 		anim_node.image_user.use_auto_refresh = True
 		anim_node.image_user.use_cyclic = True
+		if animated_data[itm].get("offset_keyframes"):
+			set_offset_keyframes(anim_node, animated_data[itm]["offset_keyframes"])
+
+
+def _offset_fcurve(node, create=False):
+	"""The fcurve animating a node's (or texture's) image user frame offset."""
+	owner = node.id_data
+	path = node.image_user.path_from_id("frame_offset")
+	anim = owner.animation_data
+	if anim and anim.action:
+		for fcurve in anim.action.fcurves:
+			if fcurve.data_path == path:
+				return fcurve
+	if not create:
+		return None
+	node.image_user.keyframe_insert("frame_offset", frame=1)
+	return _offset_fcurve(node)
 
 
-def matgen_cycles_principled(mat, passes, use_reflections, only_solid):
-	"""Generate principled cycles material, defaults to using transparency."""
+def get_offset_keyframes(node):
+	"""Keyframes of an image user's frame offset, as (frame, offset) pairs."""
+	fcurve = _offset_fcurve(node)
+	if not fcurve:
+		return None
+	return [(point.co[0], point.co[1]) for point in fcurve.keyframe_points]
 
-	matGen = util.nameGeneralize(mat.name)
-	canon, form = get_mc_canonical_name(matGen)
 
-	# get the texture, but will fail if NoneType
-	image_diff = passes["diffuse"]
-	image_norm = passes["normal"]
-	image_spec = passes["specular"]
-	image_disp = None # not used
+def set_offset_keyframes(node, keyframes):
+	"""Key an image user's frame offset, each held until the next and looped.
 
-	if not image_diff:
-		print("Could not find diffuse image, halting generation: "+mat.name)
+	Removes the animation of the offset if keyframes is empty or None.
+	"""
+	fcurve = _offset_fcurve(node, create=bool(keyframes))
+	if not keyframes:
+		if fcurve:
+			node.id_data.animation_data.action.fcurves.remove(fcurve)
 		return
-	elif image_diff.size[0] == 0 or image_diff.size[1] == 0:
-		if image_diff.source != 'SEQUENCE':
-			# Common non animated case; this means the image is missing and would
-			# have already checked for replacement textures by now, so skip
-			return
-		if not os.path.isfile(bpy.path.abspath(image_diff.filepath)):
-			# can't check size or pixels as it often is not immediately avaialble
-			# so instea, check against firs frame of sequence to verify load
-			return
+	points = fcurve.keyframe_points
+	while len(points):
+		points.remove(points[0])
+	points.add(len(keyframes))
+	points.foreach_set("co", [val for key in keyframes for val in key])
+	for point in points:
+		point.interpolation = 'CONSTANT'
+	if not any(mod.type == 'CYCLES' for mod in fcurve.modifiers):
+		fcurve.modifiers.new('CYCLES')
+	fcurve.update()
+
+
+# Bump when the content of template node groups changes, so that groups saved
+# in blend files are rebuilt
+TEMPLATE_VERSION = 1
+
+
+def _template_socket(group, in_out, socket_type, name):
+	"""Add an input or output socket to a node group's interface."""
+	if hasattr(group, "interface"):  # 4.0+
+		return group.interface.new_socket(
+			name, in_out=in_out, socket_type=socket_type)
+	elif in_out == 'INPUT':
+		return group.inputs.new(socket_type, name)
+	return group.outputs.new(socket_type, name)
+
+
+def _clear_template(group):
+	"""Remove all nodes and interface sockets of a node group."""
+	group.nodes.clear()
+	if hasattr(group, "interface"):  # 4.0+
+		group.interface.clear()
+	else:
+		group.inputs.clear()
+		group.outputs.clear()
+
+
+def get_shader_template(variant, flags):
+	"""Returns the shared node group for a shader variant and set of flags.
+
+	Built the first time it is needed, and rebuilt in place if saved by an
+	older TEMPLATE_VERSION so that all materials instancing it update too.
+
+	Args:
+		variant: one of principled, original, or emit
+		flags: any of reflective, water, metallic, solid
+	"""
+	name = " ".join(["MCprep", variant] + sorted(flags))
+	group = bpy.data.node_groups.get(name)
+	if group and (group.library or
+			group.get("MCPREP_template_version") == TEMPLATE_VERSION):
+		return group
+	if group is None:
+		group = bpy.data.node_groups.new(name, 'ShaderNodeTree')
+	else:
+		_clear_template(group)
+	conf.log("Building shader template: "+name, vv_only=True)
+
+	_template_socket(group, 'INPUT', 'NodeSocketColor', "Color")
+	_template_socket(group, 'INPUT', 'NodeSocketFloat', "Alpha")
+	if variant != "emit":
+		_template_socket(group, 'INPUT', 'NodeSocketColor', "Specular")
+		normal = _template_socket(group, 'INPUT', 'NodeSocketColor', "Normal")
+		normal.default_value = (0.5, 0.5, 1.0, 1.0)  # flat, when no normal map
+	_template_socket(group, 'OUTPUT', 'NodeSocketShader', "Shader")
+
+	nodeIn = group.nodes.new('NodeGroupInput')
+	nodeOut = group.nodes.new('NodeGroupOutput')
+	if variant == "principled":
+		_build_template_principled(group, nodeIn, nodeOut, flags)
+	elif variant == "original":
+		_build_template_original(group, nodeIn, nodeOut, flags)
+	else:
+		_build_template_emit(group, nodeIn, nodeOut)
+	group["MCPREP_template_version"] = TEMPLATE_VERSION
+	return group
 
-	mat.use_nodes = True
-	animated_data = copy_texture_animation_pass_settings(mat)
-	nodes = mat.node_tree.nodes
-	links = mat.node_tree.links
-	nodes.clear()
+
+def _build_template_principled(group, nodeIn, nodeOut, flags):
+	"""Shading nodes of the principled material, see get_shader_template."""
+	nodes = group.nodes
+	links = group.links
 
 	principled = nodes.new('ShaderNodeBsdfPrincipled')
-	nodeTrans = nodes.new('ShaderNodeBsdfTransparent')
-	nodeMix1 = nodes.new('ShaderNodeMixShader')
-	nodeTexDiff = nodes.new('ShaderNodeTexImage')
-	nodeTexNorm = nodes.new('ShaderNodeTexImage')
-	nodeTexSpec = nodes.new('ShaderNodeTexImage')
 	nodeSpecInv = nodes.new('ShaderNodeInvert')
-	nodeSaturateMix = nodes.new('ShaderNodeMixRGB')
 	nodeNormal = nodes.new('ShaderNodeNormalMap')
-	nodeOut = nodes.new('ShaderNodeOutputMaterial')
-
-	# set names
-	nodeTexDiff.name = "Diffuse Tex"
-	nodeTexDiff.label = "Diffuse Tex"
-	nodeTexNorm.name = "Normal Tex"
-	nodeTexNorm.label = "Normal Tex"
-	nodeTexSpec.name = "Specular Tex"
-	nodeTexSpec.label = "Specular Tex"
-	nodeSaturateMix.name = "Add Color"
-	nodeSaturateMix.label = "Add Color"
 	nodeSpecInv.label = "Spec Inverse"
 
-	# set location and connect
-	nodeTexDiff.location = (-400,0)
-	nodeTexNorm.location = (-600,-275)
-	nodeSaturateMix.location = (-200,0)
-	nodeTexSpec.location = (-600,0)
+	nodeIn.location = (-600,0)
 	nodeSpecInv.location = (-400,-275)
 	nodeNormal.location = (-400,-425)
 	principled.location = (0,0)
-	nodeTrans.location = (0,100)
-	nodeMix1.location = (300,0)
 	nodeOut.location = (500,0)
-	if util.bv28():
-		nodeTexDiff.location[0] -= 100
-		nodeTexNorm.location[0] -= 200
-		nodeTexSpec.location[0] -= 200
 
-	# default links
-	links.new(nodeTexDiff.outputs["Color"],nodeSaturateMix.inputs[1])
-	links.new(nodeSaturateMix.outputs["Color"],principled.inputs[0])
-	# links.new(nodeTexSpec.outputs["Color"],principled.inputs[5]) # Works better w/ packs
-	links.new(nodeTexSpec.outputs["Color"],nodeSpecInv.inputs[1]) # "proper" way
+	# links.new(nodeIn.outputs["Specular"],principled.inputs[5]) # Works better w/ packs
+	links.new(nodeIn.outputs["Specular"],nodeSpecInv.inputs[1]) # "proper" way
 	links.new(nodeSpecInv.outputs["Color"],principled.inputs[7]) # "proper" way
-	links.new(nodeTexNorm.outputs["Color"],nodeNormal.inputs[1])
+	links.new(nodeIn.outputs["Normal"],nodeNormal.inputs[1])
 	links.new(nodeNormal.outputs["Normal"], principled.inputs["Normal"])
 
-	# TODO: Use alpha socket of princpled node for newer blender versions
-	links.new(nodeTexDiff.outputs["Alpha"],nodeMix1.inputs[0])
-	links.new(nodeTrans.outputs["BSDF"],nodeMix1.inputs[1])
-	links.new(principled.outputs["BSDF"],nodeMix1.inputs[2])
+	principled.inputs[5].default_value = 0.5  # set specular
+	if "reflective" in flags:
+		principled.inputs[7].default_value = 0.0  # roughness, used to be 0.05
+	else:
+		principled.inputs[7].default_value = 0.7  # set roughness
 
-	links.new(nodeMix1.outputs["Shader"],nodeOut.inputs[0])
+	if "water" in flags:
+		principled.inputs[7].default_value = 0.0  # roughness
 
-	# annotate special nodes for finding later, and load images if available
-	nodeTexDiff["MCPREP_diffuse"] = True
-	nodeTexSpec["MCPREP_specular"] = True
-	nodeTexNorm["MCPREP_normal"] = True
-	nodeNormal["MCPREP_normal"] = True # to also be also muted if no normal tex
-	nodeSaturateMix["SATURATE"] = True
-	# nodeTexDisp["MCPREP_disp"] = True
-	nodeTexDiff.image = image_diff
-	if image_spec:
-		nodeTexSpec.image = image_spec
-	else:
-		nodeTexSpec.mute = True
-	if image_norm:
-		nodeTexNorm.image = image_norm
+		# add HSV node for more user control
+		waterHSV = nodes.new('ShaderNodeHueSaturation')
+		waterHSV.location = (-200, -150)
+		links.new(nodeIn.outputs["Color"], waterHSV.inputs[4])
+		links.new(waterHSV.outputs["Color"], principled.inputs[0])
 	else:
-		nodeTexNorm.mute = True
-		nodeNormal.mute = True
-
-	if hasattr(nodeTexDiff, "interpolation"): # 2.72+
-		nodeTexDiff.interpolation = 'Closest'
-		nodeTexSpec.interpolation = 'Closest'
+		links.new(nodeIn.outputs["Color"], principled.inputs[0])
 
-	# Spec update
-	if hasattr(nodeTexSpec, "color_space"): # 2.7 and earlier 2.8 versions
-		nodeTexSpec.color_space = 'NONE'  # for better interpretation of specmaps
-	elif nodeTexSpec.image and hasattr(nodeTexSpec.image, "colorspace_settings"): # later 2.8 versions
-		nodeTexSpec.image.colorspace_settings.name = 'Non-Color'
+	if "metallic" in flags:
+		principled.inputs[4].default_value = 1  # set metallic
+		if principled.inputs[7].default_value < 0.2:  # roughness
+			principled.inputs[7].default_value = 0.2
+	else:
+		principled.inputs[4].default_value = 0  # set dielectric
 
-	# Normal update
-	if hasattr(nodeTexNorm, "color_space"): # 2.7 and earlier 2.8 versions
-		nodeTexNorm.color_space = 'NONE'  # for better interpretation of normals
-	elif nodeTexNorm.image and hasattr(nodeTexNorm.image, "colorspace_settings"):
-		nodeTexNorm.image.colorspace_settings.name = 'Non-Color'
+	if "solid" in flags:
+		links.new(principled.outputs["BSDF"],nodeOut.inputs[0])
+		# faster, and appropriate for non-transparent (and refelctive?) materials
+		principled.distribution = 'GGX'
+		return
 
-	# apply additional settings
-	if hasattr(mat, "cycles"):
-		mat.cycles.sample_as_light = False
-	addToAlpha = None
-	if use_reflections and checklist(canon, "reflective"):
-		principled.inputs[5].default_value = 0.5  # spec
-		principled.inputs[7].default_value = 0.0  # roughness, used to be 0.05
+	# TODO: Use alpha socket of princpled node for newer blender versions
+	nodeTrans = nodes.new('ShaderNodeBsdfTransparent')
+	nodeMix1 = nodes.new('ShaderNodeMixShader')
+	nodeTrans.location = (0,100)
+	nodeMix1.location = (300,0)
+	links.new(nodeTrans.outputs["BSDF"],nodeMix1.inputs[1])
+	links.new(principled.outputs["BSDF"],nodeMix1.inputs[2])
+	links.new(nodeMix1.outputs["Shader"],nodeOut.inputs[0])
 
+	if "reflective" in flags:
 		# Add to alpha math channel here to increase reflections even in
 		# pure alpha-transparent spots, e.g. for glass
 		addToAlpha = nodes.new('ShaderNodeMath')
 		addToAlpha.location = (0, 200)
-		# nodeSaturateMix.location = (-200,-200)
 		addToAlpha.use_clamp = True
 		addToAlpha.operation = 'ADD'
 		addToAlpha.inputs[1].default_value = 0.2
-		links.new(nodeTexDiff.outputs["Alpha"],addToAlpha.inputs[0])
+		links.new(nodeIn.outputs["Alpha"],addToAlpha.inputs[0])
 		links.new(addToAlpha.outputs["Value"],nodeMix1.inputs[0])
 	else:
-		principled.inputs[5].default_value = 0.5  # set specular
-		principled.inputs[7].default_value = 0.7  # set roughness
+		links.new(nodeIn.outputs["Alpha"],nodeMix1.inputs[0])
 
-	waterHSV = None
-	if checklist(canon, "water"):
-		# principled.inputs[5].default_value = 1.0  # spec
-		principled.inputs[7].default_value = 0.0  # roughness
 
-		# addToAlpha.inputs[1].default_value = -0.1 # increase transparency
+def _build_template_original(group, nodeIn, nodeOut, flags):
+	"""Shading nodes of the original cycles material, see get_shader_template."""
+	nodes = group.nodes
+	links = group.links
 
-		# add HSV node for more user control
-		waterHSV = nodes.new('ShaderNodeHueSaturation')
-		waterHSV.location = (-200, -150)
-		links.new(nodeSaturateMix.outputs["Color"], waterHSV.inputs[4])
-		links.new(waterHSV.outputs["Color"], principled.inputs[0])
+	nodeDiff = nodes.new('ShaderNodeBsdfDiffuse')
+	nodeGloss = nodes.new('ShaderNodeBsdfGlossy')
+	nodeMix2 = nodes.new('ShaderNodeMixShader')
+	nodeNormal = nodes.new('ShaderNodeNormalMap')
 
-	if use_reflections and checklist(canon, "metallic"):
-		principled.inputs[4].default_value = 1  # set metallic
-		if principled.inputs[7].default_value < 0.2:  # roughness
-			principled.inputs[7].default_value = 0.2
-	else:
-		principled.inputs[4].default_value = 0  # set dielectric
+	nodeIn.location = (-600,0)
+	nodeNormal.location = (-400,-425)
+	nodeGloss.location = (0,-150)
+	nodeDiff.location = (-200,-150)
+	nodeMix2.location = (200,0)
+	nodeOut.location = (400,0)
 
+	links.new(nodeIn.outputs["Color"],nodeDiff.inputs[0])
+	links.new(nodeGloss.outputs["BSDF"],nodeMix2.inputs[2])
+	links.new(nodeMix2.outputs["Shader"],nodeOut.inputs[0])
+	links.new(nodeIn.outputs["Normal"],nodeNormal.inputs[0])
+	links.new(nodeNormal.outputs["Normal"],nodeDiff.inputs[2])
+	links.new(nodeNormal.outputs["Normal"],nodeGloss.inputs[2])
 
-	if only_solid is True or checklist(canon, "solid"):
-		# nodeMix1.inputs[0].default_value = 1 # no transparency
-		nodes.remove(nodeTrans)
-		nodes.remove(nodeMix1)
-		if addToAlpha:
-			nodes.remove(addToAlpha)
-		# nodeDiff.location[1] += 150
-		links.new(principled.outputs["BSDF"],nodeOut.inputs[0])
+	#set other default values, e.g. the mixes
+	nodeMix2.inputs[0].default_value = 0 # factor mix with glossy
+	nodeGloss.inputs[1].default_value = 0.1 # roughness
+	nodeNormal.inputs[0].default_value = 0.1 # tone down normal maps
 
-		# faster, and appropriate for non-transparent (and refelctive?) materials
-		principled.distribution = 'GGX'
-		if hasattr(mat, "blend_method"):
-			mat.blend_method = 'OPAQUE' # eevee setting
+	if "reflective" in flags:
+		nodeMix2.inputs[0].default_value = 0.3  # mix factor
+		nodeGloss.inputs[1].default_value = 0.0 # roughness, used to be 0.05
 	else:
-		# non-solid (potentially, not necessarily though)
-		if hasattr(mat, "blend_method"):  # 2.8 eevee settings
-			# TODO: Work on finding the optimal decision here
-			# clip could be better in cases of true/false transparency
-			# could do work to detect this from the image directly..
-			# though would be slower
-
-			# noisy, but workable for partial trans; bad for materials with
-			# no partial trans (makes view-through all somewhat noisy)
-			# Note: placed with hasattr to reduce bugs, seemingly only on old
-			# 2.80 build
-			if hasattr(mat, "blend_method"):
-				mat.blend_method = 'HASHED'
-			if hasattr(mat, "shadow_method"):
-				mat.shadow_method = 'HASHED'
-
-			# best if there is no partial transparency
-			# material.blend_method = 'CLIP' for no partial transparency
-			# both work fine with depth of field.
-
-			# but, BLEND does NOT work well with Depth of Field or layering
+		nodeMix2.mute = True
+		nodeMix2.hide = True
+		nodeGloss.mute = True
+		nodeGloss.hide = True
 
-	nodeSaturateMix.inputs[0].default_value = 1.0
-	nodeSaturateMix.blend_type = 'MULTIPLY' # changed from OVERLAY
-	nodeSaturateMix.mute = True
-	nodeSaturateMix.hide = True
-	if not checklist(canon, "desaturated"):
-		pass
-	elif not is_image_grayscale(image_diff):
-		pass
-	else:
-		conf.log("Texture desaturated: "+canon, vv_only=True)
-		desat_color = conf.json_data['blocks']['desaturated'][canon]
-		if len(desat_color) < len(nodeSaturateMix.inputs[2].default_value):
-			desat_color.append(1.0)
-		nodeSaturateMix.inputs[2].default_value = desat_color
-		nodeSaturateMix.mute = False
-		nodeSaturateMix.hide = False
+	if "water" in flags:
+		# setup the animation??
+		nodeMix2.inputs[0].default_value = 0.2
+		nodeGloss.inputs[1].default_value = 0.0
 
-	# reapply animation data if any to generated nodes
-	apply_texture_animation_pass_settings(mat, animated_data)
+	if "solid" in flags:
+		nodeDiff.location[1] += 150
+		links.new(nodeDiff.outputs["BSDF"],nodeMix2.inputs[1])
+		return
 
-	return 0 # return 0 once implemented
+	nodeTrans = nodes.new('ShaderNodeBsdfTransparent')
+	nodeMix1 = nodes.new('ShaderNodeMixShader')
+	nodeTrans.location = (-200,0)
+	nodeMix1.location = (0,0)
+	links.new(nodeDiff.outputs["BSDF"],nodeMix1.inputs[2])
+	links.new(nodeIn.outputs["Alpha"],nodeMix1.inputs[0])
+	links.new(nodeTrans.outputs["BSDF"],nodeMix1.inputs[1])
+	links.new(nodeMix1.outputs["Shader"],nodeMix2.inputs[1])
 
 
-def matgen_cycles_original(mat, passes, use_reflections, only_solid):
-	"""Generate basic cycles material, defaults to using transparency node."""
+def _build_template_emit(group, nodeIn, nodeOut):
+	"""Shading nodes of the emit material, see get_shader_template."""
+	nodes = group.nodes
+	links = group.links
 
-	matGen = util.nameGeneralize(mat.name)
-	canon, form = get_mc_canonical_name(matGen)
+	# TODO: add falloff node, colormixRGB node, LightPass node;
+	# change the input to colormix RGB for 2 to be 2.5,2.5,2.5
+	# and pass isCamerRay into 0 of colormix (factor), and pass
+	# in light pass into 1 of colormix ; this goes into strength
+	nodeLightPath = nodes.new('ShaderNodeLightPath')
+	nodeTrans = nodes.new('ShaderNodeBsdfTransparent')
+	nodeEmit = nodes.new('ShaderNodeEmission')
+	nodeEmitVisible = nodes.new('ShaderNodeEmission')
+	nodeMixEmits = nodes.new('ShaderNodeMixShader')
+	nodeMix = nodes.new('ShaderNodeMixShader')
+	nodeFalloff = nodes.new('ShaderNodeLightFalloff')
 
-	image_diff = passes["diffuse"]
-	image_norm = passes["normal"]
-	image_spec = passes["specular"]
-	image_disp = None # not used
+	nodeIn.location = (-400, -150)
+	nodeLightPath.location = (-600, 0)
+	nodeTrans.location = (-200, 0)
+	nodeEmit.location = (-200, -100)
+	nodeEmitVisible.location = (-200, -220)
+	nodeMixEmits.location = (0, 0)
+	nodeMix.location = (200, 0)
+	nodeFalloff.location = (-400, 0)
+	nodeOut.location = (400, 0)
 
-	if image_diff==None:
-		print("Could not find diffuse image, halting generation: "+mat.name)
-		return
-	elif image_diff.size[0] == 0 or image_diff.size[1] == 0:
-		print("Source image missing for material: " + mat.name)
-		# TODO: find replacement texture here, if enabled
-		return
+	links.new(nodeIn.outputs["Color"], nodeEmit.inputs[0])
+	links.new(nodeIn.outputs["Color"], nodeEmitVisible.inputs[0])
+	links.new(nodeIn.outputs["Alpha"], nodeMix.inputs[0])
+	links.new(nodeFalloff.outputs["Quadratic"], nodeEmit.inputs[1])
+	links.new(nodeLightPath.outputs["Is Camera Ray"], nodeMixEmits.inputs[0])
+	links.new(nodeEmit.outputs["Emission"], nodeMixEmits.inputs[1])
+	links.new(nodeEmitVisible.outputs["Emission"], nodeMixEmits.inputs[2])
+	links.new(nodeTrans.outputs["BSDF"], nodeMix.inputs[1])
+	links.new(nodeMixEmits.outputs["Shader"], nodeMix.inputs[2])
+	links.new(nodeMix.outputs["Shader"], nodeOut.inputs[0])
+
+	nodeEmitVisible.inputs[1].default_value = 1.0
+	nodeFalloff.inputs[0].default_value = 30  # controls actual light emitted
+	nodeFalloff.inputs[1].default_value = 0.03
 
-	#enable nodes
+
+def get_template_nodes(mat):
+	"""Returns the per-material nodes of a template material, by role."""
+	roles = {}
+	for node in mat.node_tree.nodes:
+		if node.type == 'TEX_IMAGE':
+			if "MCPREP_diffuse" in node:
+				roles["diffuse"] = node
+			elif "MCPREP_normal" in node:
+				roles["normal"] = node
+			elif "MCPREP_specular" in node:
+				roles["specular"] = node
+		elif node.type == 'MIX_RGB' and "SATURATE" in node:
+			roles["saturate"] = node
+		elif node.type == 'GROUP':
+			roles["shader"] = node
+		elif node.type == 'OUTPUT_MATERIAL':
+			roles["output"] = node
+	return roles
+
+
+def instance_template(mat, template, variant):
+	"""Ensure the material's nodes instance the given template node group.
+
+	If the material already instances this same template with all of its
+	nodes present, nothing is rebuilt and only images need binding again,
+	e.g. after swapping the texture pack.
+
+	Args:
+		mat: the existing material
+		template: node group from get_shader_template
+		variant: the template's variant, emit materials have no extra passes
+	Returns:
+		dict of nodes by role, and any animated pass settings to reapply
+	"""
 	mat.use_nodes = True
+	if mat.get("MCPREP_template") == template.name:
+		roles = get_template_nodes(mat)
+		expected = {"diffuse", "shader", "output"}
+		if variant != "emit":
+			expected |= {"normal", "specular", "saturate"}
+		if expected.issubset(roles) and roles["shader"].node_tree == template:
+			return roles, {}
+
 	animated_data = copy_texture_animation_pass_settings(mat)
 	nodes = mat.node_tree.nodes
 	links = mat.node_tree.links
 	nodes.clear()
 
-	nodeDiff = nodes.new('ShaderNodeBsdfDiffuse')
-	nodeGloss = nodes.new('ShaderNodeBsdfGlossy')
-	nodeTrans = nodes.new('ShaderNodeBsdfTransparent')
-	nodeMix1 = nodes.new('ShaderNodeMixShader')
-	nodeMix2 = nodes.new('ShaderNodeMixShader')
 	nodeTexDiff = nodes.new('ShaderNodeTexImage')
-	nodeTexNorm = nodes.new('ShaderNodeTexImage')
-	nodeTexSpec = nodes.new('ShaderNodeTexImage')
-	nodeNormal = nodes.new('ShaderNodeNormalMap')
-	nodeSaturateMix = nodes.new('ShaderNodeMixRGB')
+	nodeShader = nodes.new('ShaderNodeGroup')
 	nodeOut = nodes.new('ShaderNodeOutputMaterial')
+	nodeShader.node_tree = template
+	roles = {"diffuse": nodeTexDiff, "shader": nodeShader, "output": nodeOut}
 
-	# node names
 	nodeTexDiff.name = "Diffuse Tex"
 	nodeTexDiff.label = "Diffuse Tex"
+	nodeTexDiff["MCPREP_diffuse"] = True
+	nodeShader.location = (0,0)
+	nodeOut.location = (300,0)
+	links.new(nodeShader.outputs["Shader"],nodeOut.inputs[0])
+	links.new(nodeTexDiff.outputs["Alpha"],nodeShader.inputs["Alpha"])
+
+	if variant == "emit":
+		nodeTexDiff.location = (-300,0)
+		links.new(nodeTexDiff.outputs["Color"],nodeShader.inputs["Color"])
+		mat["MCPREP_template"] = template.name
+		return roles, animated_data
+
+	nodeTexNorm = nodes.new('ShaderNodeTexImage')
+	nodeTexSpec = nodes.new('ShaderNodeTexImage')
+	nodeSaturateMix = nodes.new('ShaderNodeMixRGB')
+	roles["normal"] = nodeTexNorm
+	roles["specular"] = nodeTexSpec
+	roles["saturate"] = nodeSaturateMix
+
 	nodeTexNorm.name = "Normal Tex"
 	nodeTexNorm.label = "Normal Tex"
 	nodeTexSpec.name = "Specular Tex"
 	nodeTexSpec.label = "Specular Tex"
 	nodeSaturateMix.name = "Add Color"
 	nodeSaturateMix.label = "Add Color"
+	nodeTexNorm["MCPREP_normal"] = True
+	nodeTexSpec["MCPREP_specular"] = True
+	nodeSaturateMix["SATURATE"] = True
 
-	# set location and connect
-	nodeTexDiff.location = (-600,0)
+	nodeTexDiff.location = (-400,0)
 	nodeTexNorm.location = (-600,-275)
-	nodeTexSpec.location = (-600,275)
-	nodeNormal.location = (-400,-425)
-	nodeGloss.location = (0,-150)
-	nodeSaturateMix.location = (-400,0)
-	nodeDiff.location = (-200,-150)
-	nodeTrans.location = (-200,0)
-	nodeMix1.location = (0,0)
-	nodeMix2.location = (200,0)
-	nodeOut.location = (400,0)
+	nodeTexSpec.location = (-600,0)
+	nodeSaturateMix.location = (-200,0)
 	if util.bv28():
 		nodeTexDiff.location[0] -= 100
 		nodeTexNorm.location[0] -= 200
 		nodeTexSpec.location[0] -= 200
 
 	links.new(nodeTexDiff.outputs["Color"],nodeSaturateMix.inputs[1])
-	links.new(nodeSaturateMix.outputs["Color"],nodeDiff.inputs[0])
-	links.new(nodeDiff.outputs["BSDF"],nodeMix1.inputs[2])
-	links.new(nodeTexDiff.outputs["Alpha"],nodeMix1.inputs[0])
-	links.new(nodeTrans.outputs["BSDF"],nodeMix1.inputs[1])
-	links.new(nodeGloss.outputs["BSDF"],nodeMix2.inputs[2])
-	links.new(nodeMix1.outputs["Shader"],nodeMix2.inputs[1])
-	links.new(nodeMix2.outputs["Shader"],nodeOut.inputs[0])
-	links.new(nodeTexNorm.outputs["Color"],nodeNormal.inputs[0])
-	links.new(nodeNormal.outputs["Normal"],nodeDiff.inputs[2])
-	links.new(nodeNormal.outputs["Normal"],nodeGloss.inputs[2])
+	links.new(nodeSaturateMix.outputs["Color"],nodeShader.inputs["Color"])
+	links.new(nodeTexSpec.outputs["Color"],nodeShader.inputs["Specular"])
 
-	# annotate texture nodes, and load images if available
-	nodeTexDiff["MCPREP_diffuse"] = True
-	nodeTexSpec["MCPREP_specular"] = True
-	nodeTexNorm["MCPREP_normal"] = True
-	nodeSaturateMix["SATURATE"] = True
-	# nodeTexDisp["MCPREP_disp"] = True
-	nodeTexDiff.image = image_diff
-	if image_spec:
-		nodeTexSpec.image = image_spec
-	else:
-		nodeTexSpec.mute = True
-	if image_norm:
-		nodeTexNorm.image = image_norm
-	else:
-		nodeTexNorm.mute = True
-		nodeNormal.mute = True
-	# nodeTexDisp.image = image_disp
+	nodeSaturateMix.inputs[0].default_value = 1.0
+	nodeSaturateMix.blend_type = 'MULTIPLY' # changed from OVERLAY
+	mat["MCPREP_template"] = template.name
+	return roles, animated_data
 
+
+def bind_template_images(mat, roles, passes):
+	"""Assign pass images to the image nodes of a template material."""
+	nodeTexDiff = roles["diffuse"]
+	nodeTexDiff.image = passes["diffuse"]
 	if hasattr(nodeTexDiff, "interpolation"): # 2.72+
 		nodeTexDiff.interpolation = 'Closest'
+	if "normal" not in roles:
+		return  # emit
+
+	nodeTexSpec = roles["specular"]
+	nodeTexNorm = roles["normal"]
+	nodeTexSpec.image = passes["specular"]
+	nodeTexSpec.mute = passes["specular"] is None
+	nodeTexNorm.image = passes["normal"]
+	nodeTexNorm.mute = passes["normal"] is None
+	if hasattr(nodeTexSpec, "interpolation"): # 2.72+
 		nodeTexSpec.interpolation = 'Closest'
 
+	set_template_normal_link(mat, roles, passes["normal"] is not None)
+
 	# Spec update
 	if hasattr(nodeTexSpec, "color_space"): # 2.7 and earlier 2.8 versions
 		nodeTexSpec.color_space = 'NONE'  # for better interpretation of specmaps
@@ -1249,35 +1384,156 @@ def matgen_cycles_original(mat, passes, use_reflections, only_solid):
 	elif nodeTexNorm.image and hasattr(nodeTexNorm.image, "colorspace_settings"):
 		nodeTexNorm.image.colorspace_settings.name = 'Non-Color'
 
-	#set other default values, e.g. the mixes
-	nodeMix2.inputs[0].default_value = 0 # factor mix with glossy
-	nodeGloss.inputs[1].default_value = 0.1 # roughness
-	nodeNormal.inputs[0].default_value = 0.1 # tone down normal maps
 
-	# the above are all default nodes. Now see if in specific lists
+def set_template_normal_link(mat, roles, use_normal):
+	"""Link or unlink the normal image of a template material.
+
+	Without a normal image, the template's flat default normal is used.
+	"""
+	normal_input = roles["shader"].inputs["Normal"]
+	if use_normal and not normal_input.is_linked:
+		mat.node_tree.links.new(roles["normal"].outputs["Color"], normal_input)
+	elif not use_normal and normal_input.is_linked:
+		for link in normal_input.links:
+			mat.node_tree.links.remove(link)
+
+
+def set_template_saturation(nodeSaturateMix, canon, block_lists, image_diff):
+	"""Enable the add color node if a known desaturated, grayscale image."""
+	nodeSaturateMix.mute = True
+	nodeSaturateMix.hide = True
+	if "desaturated" not in block_lists:
+		return
+	elif not is_image_grayscale(image_diff):
+		return
+	conf.log("Texture desaturated: "+canon, vv_only=True)
+	desat_color = list(conf.json_data['blocks']['desaturated'][canon])
+	if len(desat_color) < len(nodeSaturateMix.inputs[2].default_value):
+		desat_color.append(1.0)
+	nodeSaturateMix.inputs[2].default_value = desat_color
+	nodeSaturateMix.mute = False
+	nodeSaturateMix.hide = False
+
+
+def set_template_blend_method(mat, solid):
+	"""Apply eevee (2.8+) transparency settings for solid or not materials."""
+	if not hasattr(mat, "blend_method"):
+		return
+	if solid:
+		mat.blend_method = 'OPAQUE' # eevee setting
+		return
+
+	# TODO: Work on finding the optimal decision here
+	# clip could be better in cases of true/false transparency
+	# could do work to detect this from the image directly..
+	# though would be slower
+
+	# noisy, but workable for partial trans; bad for materials with
+	# no partial trans (makes view-through all somewhat noisy)
+	# Note: placed with hasattr to reduce bugs, seemingly only on old
+	# 2.80 build
+	mat.blend_method = 'HASHED'
+	if hasattr(mat, "shadow_method"):
+		mat.shadow_method = 'HASHED'
+
+	# best if there is no partial transparency
+	# material.blend_method = 'CLIP' for no partial transparency
+	# both work fine with depth of field.
+
+	# but, BLEND does NOT work well with Depth of Field or layering
+
+
+def matgen_cycles_principled(mat, passes, use_reflections, only_solid):
+	"""Generate principled cycles material, defaults to using transparency.
+
+	Shading nodes are shared with all materials of the same flags through a
+	template node group, see get_shader_template.
+	"""
+
+	matGen = util.nameGeneralize(mat.name)
+	canon, form = get_mc_canonical_name(matGen)
+	block_lists = classify(canon)
+
+	# get the texture, but will fail if NoneType
+	image_diff = passes["diffuse"]
+
+	if not image_diff:
+		print("Could not find diffuse image, halting generation: "+mat.name)
+		return
+	elif image_diff.size[0] == 0 or image_diff.size[1] == 0:
+		if image_diff.source != 'SEQUENCE':
+			# Common non animated case; this means the image is missing and would
+			# have already checked for replacement textures by now, so skip
+			return
+		if not os.path.isfile(bpy.path.abspath(image_diff.filepath)):
+			# can't check size or pixels as it often is not immediately avaialble
+			# so instea, check against firs frame of sequence to verify load
+			return
+
+	solid = only_solid is True or "solid" in block_lists
+	flags = []
+	if use_reflections and "reflective" in block_lists:
+		flags.append("reflective")
+	if "water" in block_lists:
+		flags.append("water")
+	if use_reflections and "metallic" in block_lists:
+		flags.append("metallic")
+	if solid:
+		flags.append("solid")
+
+	template = get_shader_template("principled", flags)
+	roles, animated_data = instance_template(mat, template, "principled")
+	bind_template_images(mat, roles, passes)
+
+	# apply additional settings
 	if hasattr(mat, "cycles"):
 		mat.cycles.sample_as_light = False
-	if use_reflections and checklist(canon, "reflective"):
-		nodeMix2.inputs[0].default_value = 0.3  # mix factor
-		nodeGloss.inputs[1].default_value = 0.0 # roughness, used to be 0.05
-	else:
-		nodeMix2.mute = True
-		nodeMix2.hide = True
-		nodeGloss.mute = True
-		nodeGloss.hide = True
+	set_template_blend_method(mat, solid)
+	set_template_saturation(roles["saturate"], canon, block_lists, image_diff)
 
-	if checklist(canon, "water"):
-		# setup the animation??
-		nodeMix2.inputs[0].default_value = 0.2
-		nodeGloss.inputs[1].default_value = 0.0
-	if only_solid is True or checklist(canon, "solid"):
-		# nodeMix1.inputs[0].default_value = 1 # no transparency
-		nodes.remove(nodeTrans)
-		nodes.remove(nodeMix1)
-		nodeDiff.location[1] += 150
-		links.new(nodeDiff.outputs["BSDF"],nodeMix2.inputs[1])
-	else:
-		nodeMix1.mute = False
+	# reapply animation data if any to generated nodes
+	apply_texture_animation_pass_settings(mat, animated_data)
+
+	return 0 # return 0 once implemented
+
+
+def matgen_cycles_original(mat, passes, use_reflections, only_solid):
+	"""Generate basic cycles material, defaults to using transparency node.
+
+	Shading nodes are shared with all materials of the same flags through a
+	template node group, see get_shader_template.
+	"""
+
+	matGen = util.nameGeneralize(mat.name)
+	canon, form = get_mc_canonical_name(matGen)
+	block_lists = classify(canon)
+
+	image_diff = passes["diffuse"]
+
+	if image_diff==None:
+		print("Could not find diffuse image, halting generation: "+mat.name)
+		return
+	elif image_diff.size[0] == 0 or image_diff.size[1] == 0:
+		print("Source image missing for material: " + mat.name)
+		# TODO: find replacement texture here, if enabled
+		return
+
+	solid = only_solid is True or "solid" in block_lists
+	flags = []
+	if use_reflections and "reflective" in block_lists:
+		flags.append("reflective")
+	if "water" in block_lists:
+		flags.append("water")
+	if solid:
+		flags.append("solid")
+
+	template = get_shader_template("original", flags)
+	roles, animated_data = instance_template(mat, template, "original")
+	bind_template_images(mat, roles, passes)
+	nodeTexDiff = roles["diffuse"]
+
+	if hasattr(mat, "cycles"):
+		mat.cycles.sample_as_light = False
 	try:
 		if nodeTexDiff.image.source =='SEQUENCE':
 			nodeTexDiff.image_user.use_cyclic = True
@@ -1287,48 +1543,8 @@ def matgen_cycles_original(mat, passes, use_reflections, only_solid):
 	except:
 		pass
 
-	if only_solid is True or checklist(canon, "solid"):
-		if hasattr(mat, "blend_method"):
-			mat.blend_method = 'OPAQUE' # eevee setting
-	else:
-		# non-solid (potentially, not necessarily though)
-		if hasattr(mat, "blend_method"):  # 2.8 eevee settings
-			# TODO: Work on finding the optimal decision here
-			# clip could be better in cases of true/false transparency
-			# could do work to detect this from the image directly..
-			# though would be slower
-
-			# noisy, but workable for partial trans; bad for materials with
-			# no partial trans (makes view-through all somewhat noisy)
-			# Note: placed with hasattr to reduce bugs, seemingly only on old
-			# 2.80 build
-			if hasattr(mat, "blend_method"):
-				mat.blend_method = 'HASHED'
-			if hasattr(mat, "shadow_method"):
-				mat.shadow_method = 'HASHED'
-
-			# best if there is no partial transparency
-			# material.blend_method = 'CLIP' for no partial transparency
-			# both work fine with depth of field.
-
-			# but, BLEND does NOT work well with Depth of Field or layering
-
-	nodeSaturateMix.inputs[0].default_value = 1.0
-	nodeSaturateMix.blend_type = 'MULTIPLY' # changed from 'OVERLAY'
-	nodeSaturateMix.mute = True
-	nodeSaturateMix.hide = True
-	if not checklist(canon, "desaturated"):
-		pass
-	elif not is_image_grayscale(image_diff):
-		pass
-	else:
-		conf.log("Texture desaturated: "+canon, vv_only=True)
-		desat_color = conf.json_data['blocks']['desaturated'][canon]
-		if len(desat_color) < len(nodeSaturateMix.inputs[2].default_value):
-			desat_color.append(1.0)
-		nodeSaturateMix.inputs[2].default_value = desat_color
-		nodeSaturateMix.mute = False
-		nodeSaturateMix.hide = False
+	set_template_blend_method(mat, solid)
+	set_template_saturation(roles["saturate"], canon, block_lists, image_diff)
 
 	# reapply animation data if any to generated nodes
 	apply_texture_animation_pass_settings(mat, animated_data)
@@ -1337,95 +1553,33 @@ def matgen_cycles_original(mat, passes, use_reflections, only_solid):
 
 
 def matgen_cycles_emit(mat, passes):
-	"""Generates light emiting cycles material, with transaprency."""
+	"""Generates light emiting cycles material, with transaprency.
+
+	Shading nodes are shared with all emit materials through a template node
+	group, see get_shader_template.
+	"""
 
 	mat_gen = util.nameGeneralize(mat.name)
 	canon, _ = get_mc_canonical_name(mat_gen)
+	block_lists = classify(canon)
 
 	image_diff = passes["diffuse"]
-	# image_norm = passes["normal"]
-	# image_spec = passes["specular"]
-	# image_disp = None # not used
 	if image_diff==None:
 		print("Could not find diffuse image, halting generation: "+mat.name)
 		return
 
-	mat.use_nodes = True
-	animated_data = copy_texture_animation_pass_settings(mat)
-	nodes = mat.node_tree.nodes
-	links = mat.node_tree.links
-	nodes.clear()
-
 	# if not checklist(canon,conf.json_data['blocks']['emit']):
 	# if calling this method, don't even check type - just assume emit
-
-	# TODO: add falloff node, colormixRGB node, LightPass node;
-	# change the input to colormix RGB for 2 to be 2.5,2.5,2.5
-	# and pass isCamerRay into 0 of colormix (factor), and pass
-	# in light pass into 1 of colormix ; this goes into strength
-
-	# add an emit node, insert it before the first mix node
-	nodeLightPath = nodes.new('ShaderNodeLightPath')
-	nodeTexDiff = nodes.new('ShaderNodeTexImage')
-	nodeTrans = nodes.new('ShaderNodeBsdfTransparent')
-	nodeEmit = nodes.new('ShaderNodeEmission')
-	nodeEmitVisible = nodes.new('ShaderNodeEmission')
-	nodeMixEmits = nodes.new('ShaderNodeMixShader')
-	nodeMix = nodes.new('ShaderNodeMixShader')
-	nodeFalloff = nodes.new('ShaderNodeLightFalloff')
-	nodeOut = nodes.new('ShaderNodeOutputMaterial')
-
-	nodeLightPath.location = (-600, 0)
-	nodeTexDiff.location = (-400, -150)
-	nodeTrans.location = (-200, 0)
-	nodeEmit.location = (-200, -100)
-	nodeEmitVisible.location = (-200, -220)
-	nodeMixEmits.location = (0, 0)
-	nodeMix.location = (200, 0)
-	nodeFalloff.location = (-400, 0)
-	nodeOut.location = (400, 0)
-	if util.bv28():
-		nodeLightPath.location[0] -= 100
-		nodeTexDiff.location[0] -= 100
-
-	# links.new(nodeMixEmitDiff.outputs["Color"], nodeEmit.inputs[0])
-	links.new(nodeTexDiff.outputs["Color"], nodeEmit.inputs[0])
-	links.new(nodeTexDiff.outputs["Color"], nodeEmitVisible.inputs[0])
-	links.new(nodeTexDiff.outputs["Alpha"], nodeMix.inputs[0])
-	links.new(nodeFalloff.outputs["Quadratic"], nodeEmit.inputs[1])
-	links.new(nodeLightPath.outputs["Is Camera Ray"], nodeMixEmits.inputs[0])
-	links.new(nodeEmit.outputs["Emission"], nodeMixEmits.inputs[1])
-	links.new(nodeEmitVisible.outputs["Emission"], nodeMixEmits.inputs[2])
-	links.new(nodeTrans.outputs["BSDF"], nodeMix.inputs[1])
-	links.new(nodeMixEmits.outputs["Shader"], nodeMix.inputs[2])
-	links.new(nodeMix.outputs["Shader"], nodeOut.inputs[0])
-
-	if hasattr(nodeTexDiff, "interpolation"): # 2.72+
-		nodeTexDiff.interpolation = 'Closest'
-	nodeTexDiff.image = image_diff
-	nodeTexDiff["MCPREP_diffuse"] = True  # or call it emit?
-	nodeEmitVisible.inputs[1].default_value = 1.0
-	nodeFalloff.inputs[0].default_value = 30  # controls actual light emitted
-	nodeFalloff.inputs[1].default_value = 0.03
+	template = get_shader_template("emit", [])
+	roles, animated_data = instance_template(mat, template, "emit")
+	bind_template_images(mat, roles, passes)
 
 	if hasattr(mat, "cycles"):
 		mat.cycles.sample_as_light = True
 
 	# 2.8 eevee settings
-	if not checklist(canon, "solid") and hasattr(mat, "blend_method"):
-		# TODO: Work on finding the optimal decision here
-		# clip could be better in cases of true/false transparency
-		# could do work to detect this from the image directly..
-		# though would be slower
-
-		# noisy, but workable for partial trans; bad for materials with
-		# no partial trans (makes view-through all somewhat noisy)
-		# Note: placed with hasattr to reduce bugs, seemingly only on old
-		# 2.80 build
-		if hasattr(mat, "blend_method"):
-			mat.blend_method = 'HASHED'
-		if hasattr(mat, "shadow_method"):
-			mat.shadow_method = 'HASHED'
+	if "solid" not in block_lists:
+		set_template_blend_method(mat, False)
 
 	# reapply animation data if any to generated nodes
 	apply_texture_animation_pass_settings(mat, animated_data)
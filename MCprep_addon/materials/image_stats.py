@@ -0,0 +1,180 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Pixel analysis of image buffers, and a persistent cache of the results.
+
+Pixels are read by the caller into a flat buffer in one go (foreach_get),
+and checked here with slicing so no per pixel python code runs. NumPy is
+used when available, falling back to the array module otherwise.
+"""
+
+import json
+import os
+
+from .. import atomic_write
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+# Pixels sampled per image, evenly spaced, when checking for grayscale
+MAX_SAMPLES = 1000
+
+# Bump to invalidate all cached results, e.g. if the sampling changes
+CACHE_VERSION = 1
+CACHE_FILENAME = "image_stats.json"
+
+# cache_dir: image_stats_cache
+_caches = {}
+
+
+def is_grayscale_buffer(pixels, channels, max_samples=MAX_SAMPLES):
+	"""Returns whether sampled pixels have equal red, green and blue values.
+
+	Args:
+		pixels: flat buffer of channel values, e.g. from buffers.float_buffer
+		channels: number of channels per pixel
+		max_samples: number of evenly spaced pixels to compare
+	"""
+	if channels < 3:
+		return True  # no color channels to differ
+	pxl_count = len(pixels) // channels
+	if not pxl_count:
+		return None
+	interval = pxl_count // max_samples if pxl_count > max_samples else 1
+	step = channels * interval
+	end = pxl_count * channels
+
+	if numpy is not None:
+		pixels = numpy.asarray(pixels)
+		red = pixels[0:end:step]
+		green = pixels[1:end:step]
+		blue = pixels[2:end:step]
+		return bool(numpy.array_equal(red, green)
+			and numpy.array_equal(green, blue))
+
+	# slices of an array.array compare element wise in C
+	red = pixels[0:end:step]
+	green = pixels[1:end:step]
+	blue = pixels[2:end:step]
+	return red == green and green == blue
+
+
+def file_key(path):
+	"""Returns (mtime, size) identifying the current file content, or None."""
+	try:
+		stat = os.stat(path)
+	except OSError:
+		return None
+	return (stat.st_mtime, stat.st_size)
+
+
+class image_stats_cache():
+	"""Results of image analysis, persisted per image file path.
+
+	Entries are only valid while the file has the same mtime and size, so a
+	texture of a pack is analyzed once across sessions and blend files, and
+	again only when it changes on disk.
+	"""
+
+	def __init__(self, cache_dir):
+		self.cache_dir = cache_dir
+		self.entries = {}  # path: [mtime, size, {stat name: value}]
+		self.dirty = False
+		self.loaded = False
+
+	def cache_file(self):
+		if not self.cache_dir:
+			return None
+		return os.path.join(self.cache_dir, CACHE_FILENAME)
+
+	def load(self):
+		"""Load the persisted results, once."""
+		if self.loaded:
+			return
+		self.loaded = True
+		path = self.cache_file()
+		if not path or not os.path.isfile(path):
+			return
+		try:
+			with open(path, 'r') as fd:
+				data = json.load(fd)
+		except (OSError, ValueError):
+			return
+		if data.get("version") != CACHE_VERSION:
+			return
+		self.entries = data.get("images", {})
+
+	def save(self):
+		"""Write the results if changed, atomically replacing any old file."""
+		path = self.cache_file()
+		if not path or not self.dirty:
+			return False
+		data = {"version": CACHE_VERSION, "images": self.entries}
+		try:
+			atomic_write.write_json(path, data)
+		except OSError:
+			return False
+		self.dirty = False
+		return True
+
+	def get(self, path, key, stat):
+		"""Returns the cached value of stat for the file, or None if unknown.
+
+		Args:
+			path: absolute filepath of the image
+			key: (mtime, size) of the file now, from file_key
+			stat: name of the analysis, e.g. "grayscale"
+		"""
+		if key is None:
+			return None
+		self.load()
+		entry = self.entries.get(path)
+		if not entry or entry[0] != key[0] or entry[1] != key[1]:
+			return None
+		return entry[2].get(stat)
+
+	def set(self, path, key, stat, value):
+		"""Store a result for the file as of key, dropping any outdated ones."""
+		if key is None:
+			return
+		self.load()
+		entry = self.entries.get(path)
+		if not entry or entry[0] != key[0] or entry[1] != key[1]:
+			entry = [key[0], key[1], {}]
+			self.entries[path] = entry
+		if entry[2].get(stat) != value:
+			entry[2][stat] = value
+			self.dirty = True
+
+
+def get_cache(cache_dir):
+	"""Returns the shared cache for the given folder."""
+	cache = _caches.get(cache_dir)
+	if cache is None:
+		cache = image_stats_cache(cache_dir)
+		_caches[cache_dir] = cache
+	return cache
+
+
+def clear_caches():
+	"""Forget the in memory caches, e.g. after the cache files changed."""
+	_caches.clear()
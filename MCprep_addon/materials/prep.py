@@ -21,15 +21,19 @@
 import bpy
 import os
 import math
+import time
 from bpy_extras.io_utils import ImportHelper
 import shutil
 import urllib.request
 from bpy.app.handlers import persistent
 
 # addon imports
+from .. import buffers
 from .. import conf
 from . import generate
+from . import prep_engine
 from . import sequences
+from . import uv_tools
 from .. import tracking
 from .. import util
 
@@ -94,6 +98,12 @@ class MCPREP_OT_prep_materials(bpy.types.Operator):
 		description = "Make all materials solid only, for shadows and rendering",
 		default = False
 		)
+	forceRebuild = bpy.props.BoolProperty(
+		name = "Force rebuild",
+		description = "Prep all materials again, including those unchanged "+\
+				"since they were last prepped with the same settings",
+		default = False
+		)
 
 	skipUsage = bpy.props.BoolProperty(
 		default = False,
@@ -127,6 +137,7 @@ class MCPREP_OT_prep_materials(bpy.types.Operator):
 		col.prop(self, "improveUiSettings")
 		col = row.column()
 		col.prop(self, "combineMaterials")
+		self.layout.prop(self, "forceRebuild")
 
 	track_function = "materials"
 	track_param = None
@@ -148,48 +159,101 @@ class MCPREP_OT_prep_materials(bpy.types.Operator):
 				self.report({'ERROR'}, "No materials found on selected objects")
 			return {'CANCELLED'}
 
-		# check if linked material exists
 		engine = context.scene.render.engine
-		count = 0
-		count_lib_skipped = 0
+		if engine not in ('BLENDER_RENDER', 'BLENDER_GAME', 'CYCLES', 'BLENDER_EEVEE'):
+			self.report({'ERROR'}, "Only Blender Internal, Cycles, or Eevee supported")
+			return {'CANCELLED'}
 
+		# plan all materials at once from plain data, so that lookups and disk
+		# checks are shared and can run on worker threads
+		t0 = time.time()
+		mat_passes = []
+		infos = []
 		for mat in mat_list:
 			if not mat:
 				conf.log("During prep, found null material:"+str(mat), vv_only=True)
 				continue
-			elif mat.library:
-				count_lib_skipped += 1
-				continue
-
-			passes = generate.get_textures(mat)
+			passes = generate.get_textures(mat) if not mat.library else {}
 			if not self.useExtraMaps:
 				for pass_name in passes:
 					if pass_name != "diffuse":
 						passes[pass_name] = None
+			mat_passes.append((mat, passes))
+			infos.append(prep_engine.material_info(
+				mat.name, bool(mat.library),
+				{pass_name: prep_engine.describe_image(passes[pass_name], bpy.path.abspath)
+					for pass_name in passes},
+				fingerprint=mat.get("MCPREP_fingerprint")))
+
+		# everything which affects the result, to skip re-prepping materials
+		# whose fingerprint still matches, including the resource pack as both
+		# replaced missing images and animations come from it
+		index = generate.get_texturepack_index()
+		options = {
+			"texturepack": index.root if index else None,
+			"engine": engine,
+			"generator": generate.TEMPLATE_VERSION,
+			"animateTextures": self.animateTextures,
+			"autoFindMissingTextures": self.autoFindMissingTextures,
+			"usePrincipledShader": self.usePrincipledShader,
+			"useReflections": self.useReflections,
+			"useExtraMaps": self.useExtraMaps,
+			"normalIntensity": self.normalIntensity,
+			"makeSolid": self.makeSolid}
+
+		plans = prep_engine.plan_materials(
+			infos,
+			generate.get_canonical_resolver(),
+			generate.get_block_list_matcher(),
+			index=index,
+			find_missing=self.autoFindMissingTextures,
+			animate=self.animateTextures,
+			options=options,
+			force=self.forceRebuild)
+		t1 = time.time()
+
+		# apply the plans, touching datablocks only from here on
+		count = 0
+		count_lib_skipped = 0
+		count_unchanged = 0
+		todo = []
+		for (mat, passes), plan in zip(mat_passes, plans):
+			if plan.skip:
+				count_lib_skipped += 1
+				continue
+			elif plan.unchanged:
+				count_unchanged += 1
+				continue
+			todo.append((mat, passes, plan))
 
-			if self.autoFindMissingTextures:
-				for pass_name in passes:
-					res = generate.replace_missing_texture(passes[pass_name])
-					if res>0:
-						mat["texture_swapped"] = True  # used to apply saturation
+			for pass_name, image_path in plan.replacements.items():
+				conf.log("Missing datablock detected: "+passes[pass_name].name)
+				passes[pass_name].filepath = image_path
+				if 'grayscale' in passes[pass_name]:
+					del passes[pass_name]['grayscale']  # now other pixels
+				mat["texture_swapped"] = True  # used to apply saturation
 
+		# check diffuse images for grayscale in one go, ahead of matprep
+		generate.classify_grayscale_images([mat for mat, _, plan in todo
+			if "desaturated" in plan.block_lists])
+
+		for mat, passes, plan in todo:
 			if engine == 'BLENDER_RENDER' or engine == 'BLENDER_GAME':
 				res = generate.matprep_internal(mat, passes,
 					self.useReflections, self.makeSolid)
-				if res==0:
-					count+=1
-			elif engine == 'CYCLES' or engine == 'BLENDER_EEVEE':
+			else:
 				res = generate.matprep_cycles(mat, passes, self.useReflections,
 					self.usePrincipledShader, self.makeSolid)
-				if res==0:
-					count+=1
-			else:
-				self.report({'ERROR'}, "Only Blender Internal, Cycles, or Eevee supported")
-				return {'CANCELLED'}
+			if res==0:
+				count+=1
+				mat["MCPREP_fingerprint"] = plan.fingerprint
 
-			if self.animateTextures:
+			if plan.animate:
 				sequences.animate_single_material(
 					mat, context.scene.render.engine)
+		t2 = time.time()
+		conf.log("Prepped {} materials, {} unchanged, planning {:.3f}s, applying {:.3f}s".format(
+			count, count_unchanged, t1-t0, t2-t1))
 
 		if self.combineMaterials is True:
 			bpy.ops.mcprep.combine_materials(selection_only=True, skipUsage=True)
@@ -198,10 +262,10 @@ class MCPREP_OT_prep_materials(bpy.types.Operator):
 
 		if self.skipUsage is True:
 			pass # don't report if a meta-call
-		elif count_lib_skipped > 0:
+		elif count_lib_skipped > 0 or count_unchanged > 0:
 			self.report({"INFO"},
-				"Modified {} materials, skipped {} linked ones.".format(
-					count, count_lib_skipped))
+				"Modified {} materials, skipped {} unchanged and {} linked ones.".format(
+					count, count_unchanged, count_lib_skipped))
 		elif count >0:
 			self.report({"INFO"},"Modified "+str(count)+" materials")
 		else:
@@ -445,25 +509,12 @@ class MCPREP_OT_combine_materials(bpy.types.Operator):
 				"Either turn selection only off or select objects with materials")
 			return {'CANCELLED'}
 
-		# 2-level structure to hold base name and all
-		# materials blocks with the same base
-		name_cat = {}
-
-		def getMaterials(self, context):
-			if self.selection_only is False:
-				return bpy.data.materials
-			else:
-				mats = []
-				for ob in bpy.data.objects:
-					for sl in ob.material_slots:
-						if sl is None or sl.material is None:
-							continue
-						if sl.material in mats:
-							continue
-						mats.append(sl.material)
-				return mats
-
-		data = getMaterials(self, context)
+		if self.selection_only is True:
+			objects = list(context.selected_objects)
+			data = util.materialsFromObj(objects)  # also adds instanced objects
+		else:
+			objects = list(bpy.data.objects)
+			data = list(bpy.data.materials)
 		precount = len( ["x" for x in data if x.users >0] )
 
 		if len(data)==0:
@@ -473,77 +524,44 @@ class MCPREP_OT_combine_materials(bpy.types.Operator):
 				self.report({"ERROR"},"No materials in open file")
 			return {'CANCELLED'}
 
-		# get and categorize all materials names
-		for mat in data:
+		# group by base name in one pass, mapping duplicates to the first
+		def base_name(mat):
 			base = util.nameGeneralize(mat.name)
-			if base not in name_cat:
-				name_cat[base] = [mat.name]
-			elif mat.name not in name_cat[base]:
-				name_cat[base].append(mat.name)
-			else:
-				conf.log("Skipping, already added material", True)
-
-
-		# pre 2.78 solution, deep loop
-		if bpy.app.version < (2, 78):
-			for ob in bpy.data.objects:
-				for sl in ob.material_slots:
-					if sl == None or sl.material == None:
-						continue
-					if sl.material not in data:
-						continue # selection only
-					sl.material = bpy.data.materials[name_cat[util.nameGeneralize(sl.material.name)][0]]
-			# doesn't remove old textures, but gets it to zero users
-
-			postcount = len([True for x in bpy.data.materials if x.users >0])
-			self.report({"INFO"},
-				"Consolidated {x} materials, down to {y} overall".format(
-				x=precount-postcount,
-				y=postcount))
-			return {'FINISHED'}
-
-		# perform the consolidation with one basename set at a time
-		for base in name_cat: # the keys of the dictionary
-			if len(base)<2:
-				continue
-
-			name_cat[base].sort() # in-place sorting
-			baseMat = bpy.data.materials[name_cat[base][0]]
-
-			conf.log([name_cat[base]," ## ",baseMat], vv_only=True)
-
-			for matname in name_cat[base][1:]:
-
-				# skip if fake user set
-				if bpy.data.materials[matname].use_fake_user == True:
-					continue
-				# otherwise, remap
-				res = util.remap_users(bpy.data.materials[matname],baseMat)
-				if res != 0:
-					self.report({'ERROR'}, str(res))
-					return {'CANCELLED'}
-				old = bpy.data.materials[matname]
-				conf.log("removing old? "+matname, vv_only=True)
-				if removeold is True and old.users==0:
-					conf.log("removing old:"+matname, vv_only=True)
-					try:
-						data.remove(old)
-					except ReferenceError as err:
-						print('Error trying to remove material '+matname)
-						print(str(err))
-
-			# Final step.. rename to not have .001 if it does
+			return base if len(base) >= 2 else None
+		remap = util.consolidation_map(data, base_name)
+
+		# reassign slots of affected objects only, in a single pass
+		util.remap_material_slots(objects, remap)
+		if self.selection_only is False:
+			# catch any users besides object slots, e.g. other datablocks
+			for old, new in remap.values():
+				if old.users > 0:
+					util.remap_users(old, new)
+
+		# groups are kept by their first datablock, or any which were skipped
+		kept = [block for block in data if block.as_pointer() not in remap]
+
+		if removeold is True:
+			removed = util.remove_orphans(
+				bpy.data.materials, [old for old, _ in remap.values()])
+			conf.log("Removed {} old materials".format(removed), vv_only=True)
+
+		# Final step.. rename to not have .001 if it does
+		for baseMat in kept:
 			genBase = util.nameGeneralize(baseMat.name)
+			if len(genBase) < 2:
+				continue
 			if baseMat.name != genBase:
 				if genBase in bpy.data.materials and bpy.data.materials[genBase].users!=0:
 					pass
 				else:
 					baseMat.name = genBase
-			else:
-				baseMat.name = genBase
 			conf.log(["Final: ",baseMat], vv_only=True)
 
-		postcount = len( ["x" for x in getMaterials(self, context) if x.users >0] )
+		if self.selection_only is True:
+			postcount = len(util.materialsFromObj(list(context.selected_objects)))
+		else:
+			postcount = len( ["x" for x in bpy.data.materials if x.users >0] )
 		self.report({"INFO"},
 				"Consolidated {x} materials down to {y}".format(
 				x=precount,
@@ -563,6 +581,12 @@ class MCPREP_OT_combine_images(bpy.types.Operator):
 		description = "Build images to consoldiate based on selected objects' materials only",
 		default = False
 		)
+	by_content = bpy.props.BoolProperty(
+		name = "Identical content",
+		description = "Also consolidate images with different names, but "+\
+				"identical file content",
+		default = False
+		)
 	skipUsage = bpy.props.BoolProperty(
 		default = False,
 		options = {'HIDDEN'}
@@ -577,75 +601,75 @@ class MCPREP_OT_combine_images(bpy.types.Operator):
 			self.report({'ERROR'},"Either turn selection only off or select objects with materials/images")
 			return {'CANCELLED'}
 
-		# 2-level structure to hold base name and all
-		# images blocks with the same base
-		if (bpy.app.version[0]>=2 and bpy.app.version[1] >= 78) == False:
-			self.report({'ERROR'}, "Must use blender 2.78 or higher to use this operator")
-			return {'CANCELLED'}
-
-		if self.selection_only==True:
-			self.report({'ERROR'},"Combine images does not yet work for selection only, retry with option disabled")
-			return {'CANCELLED'}
-
-		name_cat = {}
-		data = bpy.data.images
-
+		if self.selection_only is True:
+			materials = util.materialsFromObj(list(context.selected_objects))
+			textures = [sl.texture for mat in materials
+				if hasattr(mat, "texture_slots")
+				for sl in mat.texture_slots if sl and sl.texture]
+			data = self.images_of(materials, textures)
+		else:
+			materials = list(bpy.data.materials)
+			textures = list(bpy.data.textures)
+			data = list(bpy.data.images)
 		precount = len(data)
 
-		# get and categorize all image names
-		for im in bpy.data.images:
-			base = util.nameGeneralize(im.name)
-			if base not in name_cat:
-				name_cat[base] = [im.name]
-			elif im.name not in name_cat[base]:
-				name_cat[base].append(im.name)
-			else:
-				if conf.vv:print("Skipping, already added image")
-
-		# pre 2.78 solution, deep loop
-		if bpy.app.version < (2,78):
-			for ob in bpy.data.objects:
-				for sl in ob.material_slots:
-					if sl is None or sl.material is None or sl.material not in data:
-						continue # selection only
-					sl.material = data[name_cat[ util.nameGeneralize(sl.material.name) ][0]]
-			# doesn't remove old textures, but gets it to zero users
-
-			postcount = len( ["x" for x in bpy.data.materials if x.users >0] )
-			self.report({"INFO"},
-				"Consolidated {x} materials, down to {y} overall".format(
-				x=precount-postcount,
-				y=postcount))
-			return {'FINISHED'}
-
-		# perform the consolidation with one basename set at a time
-		for base in name_cat:
-			if len(base)<2:
+		# group by base name in one pass, mapping duplicates to the first
+		def base_name(img):
+			base = util.nameGeneralize(img.name)
+			return base if len(base) >= 2 else None
+		remap = util.consolidation_map(data, base_name)
+
+		if self.by_content is True:
+			# collapse the remaining images by identical file content; the
+			# color space is part of the key, as e.g. normal maps must differ
+			def content_key(img):
+				if img.as_pointer() in remap:
+					return None
+				digest = util.image_content_hash(img)
+				if digest is None:
+					return None
+				colorspace = None
+				if hasattr(img, "colorspace_settings"):
+					colorspace = img.colorspace_settings.name
+				return (digest, colorspace)
+			content_remap = util.consolidation_map(data, content_key)
+			# chain name duplicates on to the content target of their target
+			for ptr, (old, new) in list(remap.items()):
+				if new.as_pointer() in content_remap:
+					remap[ptr] = (old, content_remap[new.as_pointer()][1])
+			remap.update(content_remap)
+
+		# reassign image users of affected materials only, in a single pass
+		util.remap_image_users(materials, textures, remap)
+		if self.selection_only is False:
+			# catch any users besides materials and textures, e.g. world nodes
+			for old, new in remap.values():
+				if old.users > 0:
+					util.remap_users(old, new)
+
+		# groups are kept by their first datablock, or any which were skipped
+		kept = [block for block in data if block.as_pointer() not in remap]
+
+		if removeold is True:
+			removed = util.remove_orphans(
+				bpy.data.images, [old for old, _ in remap.values()])
+			conf.log("Removed {} old images".format(removed), vv_only=True)
+
+		# Final step.. rename to not have .001 if it does
+		for baseImg in kept:
+			genBase = util.nameGeneralize(baseImg.name)
+			if len(genBase) < 2:
 				continue
-			name_cat[base].sort() # in-place sorting
-			baseImg = bpy.data.images[ name_cat[base][0] ]
-
-			for imgname in name_cat[base][1:]:
-				# skip if fake user set
-				if bpy.data.images[imgname].use_fake_user is True:
-					continue
-				# otherwise, remap
-				util.remap_users(data[imgname],baseImg)
-				old = bpy.data.images[imgname]
-				if removeold==True and old.users==0:
-					bpy.data.images.remove( bpy.data.images[imgname] )
-
-			# Final step.. rename to not have .001 if it does
-			if baseImg.name != util.nameGeneralize(baseImg.name):
-				if util.nameGeneralize(baseImg.name) in data and \
-						bpy.data.images[util.nameGeneralize(baseImg.name)].users!=0:
+			if baseImg.name != genBase:
+				if genBase in bpy.data.images and bpy.data.images[genBase].users!=0:
 					pass
 				else:
-					baseImg.name = util.nameGeneralize(baseImg.name)
-			else:
-				baseImg.name = util.nameGeneralize(baseImg.name)
+					baseImg.name = genBase
 
-		postcount = len( ["x" for x in bpy.data.images if x.users >0] )
+		if self.selection_only is True:
+			postcount = len(self.images_of(materials, textures))
+		else:
+			postcount = len( ["x" for x in bpy.data.images if x.users >0] )
 		self.report({"INFO"},
 				"Consolidated {x} images down to {y}".format(
 				x=precount,
@@ -653,6 +677,21 @@ class MCPREP_OT_combine_images(bpy.types.Operator):
 
 		return {'FINISHED'}
 
+	def images_of(self, materials, textures):
+		"""Unique images used by image nodes of materials and by textures."""
+		images = {}
+		for mat in materials:
+			if mat.use_nodes and mat.node_tree:
+				for node in mat.node_tree.nodes:
+					image = getattr(node, "image", None)
+					if image:
+						images[image.as_pointer()] = image
+		for tex in textures:
+			image = getattr(tex, "image", None)
+			if image:
+				images[image.as_pointer()] = image
+		return list(images.values())
+
 
 class MCPREP_OT_scale_uv(bpy.types.Operator):
 	bl_idname = "mcprep.scale_uv"
@@ -676,20 +715,6 @@ class MCPREP_OT_scale_uv(bpy.types.Operator):
 	@tracking.report_error
 	def execute(self, context):
 
-		# INITIAL WIP
-		"""
-		# WIP
-		ob = context.active_object
-		# copied from elsewhere
-		uvs = ob.data.uv_layers[0].data
-		matchingVertIndex = list(chain.from_iterable(polyIndices))
-		# example, matching list of uv coord and 3dVert coord:
-		uvs_XY = [i.uv for i in Object.data.uv_layers[0].data]
-		vertXYZ= [v.co for v in Object.data.vertices]
-		matchingVertIndex = list(chain.from_iterable([p.vertices for p in Object.data.polygons]))
-		# and now, the coord to pair with uv coord:
-		matchingVertsCoord = [vertsXYZ[i] for i in matchingVertIndex]
-		"""
 		if not context.object:
 			self.report({'ERROR'}, "No active object found")
 			return {'CANCELLED'}
@@ -704,56 +729,76 @@ class MCPREP_OT_scale_uv(bpy.types.Operator):
 			self.report({'ERROR'}, "No active UV map found")
 			return {'CANCELLED'}
 
+		# all meshes being edited, or selected ones in object mode
+		if context.mode == 'EDIT_MESH':
+			candidates = getattr(context, "objects_in_mode", [])
+		else:
+			candidates = context.selected_objects
+		obj_list = [context.object]
+		for obj in candidates:
+			if obj == context.object or obj.type != 'MESH':
+				continue
+			elif not obj.data.polygons or not obj.data.uv_layers.active:
+				continue
+			obj_list.append(obj)
+
+		t0 = time.time()
 		mode_initial = context.mode
 		bpy.ops.object.mode_set(mode="OBJECT")
-		ret = self.scale_uv_faces(context.object, self.scale)
+		ret = None
+		count = 0
+		for obj in obj_list:
+			res = self.scale_uv_faces(obj, self.scale)
+			if res is None:
+				count += 1
+			elif ret is None:
+				ret = res
 		if mode_initial != 'OBJECT':
 			bpy.ops.object.mode_set(mode="EDIT")
+		t1 = time.time()
+		conf.log("Scaled UVs of {}/{} objects in {:.3f}s".format(
+			count, len(obj_list), t1-t0))
 
-		if ret is not None:
+		if not count:
 			self.report({'ERROR'}, ret)
 			conf.log("Error, "+ret)
 			return {'CANCELLED'}
 
+		self.report({'INFO'}, "Scaled UVs of {} object{} in {:.2f}s".format(
+			count, "s" if count > 1 else "", t1-t0))
 		return {'FINISHED'}
 
 	def scale_uv_faces(self, ob, factor):
-		"""Scale all UV face centers of an object by a given factor."""
-
-		factor *= -1
-		factor += 1
-		modified = False
+		"""Scale all UV face centers of an object by a given factor.
 
+		Reads and writes all loop uvs at once, returns error message if no
+		faces were scaled.
+		"""
 		uv = ob.data.uv_layers.active
-		# initial_UV = [(d.uv[0], d.uv[1])
-		# 				for d in ob.data.uv_layers.active.data]
-
-		for f in ob.data.polygons:
-			if not f.select and self.selected_only is True:
-				continue  # if not selected, won't show up in UV editor
-
-			# initialize for avergae center on polygon
-			x=y=n=0  # x,y,number of verts in loop for average purpose
-			for i in f.loop_indices:
-				# a loop could be an edge or face
-				l = ob.data.loops[i] # This polygon/edge
-				v = ob.data.vertices[l.vertex_index]  # The vertex data that loop entry refers to
-				# isolate to specific UV already used
-				if not uv.data[l.index].select and self.selected_only is True:
-					continue
-				x+=uv.data[l.index].uv[0]
-				y+=uv.data[l.index].uv[1]
-				n+=1
-			for i in f.loop_indices:
-				if not uv.data[l.index].select and self.selected_only is True:
-					continue
-				l = ob.data.loops[i]
-				uv.data[l.index].uv[0] = uv.data[l.index].uv[0]*(1-factor)+x/n*(factor)
-				uv.data[l.index].uv[1] = uv.data[l.index].uv[1]*(1-factor)+y/n*(factor)
-				modified = True
-		if not modified:
+		polygons = ob.data.polygons
+		loop_starts = buffers.int_buffer(len(polygons))
+		loop_totals = buffers.int_buffer(len(polygons))
+		polygons.foreach_get("loop_start", loop_starts)
+		polygons.foreach_get("loop_total", loop_totals)
+		uvs = buffers.float_buffer(len(uv.data) * 2)
+		uv.data.foreach_get("uv", uvs)
+
+		face_select = None
+		loop_select = None
+		if self.selected_only is True:
+			# if not selected, won't show up in UV editor
+			face_select = buffers.bool_buffer(len(polygons))
+			polygons.foreach_get("select", face_select)
+			loop_select = buffers.bool_buffer(len(uv.data))
+			uv.data.foreach_get("select", loop_select)
+
+		moved = uv_tools.scale_face_uvs(uvs, loop_starts, loop_totals, factor,
+			face_select=face_select, loop_select=loop_select)
+		if not moved:
 			return "No UV faces selected"
 
+		uv.data.foreach_set("uv", uvs)
+		ob.data.update()
 		return None
 
 
@@ -775,6 +820,11 @@ class MCPREP_OT_select_alpha_faces(bpy.types.Operator):
 		min=0.0,
 		max=1.0
 		)
+	use_threads = bpy.props.BoolProperty(
+		name="Use threads",
+		description="Compute face transparency of multiple objects on worker threads",
+		default = False
+		)
 	skipUsage = bpy.props.BoolProperty(
 		default = False,
 		options = {'HIDDEN'}
@@ -803,13 +853,24 @@ class MCPREP_OT_select_alpha_faces(bpy.types.Operator):
 			return {"CANCELLED"}
 		if ob.data.uv_layers.active is None:
 			self.report({"ERROR"}, "No active UV map found")
+			return {"CANCELLED"}
+
+		# all meshes in edit mode, skipping those which can't be checked
+		obj_list = [ob]
+		for obj in getattr(context, "objects_in_mode", []):
+			if obj == ob or obj.type != 'MESH':
+				continue
+			elif not obj.data.polygons or not obj.material_slots:
+				continue
+			elif obj.data.uv_layers.active is None:
+				continue
+			obj_list.append(obj)
 
-		# if doing multiple objects, iterate over loop of this function
 		bpy.ops.mesh.select_mode(type='FACE')
 
 		# UV data only available in object mode, have to switch there and back
 		bpy.ops.object.mode_set(mode="OBJECT")
-		ret = self.select_alpha(ob, self.threshold)
+		ret = self.select_alpha_objects(obj_list, self.threshold)
 		bpy.ops.object.mode_set(mode="EDIT")
 		if ret:
 			self.report({"ERROR"}, ret)
@@ -823,85 +884,107 @@ class MCPREP_OT_select_alpha_faces(bpy.types.Operator):
 
 	def select_alpha(self, ob, threshold):
 		"""Core function to select alpha faces based on active material/image."""
+		return self.select_alpha_objects([ob], threshold)
+
+	def select_alpha_objects(self, obj_list, threshold):
+		"""Select alpha faces of all objects, returns error message if any.
+
+		Mesh data and image alpha are read in bulk on the main thread, per
+		face averages computed from summed-area tables of alpha (optionally
+		on worker threads), and selections written back in bulk.
+		"""
+		t0 = time.time()
+		tables = {}  # image pointer: uv_tools.alpha_table, shared by objects
+		jobs = []
+		for ob in obj_list:
+			res = self.read_face_data(ob, tables)
+			if isinstance(res, str):
+				return res
+			jobs.append(res)
+		t1 = time.time()
+
+		def compute(job):
+			return uv_tools.face_alpha_ratios(
+				job["uvs"], job["loop_starts"], job["loop_totals"],
+				job["material_indices"], job["tables"])
+
+		if self.use_threads and prep_engine.concurrent and len(jobs) > 1:
+			workers = min(prep_engine.MAX_WORKERS, len(jobs))
+			with prep_engine.concurrent.futures.ThreadPoolExecutor(
+					max_workers=workers) as pool:
+				all_ratios = list(pool.map(compute, jobs))
+		else:
+			all_ratios = [compute(job) for job in jobs]
+		t2 = time.time()
+
+		for ob, job, ratios in zip(obj_list, jobs, all_ratios):
+			for ratio, total in zip(ratios, job["loop_totals"]):
+				if ratio is None and total >= 3:
+					conf.log("Could not get image from face's material")
+					return "Could not get image from face's material"
+
+			selected = buffers.bool_buffer(len(ratios))
+			ob.data.polygons.foreach_get("select", selected)
+			for ind, ratio in enumerate(ratios):
+				if ratio is not None:
+					selected[ind] = ratio < threshold
+			ob.data.polygons.foreach_set("select", selected)
+			ob.data.update()
+		t3 = time.time()
+		conf.log("Alpha faces of {} objects: read {:.3f}s, compute {:.3f}s, select {:.3f}s".format(
+			len(obj_list), t1-t0, t2-t1, t3-t2))
+
+	def read_face_data(self, ob, tables):
+		"""Bulk read the polygon, uv and image data of an object.
+
+		Returns dict of flat arrays and per material slot alpha tables, or
+		an error message.
+		"""
 		if not ob.material_slots:
 			conf.log("No materials, skipping.")
 			return "No materials"
+		uv = ob.data.uv_layers.active
+		if uv is None:
+			return "No active UV map found"
 
 		# pre-cache the materials and their respective images for comparing
-		textures = []
+		slot_tables = []
 		for index in range(len(ob.material_slots)):
 			mat = ob.material_slots[index].material
 			if not mat:
-				textures.append(None)
+				slot_tables.append(None)
 				continue
 			image = generate.get_textures(mat)["diffuse"]
 			if not image:
-				textures.append(None)
+				slot_tables.append(None)
 				continue
 			elif image.channels != 4:
-				textures.append(None) # no alpha channel anyways
+				slot_tables.append(None) # no alpha channel anyways
 				conf.log("No alpha channel for: "+image.name)
 				continue
-			textures.append(image)
-		data = [None for tex in textures]
-
-		uv = ob.data.uv_layers.active
-		for f in ob.data.polygons:
-			if len(f.loop_indices) < 3:
-				continue # don't select edges or vertices
-			fnd = f.material_index
-			image = textures[fnd]
-			if not image:
-				conf.log("Could not get image from face's material")
-				return "Could not get image from face's material"
-
-			# lazy load alpha part of image to memory, hold for whole operator
-			if not data[fnd]:
-				data[fnd] = list(image.pixels)[3::4]
-
-			# relate the polygon to the UV layer to the image coordinates
-			shape = []
-			for i in f.loop_indices:
-				loop = ob.data.loops[i]
-				x = uv.data[loop.index].uv[0]%1 # TODO: fix this wraparound hack
-				y = uv.data[loop.index].uv[1]%1
-				shape.append((x,y))
-
-			# print("The shape coords:")
-			# print(shape)
-			# could just do "the closest" pixel... but better is weighted area
-			if not shape:
-				continue
-
-			xlist, ylist = tuple([list(tup) for tup in zip(*shape)])
-			# not sure if I actually want to +0.5 to the values to get middle..
-			xmin = round(min(xlist)*image.size[0])-0.5
-			xmax = round(max(xlist)*image.size[0])-0.5
-			ymin = round(min(ylist)*image.size[1])-0.5
-			ymax = round(max(ylist)*image.size[1])-0.5
-			conf.log(["\tSet size:",xmin,xmax,ymin,ymax], vv_only=True)
-
-			# assuming faces are roughly rectangular, sum pixels a face covers
-			asum = 0
-			acount = 0
-			for row in range(image.size[1]):
-				if row < ymin or row > ymax:
-					continue
-				for col in range(image.size[0]):
-					if col >= xmin and col <= xmax:
-						asum += data[fnd][image.size[1]*row + col]
-						acount += 1
-
-			if acount == 0:
-				acount = 1
-			ratio = float(asum)/float(acount)
-			if ratio < float(threshold):
-				print("\t{} - Below threshold, select".format(ratio))
-				f.select = True
-			else:
-				print("\t{} - above thresh, NO select".format(ratio))
-				f.select = False
-		return
+			key = image.as_pointer()
+			if key not in tables:
+				pixels = generate.read_image_pixels(image)
+				tables[key] = uv_tools.alpha_table(
+					pixels[3::4], image.size[0], image.size[1])
+			slot_tables.append(tables[key])
+
+		polygons = ob.data.polygons
+		loop_starts = buffers.int_buffer(len(polygons))
+		loop_totals = buffers.int_buffer(len(polygons))
+		material_indices = buffers.int_buffer(len(polygons))
+		polygons.foreach_get("loop_start", loop_starts)
+		polygons.foreach_get("loop_total", loop_totals)
+		polygons.foreach_get("material_index", material_indices)
+		uvs = buffers.float_buffer(len(uv.data) * 2)
+		uv.data.foreach_get("uv", uvs)
+
+		return {
+			"uvs": uvs,
+			"loop_starts": loop_starts,
+			"loop_totals": loop_totals,
+			"material_indices": material_indices,
+			"tables": slot_tables}
 
 
 class MCPREP_OT_replace_missing_textures(bpy.types.Operator):
@@ -0,0 +1,284 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Planning phase of batch material prep.
+
+Material and image datablocks are first described as plain data on the main
+thread, then planned here all at once: canonical names, block lists, which
+images are missing and where to replace them from, whether a material
+can be animated, and whether it is unchanged since it was last prepped.
+Disk checks are deduplicated and run on worker threads.
+The operator then applies the plans to the datablocks on the main thread.
+"""
+
+import hashlib
+import json
+import os
+
+try:
+	import concurrent.futures
+except ImportError:
+	concurrent = None
+
+
+# Below this many unique files to check, threads cost more than they save
+THREADED_MIN_FILES = 16
+MAX_WORKERS = 8
+
+# Bump to invalidate the fingerprints of all previously prepped materials
+FINGERPRINT_VERSION = 1
+
+
+class image_info():
+	"""Plain description of an image datablock, read on the main thread."""
+	__slots__ = ("name", "path", "is_sequence", "has_size", "is_packed")
+
+	def __init__(self, name, path, is_sequence=False, has_size=False,
+			is_packed=False):
+		self.name = name
+		self.path = path  # absolute filepath
+		self.is_sequence = is_sequence
+		self.has_size = has_size
+		self.is_packed = is_packed
+
+	def path_to_check(self):
+		"""Returns filepath whose existence decides if the image is missing.
+
+		Mirrors generate.replace_missing_texture: sequences and loaded images
+		which are not packed are ok only if their file exists, unloaded images
+		are always considered missing.
+		"""
+		if self.is_sequence or (self.has_size and not self.is_packed):
+			return self.path
+		return None
+
+	def is_missing(self, file_exists):
+		"""Decide if missing, given a dict of path: whether the file exists."""
+		if self.is_sequence and file_exists.get(self.path):
+			return False
+		if self.has_size:
+			if self.is_packed or file_exists.get(self.path):
+				return False
+		return True
+
+	def base_name(self):
+		"""Name of the image without file extension."""
+		name = self.name
+		if len(name) > 4 and name[-4] == ".":
+			name = name[:-4]  # cuts off e.g. .png
+		elif len(name) > 5 and name[-5] == ".":
+			name = name[:-5]  # cuts off e.g. .jpeg
+		return name
+
+
+class material_info():
+	"""Plain description of a material to prep, read on the main thread."""
+	__slots__ = ("name", "is_linked", "passes", "fingerprint")
+
+	def __init__(self, name, is_linked=False, passes=None, fingerprint=None):
+		self.name = name
+		self.is_linked = is_linked
+		self.passes = passes or {}  # pass name: image_info or None
+		self.fingerprint = fingerprint  # stored when last prepped, if any
+
+
+class material_plan():
+	"""What to do for a single material, applied later on the main thread."""
+	__slots__ = ("name", "skip", "canon", "form", "block_lists",
+		"replacements", "animate", "fingerprint", "unchanged")
+
+	def __init__(self, name):
+		self.name = name
+		self.skip = False  # e.g. linked from a library
+		self.canon = None
+		self.form = None
+		self.block_lists = frozenset()
+		self.replacements = {}  # pass name: filepath to load in instead
+		self.animate = False  # texture pack has an animated sequence for it
+		self.fingerprint = None  # to store on the material once prepped
+		self.unchanged = False  # fingerprint matches, nothing to redo
+
+
+def describe_image(image, abspath):
+	"""Read an image datablock into an image_info, must run on main thread.
+
+	Args:
+		image: bpy image datablock, or None
+		abspath: function to make the image filepath absolute
+	"""
+	if image is None:
+		return None
+	return image_info(
+		image.name,
+		abspath(image.filepath),
+		is_sequence=image.source == 'SEQUENCE',
+		has_size=image.size[0] != 0 and image.size[1] != 0,
+		is_packed=bool(image.packed_file))
+
+
+def check_files(paths, index=None, threaded=True):
+	"""Check existence of many files, once per unique path.
+
+	Paths within the resource pack index are answered from it directly, any
+	others are checked on worker threads when there are enough of them.
+	Returns dict of path: bool.
+	"""
+	res = {}
+	to_stat = []
+	for path in set(paths):
+		found = index.contains_file(path) if index else None
+		if found is None:
+			to_stat.append(path)
+		else:
+			res[path] = found
+
+	if threaded and concurrent and len(to_stat) >= THREADED_MIN_FILES:
+		workers = min(MAX_WORKERS, len(to_stat))
+		with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+			for path, found in zip(to_stat, pool.map(os.path.isfile, to_stat)):
+				res[path] = found
+	else:
+		for path in to_stat:
+			res[path] = os.path.isfile(path)
+	return res
+
+
+def stat_files(paths, threaded=True):
+	"""Get modification times of many files, once per unique path.
+
+	Returns dict of path: mtime, or None where the file does not exist.
+	"""
+	def mtime(path):
+		try:
+			return os.stat(path).st_mtime
+		except OSError:
+			return None
+
+	paths = list(set(paths))
+	if threaded and concurrent and len(paths) >= THREADED_MIN_FILES:
+		workers = min(MAX_WORKERS, len(paths))
+		with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+			return dict(zip(paths, pool.map(mtime, paths)))
+	return {path: mtime(path) for path in paths}
+
+
+def material_fingerprint(canon, block_lists, images, options):
+	"""Compact hash of everything a prepped material was generated from.
+
+	Args:
+		canon: canonical name
+		block_lists: json block lists the canonical name is part of
+		images: list of (pass name, filepath, mtime)
+		options: dict of the prep options, any json compatible values
+	"""
+	data = json.dumps([
+		FINGERPRINT_VERSION,
+		canon,
+		sorted(block_lists),
+		sorted(images, key=lambda img: img[0]),
+		sorted(options.items())])
+	return hashlib.md5(data.encode("utf-8")).hexdigest()
+
+
+def plan_materials(materials, resolver, matcher, index=None,
+		find_missing=True, animate=False, threaded=True, options=None,
+		force=False):
+	"""Plan the prep of all materials at once.
+
+	Args:
+		materials: list of material_info
+		resolver: canon_index.canonical_resolver of the loaded json
+		matcher: canon_index.block_list_matcher of the loaded json
+		index: texturepack_index of the active pack, or None
+		find_missing: plan replacing missing images from the pack
+		animate: plan which materials have an animated texture in the pack,
+			which needs the index as without a pack nothing can be animated
+		threaded: allow worker threads for disk checks
+		options: dict of prep options to fingerprint materials with, so that
+			those unchanged since last prepped are marked as such
+		force: never mark materials as unchanged
+	Returns:
+		list of material_plan, in the same order as materials
+	"""
+	plans = []
+	for mat in materials:
+		plan = material_plan(mat.name)
+		plans.append(plan)
+		if mat.is_linked:
+			plan.skip = True
+			continue
+		plan.canon, plan.form = resolver.resolve(mat.name)
+		plan.block_lists = matcher.classify(plan.canon)
+
+	if find_missing:
+		images = [img for mat in materials if not mat.is_linked
+			for img in mat.passes.values() if img is not None]
+		file_exists = check_files(
+			[img.path_to_check() for img in images if img.path_to_check()],
+			index, threaded)
+
+		# images shared between materials are only looked up once
+		replacement_by_image = {}
+		for mat, plan in zip(materials, plans):
+			if plan.skip:
+				continue
+			for pass_name, img in mat.passes.items():
+				if img is None or not img.is_missing(file_exists):
+					continue
+				if img.name not in replacement_by_image:
+					path = None
+					if index:
+						canon, _ = resolver.resolve(img.base_name())
+						path = index.find(canon)
+					replacement_by_image[img.name] = path
+				if replacement_by_image[img.name]:
+					plan.replacements[pass_name] = replacement_by_image[img.name]
+
+	if animate and index:
+		for plan in plans:
+			if plan.skip:
+				continue
+			canon_path = index.find(plan.canon)
+			if canon_path and index.contains_file(canon_path+".mcmeta"):
+				plan.animate = True
+
+	if options is not None:
+		# fingerprint the images as they will be once replacements are done
+		final_images = []
+		for mat, plan in zip(materials, plans):
+			if plan.skip:
+				final_images.append([])
+				continue
+			final_images.append([
+				(pass_name, plan.replacements.get(pass_name, img.path))
+				for pass_name, img in mat.passes.items() if img is not None])
+		mtimes = stat_files(
+			[path for images in final_images for _, path in images], threaded)
+
+		for mat, plan, images in zip(materials, plans, final_images):
+			if plan.skip:
+				continue
+			plan.fingerprint = material_fingerprint(
+				plan.canon, plan.block_lists,
+				[(pass_name, path, mtimes[path]) for pass_name, path in images],
+				options)
+			# pending replacements always need applying, even if as before
+			plan.unchanged = (not force and not plan.replacements
+				and plan.fingerprint == mat.fingerprint)
+	return plans
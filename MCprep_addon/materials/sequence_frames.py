@@ -0,0 +1,290 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Writing the frames of tiled animated textures as image sequence files.
+
+The tiled image's pixels are read by the caller once into a flat float
+buffer (rows bottom up, as blender stores them), frames are sliced from it
+without copying, and encoded as 8 bit PNG files by worker threads. zlib
+releases the GIL while compressing, so frames encode in parallel.
+
+Frame order and timing follow the image's .mcmeta animation settings. The
+animation is laid out per game tick as frame keys: (tile,) for a tile as is,
+or (tile, next tile, tick, ticks) for a tile interpolated towards the next.
+Each distinct key is written once, however often it is shown, and the
+timing is played back by keyframing the image user, see offset_keyframes.
+"""
+
+import array
+import concurrent.futures
+import json
+import os
+import struct
+import zlib
+
+from .. import atomic_write
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# PNG color type per number of channels
+PNG_COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}
+
+# zlib compression level of written frames, 6 being zlib's default
+COMPRESS_LEVEL = 6
+
+# Minecraft's animation frametime unit
+TICKS_PER_SECOND = 20
+
+
+def read_mcmeta(image_path):
+	"""The animation settings of an image's .mcmeta file, {} if none."""
+	try:
+		with open(image_path + ".mcmeta", 'r') as fd:
+			data = json.load(fd)
+	except (OSError, ValueError):
+		return {}
+	animation = data.get("animation") if isinstance(data, dict) else None
+	return animation if isinstance(animation, dict) else {}
+
+
+def tile_count(width, height):
+	"""Number of square frames of a tiled image, or None if not tiled."""
+	if not width or height % width:
+		return None
+	return height // width
+
+
+def frame_slices(pixels, width, tiles, channels):
+	"""Views onto each frame's pixels, in Minecraft's top to bottom order.
+
+	Numpy arrays and array module buffers are sliced without copying.
+	"""
+	if not isinstance(pixels, (memoryview, tuple, list)) and (
+			numpy is None or not isinstance(pixels, numpy.ndarray)):
+		pixels = memoryview(pixels)
+	size = width * width * channels
+	if size * tiles != len(pixels):
+		raise ValueError("Mis-match of tile size and source sequence")
+	# blender rows start at the bottom, so the first frame is the last tile
+	return [pixels[size*(tiles-ind-1):size*(tiles-ind)] for ind in range(tiles)]
+
+
+def _png_rows(pixels, width, height, channels):
+	"""Filtered PNG scanlines of float pixels, top row first."""
+	stride = width * channels
+	if numpy is not None:
+		data = numpy.asarray(pixels, dtype=numpy.float32)
+		data = (numpy.clip(data, 0.0, 1.0) * 255 + 0.5).astype(numpy.uint8)
+		rows = numpy.zeros((height, stride + 1), dtype=numpy.uint8)
+		rows[:, 1:] = data.reshape(height, stride)[::-1]
+		return rows.tobytes()
+
+	data = array.array('B', [
+		int(min(max(val, 0.0), 1.0) * 255 + 0.5) for val in pixels]).tobytes()
+	rows = bytearray()
+	for row in range(height - 1, -1, -1):
+		rows.append(0)  # filter type none
+		rows += data[row*stride:(row+1)*stride]
+	return bytes(rows)
+
+
+def _png_chunk(tag, data):
+	return (struct.pack(">I", len(data)) + tag + data
+		+ struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+
+def png_bytes(pixels, width, height, channels):
+	"""Encode flat float pixels (rows bottom up) as an 8 bit PNG file."""
+	if channels not in PNG_COLOR_TYPES:
+		raise ValueError("Unsupported channel count: {}".format(channels))
+	if len(pixels) != width * height * channels:
+		raise ValueError("Pixel count does not match image size")
+	header = struct.pack(">IIBBBBB",
+		width, height, 8, PNG_COLOR_TYPES[channels], 0, 0, 0)
+	raw = _png_rows(pixels, width, height, channels)
+	return b"".join([
+		PNG_SIGNATURE,
+		_png_chunk(b"IHDR", header),
+		_png_chunk(b"IDAT", zlib.compress(raw, COMPRESS_LEVEL)),
+		_png_chunk(b"IEND", b"")])
+
+
+def frame_plan(animation, tiles):
+	"""Frames played by an animation, as (tile, ticks) pairs in order.
+
+	Follows the mcmeta frames list, whose entries are tile indices or
+	{"index", "time"} dicts, else plays each tile once. Invalid tile indices
+	are skipped, as in Minecraft.
+	"""
+	try:
+		default_time = max(int(animation.get("frametime", 1)), 1)
+	except (TypeError, ValueError):
+		default_time = 1
+	plan = []
+	for frame in animation.get("frames") or []:
+		index = frame.get("index") if isinstance(frame, dict) else frame
+		ticks = frame.get("time", default_time) if isinstance(frame, dict) else default_time
+		if not isinstance(index, int) or not 0 <= index < tiles:
+			continue
+		try:
+			plan.append((index, max(int(ticks), 1)))
+		except (TypeError, ValueError):
+			plan.append((index, default_time))
+	if not plan:
+		plan = [(ind, default_time) for ind in range(tiles)]
+	return plan
+
+
+def tick_frames(plan, interpolate=False):
+	"""Frame key shown at each game tick of one loop of the animation.
+
+	With interpolate, ticks after the first of a frame blend towards the
+	next frame, as Minecraft does for "interpolate": true.
+	"""
+	keys = []
+	for ind, (tile, ticks) in enumerate(plan):
+		next_tile = plan[(ind + 1) % len(plan)][0]
+		for tick in range(ticks):
+			if interpolate and tick and next_tile != tile:
+				keys.append((tile, next_tile, tick, ticks))
+			else:
+				keys.append((tile,))
+	return keys
+
+
+def animation_frames(animation, tiles):
+	"""Frame keys per game tick for an image's mcmeta animation settings."""
+	return tick_frames(
+		frame_plan(animation, tiles), bool(animation.get("interpolate")))
+
+
+def tick_indices(ticks):
+	"""Distinct items of per tick items, and the index into them per tick.
+
+	Returns (distinct items in order of first use, index per tick).
+	"""
+	distinct = unique_keys(ticks)
+	index = {item: ind for ind, item in enumerate(distinct)}
+	return distinct, [index[item] for item in ticks]
+
+
+def offset_keyframes(indices, fps):
+	"""Keyframes showing per tick frame indices at game speed, for one loop.
+
+	A sequence of each distinct frame once is played by keying the image
+	user's frame offset, with constant interpolation, at each scene frame
+	where the shown frame changes. The last key repeats the first at the end
+	of the loop, so a Cycles modifier repeats the animation.
+	Returns list of (scene frame, frame offset), scene frames from 1.
+	"""
+	if not indices:
+		return []
+	scale = fps / float(TICKS_PER_SECOND)
+	keys = []
+	for tick, index in enumerate(indices):
+		if not keys or keys[-1][1] != index:
+			keys.append((1 + tick * scale, index))
+	keys.append((1 + len(indices) * scale, indices[0]))
+	return keys
+
+
+def unique_keys(keys):
+	"""Distinct frame keys, in order of first use."""
+	seen = set()
+	return [key for key in keys if not (key in seen or seen.add(key))]
+
+
+def blend_frames(frames, keys):
+	"""Pixels of each frame key, interpolating in bulk where needed.
+
+	Args:
+		frames: per tile pixel views, from frame_slices
+		keys: distinct frame keys
+	"""
+	blended = [key for key in keys if len(key) > 1]
+	result = {}
+	if blended and numpy is not None:
+		first = numpy.stack([numpy.asarray(frames[key[0]], dtype=numpy.float32)
+			for key in blended])
+		second = numpy.stack([numpy.asarray(frames[key[1]], dtype=numpy.float32)
+			for key in blended])
+		weights = numpy.array([[key[2] / key[3]] for key in blended],
+			dtype=numpy.float32)
+		mixed = first + (second - first) * weights
+		result = {key: mixed[ind] for ind, key in enumerate(blended)}
+	for key in keys:
+		if len(key) == 1:
+			result[key] = frames[key[0]]
+		elif key not in result:
+			weight = key[2] / key[3]
+			result[key] = [a + (b - a) * weight
+				for a, b in zip(frames[key[0]], frames[key[1]])]
+	return result
+
+
+def frame_path(output_folder, basename, key):
+	"""Path of the file of a frame key, tiles numbered from 1."""
+	name = "{}_{}".format(basename, str(key[0] + 1).zfill(4))
+	if len(key) > 1:
+		name += "-{}-{}of{}".format(str(key[1] + 1).zfill(4), key[2], key[3])
+	return os.path.join(output_folder, name + ".png")
+
+
+def _write_frame(path, pixels, width, channels):
+	atomic_write.write_bytes(path, png_bytes(pixels, width, width, channels))
+	return path
+
+
+def export_frames(pixels, width, height, channels, output_folder, basename,
+		keys=None, threads=None):
+	"""Write frames of a tiled image as PNG files, in parallel.
+
+	Args:
+		pixels: flat float pixels of the whole tiled image, rows bottom up
+		width, height: size of the tiled image, height a multiple of width
+		channels: number of channels per pixel
+		output_folder: existing folder to write frames into
+		basename: frame name prefix, tiles are named basename_0001.png etc
+		keys: frame keys to write, e.g. from animation_frames, each distinct
+			key written once; default each tile once
+		threads: number of worker threads, None for one per cpu
+	Returns:
+		List of frame paths, one per key.
+	"""
+	tiles = tile_count(width, height)
+	if not tiles:
+		raise ValueError("Not perfectly tiled image")
+	if keys is None:
+		keys = [(ind,) for ind in range(tiles)]
+	distinct = unique_keys(keys)
+	frames = blend_frames(frame_slices(pixels, width, tiles, channels), distinct)
+	paths = {key: frame_path(output_folder, basename, key) for key in distinct}
+	threads = threads or os.cpu_count() or 1
+	with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+		jobs = [pool.submit(_write_frame, paths[key], frames[key], width, channels)
+			for key in distinct]
+		for job in jobs:
+			job.result()  # raise any error of writing
+	return [paths[key] for key in keys]
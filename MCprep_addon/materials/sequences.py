@@ -22,13 +22,18 @@ assigment of textures which are animated.
 """
 
 import bpy
+import collections
+import concurrent.futures
 import errno
-import json
 import os
 import re
+import shutil
+import tempfile
 
 from .. import conf
+from . import frame_cache
 from . import generate
+from . import sequence_frames
 from .. import tracking
 from .. import util
 
@@ -38,7 +43,8 @@ from .. import util
 # -----------------------------------------------------------------------------
 
 
-def animate_single_material(mat, engine, export_location='original', clear_cache=False):
+def animate_single_material(mat, engine, export_location='original',
+		clear_cache=False, interpolate=True):
 	"""Animates texture for single material, including all passes.
 
 	Args:
@@ -46,11 +52,29 @@ def animate_single_material(mat, engine, export_location='original', clear_cache
 		engine: target render engine
 		export_location: enum of {original, texturepack, local}
 		clear_cache: whether to pre-remove existing sequence if existing
+		interpolate: whether to blend frames where the mcmeta interpolates
 	Returns:
 		Bool (if canonically affectable),
 		Bool (if actually updated or not),
 		Str (error text if any handled, e.g. OS permission error)
 	"""
+	affectable, jobs, err = plan_material_animation(
+		mat, export_location, clear_cache, interpolate)
+	if err or not jobs:
+		return affectable, False, err
+	export_sequence_jobs(jobs, clear_cache)
+	return affectable, assign_material_animation(mat, engine, jobs), None
+
+
+def plan_material_animation(mat, export_location='original',
+		clear_cache=False, interpolate=True):
+	"""Find the sequences to animate a material with, without exporting.
+
+	Returns:
+		Bool (if canonically affectable),
+		List of sequence jobs per pass, see plan_material_sequence,
+		Str (error text if any handled, e.g. OS permission error)
+	"""
 	mat_gen = util.nameGeneralize(mat.name)
 	canon, form = generate.get_mc_canonical_name(mat_gen)
 	affectable = False
@@ -66,19 +90,17 @@ def animate_single_material(mat, engine, export_location='original', clear_cache
 	if not image_path_canon:
 		conf.log("Canon path not found for {}:{}, form {}, path: {}".format(
 			mat_gen, canon, form, image_path_canon), vv_only=True)
-		return affectable, False, None
+		return affectable, [], None
 
 	if not os.path.isfile(image_path_canon+".mcmeta"):
 		conf.log(".mcmeta not found for "+mat_gen, vv_only=True)
 		affectable = False
-		return affectable, False, None
+		return affectable, [], None
 	affectable = True
-	mcmeta = {}
-	with open(image_path_canon+".mcmeta", "r") as mcf:
-		mcmeta = json.load(mcf)
+	mcmeta = sequence_frames.read_mcmeta(image_path_canon)
 	conf.log("MCmeta for {}: {}".format(diffuse_block, mcmeta))
 
-	# apply the sequence if any found, will be empty dict if not
+	# apply the sequence if any found, will be empty list if not
 	if diffuse_block and hasattr(diffuse_block, "filepath"):
 		source_path = diffuse_block.filepath
 	else:
@@ -86,39 +108,48 @@ def animate_single_material(mat, engine, export_location='original', clear_cache
 	if not source_path:
 		source_path = image_path_canon
 		conf.log("Fallback to using image canon path instead of source path")
-	tile_path_dict, err = generate_material_sequence(source_path, image_path_canon,
-		form, export_location, clear_cache)
+	jobs, err = plan_material_sequence(source_path, image_path_canon,
+		form, export_location, clear_cache, interpolate)
 	if err:
 		conf.log("Error occured during sequence generation:")
 		conf.log(err)
-		return affectable, False, err
-	if tile_path_dict == {}:
-		return affectable, False, None
+		return affectable, [], err
+	for job in jobs:
+		job["canon"] = canon
+	return affectable, jobs, None
+
 
+def assign_material_animation(mat, engine, jobs):
+	"""Apply the exported sequences of planned jobs to a material's passes.
+
+	Returns whether any pass was updated.
+	"""
 	affected_materials = 0
-	for pass_name in tile_path_dict:
-		if not tile_path_dict[pass_name]:  # ie ''
+	for job in jobs:
+		pass_name = job["pass"]
+		if not job["first_tile"]:  # ie not tiled
 			conf.log("Skipping passname: " + pass_name)
 			continue
 		if engine == 'CYCLES' or engine == 'BLENDER_EEVEE':
 			node = generate.get_node_for_pass(mat, pass_name)
 			if not node:
 				continue
-			set_sequence_to_texnode(node, tile_path_dict[pass_name])
+			set_sequence_to_texnode(node, job["first_tile"], job["ticks"], job["fps"])
 			affected_materials += 1
 
 			# since image sequences make it tricky to read pixel data (shows empty)
 			# assign cache based on the undersatnding if known desaturated or not
-			node.image['grayscale'] = generate.checklist(canon, "desaturated")
+			node.image['grayscale'] = "desaturated" in generate.classify(job["canon"])
 		elif engine == 'BLENDER_RENDER' or engine == 'BLENDER_GAME':
 			texture = generate.get_texlayer_for_pass(mat, pass_name)
 			if not texture:
 				continue
-			set_sequence_to_texnode(texture, tile_path_dict[pass_name])
+			set_sequence_to_texnode(
+				texture, job["first_tile"], job["ticks"], job["fps"])
 			affected_materials += 1
 
 	generate.set_saturation_material(mat)
-	return affectable, affected_materials>0, None
+	return affected_materials > 0
 
 
 def is_image_tiled(image_block):
@@ -132,7 +163,8 @@ def is_image_tiled(image_block):
 		return True
 
 
-def generate_material_sequence(source_path, image_path, form, export_location, clear_cache):
+def generate_material_sequence(source_path, image_path, form, export_location,
+		clear_cache, interpolate=True):
 	"""Performs frame by frame export of sequences to location based on input.
 
 	Returns Dictionary of the image paths to the first tile of each
@@ -144,13 +176,31 @@ def generate_material_sequence(source_path, image_path, form, export_location, c
 		form: jmc2obj, mineways, or none
 		export_location: enum of type of location output
 		clear_cache: whether to delete and re-export frames, even if existing found
+		interpolate: whether to blend frames where the mcmeta interpolates
 	Returns:
 		tile_path_dict: list of filepaths
 		err: Error if any handled
 	"""
+	jobs, err = plan_material_sequence(source_path, image_path, form,
+		export_location, clear_cache, interpolate)
+	if err:
+		return {}, err
+	export_sequence_jobs(jobs, clear_cache)
+	return {job["pass"]: job["first_tile"] for job in jobs if job["first_tile"]}, None
 
-	# get the currently assigned image passes (normal, spec. etc)
-	image_dict = {}
+
+def plan_material_sequence(source_path, image_path, form, export_location,
+		clear_cache, interpolate=True):
+	"""Find each pass's sequence folder, and whether its frames are current.
+
+	Creates the sequence folders, and removes outdated frames. Arguments as
+	for generate_material_sequence.
+	Returns:
+		jobs: list of dicts per pass, with first_tile set if current frames
+			exist, else to be exported with export_sequence_jobs
+		err: Error if any handled
+	"""
+	jobs = []
 
 	# gets available passes from current texturepack for given name
 	img_pass_dict = generate.find_additional_passes(image_path)
@@ -185,7 +235,6 @@ def generate_material_sequence(source_path, image_path, form, export_location, c
 	if conf.vv:
 		conf.log("Pre-sequence details")
 		conf.log(image_path)
-		conf.log(image_dict)
 		conf.log(img_pass_dict)
 		conf.log(seq_path_base)
 		conf.log("---")
@@ -197,6 +246,10 @@ def generate_material_sequence(source_path, image_path, form, export_location, c
 	else:
 		conf.log("DEBUG - other form of animated texture detected")
 
+	# frames are timed to play at the same speed as in game
+	render = bpy.context.scene.render
+	fps = render.fps / render.fps_base
+
 	perm_denied = "Permission denied, could not make folder - try " + \
 		"running blender as admin"
 
@@ -217,75 +270,223 @@ def generate_material_sequence(source_path, image_path, form, export_location, c
 			os.mkdir(os.path.dirname(seq_path))
 		except OSError as exc:
 			if exc.errno == errno.EACCES:
-				return {}, perm_denied
+				return [], perm_denied
 			elif exc.errno != errno.EEXIST: # ok if error is that it exists
 				raise Exception("Failed to make director, missing path: "+seq_path)
 		try:  # check folder exists/create if needed
 			os.mkdir(seq_path)
 		except OSError as exc:
 			if exc.errno == errno.EACCES:
-				return {}, perm_denied
+				return [], perm_denied
 			elif exc.errno != errno.EEXIST: # ok if error is that it exists
 				raise Exception("Path does not exist: "+seq_path)
 
-		# overwrite the files found if not cached
+		# reuse frames found only if exported from the same source and mcmeta
 		if not os.path.isdir(seq_path):
 			raise Exception("Path does not exist: "+seq_path)
-		cached = [tile for tile in os.listdir(seq_path)
-				if os.path.isfile(os.path.join(seq_path, tile))
-				and tile.startswith(pass_name)]
+		animation = sequence_frames.read_mcmeta(passfile)
+		if not animation:
+			animation = sequence_frames.read_mcmeta(image_path)
+		if not interpolate and animation.get("interpolate"):
+			animation = dict(animation, interpolate=False)
+		key = frame_cache.cache_key(passfile, animation)
+		cached = frame_cache.sequence_files(seq_path, pass_name)
+		stamp = frame_cache.read_stamp(seq_path, pass_name) if cached else None
+		current = bool(key and stamp and stamp.get("key") == key and stamp.get("ticks"))
 		if cached:
-			conf.log("Cached detected")
-
-		if clear_cache and cached:
-			for tile in cached:
-				try:
-					os.remove(os.path.join(seq_path, tile))
-				except OSError as exc:
-					if exc.errno == errno.EACCES:
-						return {}, perm_denied
-					else:
-						raise Exception(exc)
-
-		# generate the sequences
-		params = [] # TODO: get from json file
-		if clear_cache or not cached:
-			first_tile = export_image_to_sequence(passfile, params, seq_path, form)
+			conf.log("Cached detected, {}".format("current" if current else "outdated"))
+
+		if cached and (clear_cache or not current):
+			try:
+				frame_cache.remove_frames(seq_path, pass_name)
+			except OSError as exc:
+				if exc.errno == errno.EACCES:
+					return [], perm_denied
+				else:
+					raise Exception(exc)
+
+		jobs.append({
+			"pass": img_pass,
+			"passfile": passfile,
+			"pass_name": pass_name,
+			"seq_path": seq_path,
+			"animation": animation,
+			"key": key,
+			"stamp": bool(key),
+			"fps": fps,
+			"ticks": stamp["ticks"] if current else None,
+			"first_tile": None if clear_cache or not current else os.path.join(
+				seq_path, cached[0])})
+	return jobs, None
+
+
+def get_frame_cache():
+	"""Returns the cache of exported frames shared by all projects, or None."""
+	cache_dir = util.get_cache_dir("frames")
+	if not cache_dir:
+		return None
+	return frame_cache.get_cache(cache_dir)
+
+
+def export_sequence_jobs(jobs, clear_cache=False, threads=None):
+	"""Export the frames of all planned sequence jobs not yet current.
+
+	Sources are read on the main thread, each distinct animation (by cache
+	key) is encoded once with frames of all animations written concurrently,
+	threads being split between animations when there are fewer of them. The
+	frames are then committed to the cache and linked into each job's
+	sequence folder, setting its first_tile.
+
+	Returns:
+		frames_written: number of frame files encoded
+		hits: number of jobs not needing any frames encoded
+	"""
+	cache = get_frame_cache()
+	pending = collections.OrderedDict()  # key or job index: [jobs]
+	hits = 0
+	for ind, job in enumerate(jobs):
+		if job["first_tile"]:
+			hits += 1
+			continue
+		key = job["key"]
+		if key and key in pending:
+			pending[key].append(job)
+			hits += 1
+			continue
+		ticks = None
+		if key and cache and not clear_cache:
+			ticks = cache.get(key)
+		if ticks:
+			conf.log("Using cached frames for "+job["pass_name"], vv_only=True)
+			link_sequence_job(job, ticks)
+			hits += 1
+			continue
+		pending[key or ind] = [job]
+
+	# read sources here, as bpy can't be used from worker threads
+	exports = []  # (key, jobs, pixels tuple, folder, whether cached)
+	for key, group in pending.items():
+		image = load_sequence_pixels(group[0]["passfile"])
+		if image is None:
+			continue
+		cached = bool(cache and group[0]["key"])
+		if cached:
+			if clear_cache:
+				cache.discard(key)
+			folder = cache.new_entry_dir(key)
 		else:
-			first_tile = os.path.join(seq_path, sorted(cached)[0])
+			# without the cache, frames are exported next to the sequence for linking
+			folder = tempfile.mkdtemp(prefix="mcprep_frames")
+		exports.append((key, group, image, folder, cached))
+
+	frames_written = 0
+	try:
+		threads = threads or os.cpu_count() or 1
+		workers = max(min(threads, len(exports)), 1)
+		# spare threads, when exporting fewer animations than there are
+		# threads, go to encoding the frames of each animation
+		shares = [threads // workers + (ind < threads % workers)
+			for ind in range(len(exports))]
+		with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+			futures = [pool.submit(write_sequence_frames, image,
+				group[0]["animation"], folder, group[0]["pass_name"], share)
+				for (key, group, image, folder, cached), share in zip(exports, shares)]
+			results = [future.result() for future in futures]
+
+		for (key, group, image, folder, cached), ticks in zip(exports, results):
+			frames_written += len(set(ticks))
+			if cached:
+				ticks = cache.commit(
+					key, folder, [os.path.basename(path) for path in ticks])
+			for job in group:
+				link_sequence_job(job, ticks)
+	finally:
+		for key, group, image, folder, cached in exports:
+			if not cached and os.path.isdir(folder):
+				shutil.rmtree(folder, ignore_errors=True)
+	return frames_written, hits
+
+
+def link_sequence_job(job, ticks):
+	"""Link the distinct frames of per tick frame paths into a job's folder.
+
+	Sets the job's first_tile, and its frame index per tick as ticks.
+	"""
+	distinct, indices = sequence_frames.tick_indices(ticks)
+	paths = frame_cache.link_frames(distinct, job["seq_path"], job["pass_name"])
+	if job["stamp"]:
+		frame_cache.write_stamp(
+			job["seq_path"], job["pass_name"], job["key"], indices)
+	job["ticks"] = indices
+	job["first_tile"] = bpy.path.abspath(paths[0])
 
-		# save first tile to dict
-		if first_tile:
-			image_dict[img_pass] = first_tile
-	return image_dict, None
+
+def load_sequence_pixels(image_path):
+	"""Read a tiled image's pixels at once, via a temporary image datablock.
+
+	Returns tuple of (pixels, width, height, channels), or None if the image
+	is not perfectly tiled.
+	"""
+	image = bpy.data.images.load(image_path)
+	width, height = image.size
+	tiles = sequence_frames.tile_count(width, height)
+	pixels = None
+	channels = image.channels
+	if tiles:
+		pixels = generate.read_image_pixels(image)
+	image.user_clear()
+	if image.users==0:
+		bpy.data.images.remove(image)
+	else:
+		conf.log("Couldn't remove image block, shouldn't keep: "+image.name)
+	if not tiles:
+		conf.log("Not perfectly tiled image - "+image_path)
+		return None  # any non-titled materials will exit here
+	return pixels, width, height, channels
+
+
+def write_sequence_frames(image, animation, output_folder, basename, threads=None):
+	"""Write the distinct frames of loaded pixels, without using bpy.
+
+	Args:
+		image: tuple from load_sequence_pixels
+		animation: the .mcmeta animation settings
+		output_folder: existing folder to write frames into
+		basename: frame name prefix
+		threads: worker threads for encoding frames, None for one per cpu
+	Returns:
+		List of frame paths shown at each game tick of the animation.
+	"""
+	pixels, width, height, channels = image
+	tiles = sequence_frames.tile_count(width, height)
+	keys = sequence_frames.animation_frames(animation or {}, tiles)
+	conf.log("Exporting {} frames of {} ticks from {} tiles".format(
+		len(sequence_frames.unique_keys(keys)), len(keys), tiles))
+	frames = sequence_frames.export_frames(pixels, width, height, channels,
+		output_folder, basename, keys, threads)
+	conf.log("Finished exporting frame sequence: " + basename)
+	return frames
 
 
 def export_image_to_sequence(image_path, params, output_folder=None, form=None):
-	"""Convert image tiles into image sequence files.
+	"""Convert image tiles into image files of each distinct frame.
 
 	image_path: image filepath source
-	params: Settings from the json file or otherwise on *how* to animate it
-		e.g. ["linear", 2, false] = linear animation, 2 seconds long, and _?
+	params: The image's .mcmeta animation settings on *how* to animate it,
+		e.g. {"frametime": 2, "frames": [0, 1, 1, 2], "interpolate": false}
 	form: jmc2obj, Mineways, or None (default)
 	Returns:
-		Full path of first image on success.
+		List of full frame paths shown at each game tick of the animation,
+		or None if not tiled. Frames shown more than once are written once.
 	Does not auto load new images (or keep temporary ones created around)
-	"""
 
-	# load in the image_path to a temporary datablock, check here if tiled
-	image = bpy.data.images.load(image_path)
-	tiles = image.size[1]/image.size[0]
-	if int(tiles) != tiles:
-		conf.log("Not perfectly tiled image - "+image_path)
-		image.user_clear()
-		if image.users==0:
-			bpy.data.images.remove(image)
-		else:
-			conf.log("Couldn't remove image, shouldn't keep: "+image.name)
-		return None  # any non-titled materials will exit here
-	else:
-		tiles = int(tiles)
-	basename, ext = os.path.splitext(os.path.basename(image_path))
+	Pixels are read once, and frames written as PNG files in parallel
+	without blender, see sequence_frames.
+	"""
+	image = load_sequence_pixels(image_path)
+	if image is None:
+		return None
+	basename = os.path.splitext(os.path.basename(image_path))[0]
 
 	# use the source image's filepath, or fallback to blend file's,
 	if not output_folder:
@@ -296,53 +497,8 @@ def export_image_to_sequence(image_path, params, output_folder=None, form=None):
 		if exc.errno != errno.EEXIST:
 			raise
 
-	# ind = self.get_sequence_int_index(first_img)
-	# base_name = first_img[:-ind]
-	# start_img = int(first_img[-ind:])
-
-	pxlen = len(image.pixels)
-	first_img = None
-	for i in range(tiles):
-		conf.log("Exporting sequence tile " + str(i))
-		tile_name = basename + "_" + str(i+1).zfill(4)
-		out_path = os.path.join(output_folder, tile_name + ext )
-		if not first_img:
-			first_img = out_path
-
-		revi = tiles-i-1 # to reverse index, based on MC tile order
-
-		# new image for copying pixels over to
-		if form != "minways":
-			img_tile = bpy.data.images.new(basename + "-seq-temp",
-				image.size[0], image.size[0], alpha=(image.channels==4))
-			img_tile.filepath = out_path
-
-			if len(img_tile.pixels)*tiles != len(image.pixels):
-				raise Exception("Mis-match of tile size and source sequence")
-			start = int(pxlen/tiles*revi)
-			end = int(pxlen/tiles*(revi+1))
-			img_tile.pixels = image.pixels[start:end]
-			img_tile.save()
-			# verify it now exists
-			if not os.path.isfile(out_path):
-				raise Exception("Did not successfully save tile frame from sequence")
-			img_tile.user_clear()
-			if img_tile.users==0:
-				bpy.data.images.remove(img_tile)
-			else:
-				conf.log("Couldn't remove tile, shouldn't keep: "+img_tile.name)
-		else:
-			img_tile = None
-			raise Exception("No Animate Textures Mineways support yet")
-
-	conf.log("Finished exporting frame sequence: " + basename)
-	image.user_clear()
-	if image.users==0:
-		bpy.data.images.remove(image)
-	else:
-		conf.log("Couldn't remove image block, shouldn't keep: "+image.name)
-
-	return bpy.path.abspath(first_img)
+	frames = write_sequence_frames(image, params, output_folder, basename)
+	return [bpy.path.abspath(path) for path in frames]
 
 
 def get_sequence_int_index(base_name):
@@ -356,10 +512,17 @@ def get_sequence_int_index(base_name):
 	return ind
 
 
-def set_sequence_to_texnode(node, image_path):
+def set_sequence_to_texnode(node, image_path, ticks=None, fps=None):
 	"""Take first image of sequence and apply full sequence to a node.
 
 	Note: this also works as-is where "node" is actually a texture block
+
+	Args:
+		node: image texture node or texture
+		image_path: first image of the sequence
+		ticks: index of the image shown per game tick, if given the frame
+			offset is keyframed to play the images at game speed
+		fps: scene frame rate, needed with ticks
 	"""
 	conf.log("Sequence exporting "+os.path.basename(image_path), vv_only=True)
 	image_path = bpy.path.abspath(image_path)
@@ -371,19 +534,27 @@ def set_sequence_to_texnode(node, image_path):
 	ind = get_sequence_int_index(first_img)
 	base_name = first_img[:-ind]
 	start_img = int(first_img[-ind:])
-	img_sets = [f for f in os.listdir(base_dir)
-				if f.startswith(base_name)]
+	img_sets = frame_cache.sequence_files(base_dir, base_name.rstrip("_"))
 	img_count = len(img_sets)
 
 	image_data = bpy.data.images.load(image_path)
 	conf.log("Loaded in " + str(image_data))
 	image_data.source = 'SEQUENCE'
 	node.image = image_data
+	node.image_user.use_cyclic = True
+	node.image_user.use_auto_refresh = True
+	if ticks:
+		# a single frame long sequence shows the image of the keyed offset
+		node.image_user.frame_duration = 1
+		node.image_user.frame_start = 1
+		keys = sequence_frames.offset_keyframes(ticks, fps)
+		generate.set_offset_keyframes(
+			node, [(frame, offset + start_img - 1) for frame, offset in keys])
+		return
+	generate.set_offset_keyframes(node, None)
 	node.image_user.frame_duration = img_count
 	node.image_user.frame_start = start_img
 	node.image_user.frame_offset = 0
-	node.image_user.use_cyclic = True
-	node.image_user.use_auto_refresh = True
 
 
 # -----------------------------------------------------------------------------
@@ -401,6 +572,11 @@ class MCPREP_OT_prep_animated_textures(bpy.types.Operator):
 		name = "Clear cache of previous animated sequence exports",
 		description = "Always regenerate tile files, even if tiles already exist"
 		)
+	interpolate = bpy.props.BoolProperty(
+		default = True,
+		name = "Interpolate frames",
+		description = "Blend between frames where the resource pack's .mcmeta interpolates"
+		)
 	export_location = bpy.props.EnumProperty(
 		name = "Save location",
 		items = [
@@ -430,11 +606,15 @@ class MCPREP_OT_prep_animated_textures(bpy.types.Operator):
 		subcol.label(text="saves each animation tile to an image on disk.")
 		col.prop(self, "export_location")
 		col.prop(self, "clear_cache")
+		col.prop(self, "interpolate")
 
 	# mid run utility variables
 	affectable_materials = 0
 	affected_materials = 0
 	break_err = None
+	frames_written = 0
+	cache_hits = 0
+	sequence_count = 0
 
 	track_function = "animate_tex"
 	track_param = None
@@ -459,10 +639,30 @@ class MCPREP_OT_prep_animated_textures(bpy.types.Operator):
 		self.affectable_materials = 0
 		self.affected_materials = 0
 		self.break_err = None
+		self.frames_written = 0
+		self.cache_hits = 0
+		self.sequence_count = 0
+
+		# plan all materials first, so shared sources are exported once
+		planned = []
 		for mat in mats:
-			self.process_single_material(context, mat)
+			jobs = self.plan_single_material(mat)
 			if self.break_err:
 				break
+			if jobs:
+				planned.append((mat, jobs))
+
+		if not self.break_err:
+			all_jobs = [job for mat, jobs in planned for job in jobs]
+			self.frames_written, self.cache_hits = export_sequence_jobs(
+				all_jobs, self.clear_cache)
+			self.sequence_count = len(all_jobs)
+
+			# assigning images to nodes needs the main thread
+			engine = context.scene.render.engine
+			for mat, jobs in planned:
+				if assign_material_animation(mat, engine, jobs):
+					self.affected_materials += 1
 
 		if self.break_err:
 			print(self.break_err)
@@ -478,23 +678,24 @@ class MCPREP_OT_prep_animated_textures(bpy.types.Operator):
 				"Animated materials found, but none applied.")
 			return {'CANCELLED'}
 		else:
-			self.report({'INFO'}, "Modified {} material(s)".format(
-				self.affected_materials))
+			self.report({'INFO'},
+				"Modified {} material(s), wrote {} frames, {}/{} cache hits ({:.0%})".format(
+					self.affected_materials, self.frames_written, self.cache_hits,
+					self.sequence_count,
+					self.cache_hits / self.sequence_count if self.sequence_count else 0))
 			self.track_param = context.scene.render.engine
 			return {'FINISHED'}
 
-	def process_single_material(self, context, mat):
-		"""Run animate textures for single material, and fix UVs and saturation"""
-		affectable, affected, err = animate_single_material(
-			mat, context.scene.render.engine,
-			self.export_location, self.clear_cache)
+	def plan_single_material(self, mat):
+		"""Find the sequences to export for a single material"""
+		affectable, jobs, err = plan_material_animation(
+			mat, self.export_location, self.clear_cache, self.interpolate)
 		if err:
 			self.break_err = err
-			return
+			return []
 		if affectable:
 			self.affectable_materials += 1
-		if affected:
-			self.affected_materials += 1
+		return jobs
 
 
 # -----------------------------------------------------------------------------
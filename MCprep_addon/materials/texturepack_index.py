@@ -0,0 +1,453 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Persistent file index of resource packs, to answer texture lookups without
+probing the disk for every candidate path.
+
+The textures folder of a pack is scanned once into a listing per directory,
+which is saved to a cache file keyed by each directory's mtime. Directories
+whose mtime changed are rescanned on their own, everything else is reused.
+Additional passes (normal, specular, displacement) are likewise mapped once
+per directory.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from .. import atomic_write
+
+
+# Subfolders searched in order for a plain block name, '' is the root itself
+SEARCH_SUBFOLDERS = ("", "blocks", "block", "items", "item", "entity",
+	"models", "model")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+MINEWAYS_SUFFIXES = ("-Alpha", "-RGB", "-RGBA")
+
+# Valid extensions and ending names for pass types
+PASS_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tiff")
+PASS_SUFFIXES = (
+	("normal", (" n", "_n", "-n", "normal", "norm", "nrm", "normals")),
+	("specular", (" s", "_s", "-s", "specular", "spec")),
+	("displace", (" d", "_d", "-d", "displace", "disp", "bump", " b", "_b", "-b")))
+
+CACHE_VERSION = 1
+
+# Seconds during which a loaded index is trusted without re-checking mtimes,
+# so that one operator run over thousands of materials stats nothing
+REVALIDATE_SECONDS = 5.0
+
+_indexes = {}  # case normalized textures folder: texturepack_index
+_roots = {}  # resource folder as given: normalized textures folder
+_pass_maps = {}  # directory: pass_map
+
+
+def resolve_textures_folder(resource_folder):
+	"""Returns the textures folder of a pack, given any level above it.
+
+	Accepts the pack root, the assets or minecraft folder or the textures
+	folder itself, returns None if the folder does not exist.
+	"""
+	if not resource_folder or not os.path.isdir(resource_folder):
+		return None
+	for sub in (("textures",),
+			("minecraft", "textures"),
+			("assets", "minecraft", "textures")):
+		path = os.path.join(resource_folder, *sub)
+		if os.path.isdir(path):
+			return path
+	return resource_folder
+
+
+def _casekey(relpath):
+	"""Key of a forward slash relative path, by the filesystem's case rules."""
+	return "/".join(os.path.normcase(part) for part in relpath.split("/"))
+
+
+def _scan_dir(path):
+	"""Returns lists of file and subdirectory names within a directory."""
+	files = []
+	subdirs = []
+	if hasattr(os, "scandir"):  # python 3.5+
+		for entry in os.scandir(path):
+			if entry.is_dir():
+				subdirs.append(entry.name)
+			elif entry.is_file():
+				files.append(entry.name)
+	else:
+		for name in os.listdir(path):
+			if os.path.isdir(os.path.join(path, name)):
+				subdirs.append(name)
+			elif os.path.isfile(os.path.join(path, name)):
+				files.append(name)
+	return files, subdirs
+
+
+class texturepack_index():
+	"""Index of all files within the textures folder of a resource pack.
+
+	Directories are keyed by their path relative to the textures folder using
+	forward slashes, with '' for the textures folder itself. Lookups compare
+	paths by the filesystem's case rules (os.path.normcase), so on windows
+	"block/Stone.PNG" is found as "block/stone.png".
+	"""
+
+	def __init__(self, root, cache_dir=None):
+		self.root = os.path.normpath(root)
+		self.cache_dir = cache_dir
+		self.dirs = {}  # rel dir: (mtime, set of files, list of subdirs)
+		self.lookup = {}  # case key of rel dir: (rel dir, {case key: filename})
+		self.basenames = {}  # case key of filename: list of rel paths
+		self.last_validated = 0
+		self.rescanned = 0  # number of dirs rescanned on the last refresh
+
+	# -------------------------------------------------------------------------
+	# Building, validating and persisting
+	# -------------------------------------------------------------------------
+
+	def cache_file(self):
+		"""Returns path of the persistent cache file for this pack, if any."""
+		if not self.cache_dir:
+			return None
+		key = hashlib.md5(self.root.encode("utf-8")).hexdigest()
+		return os.path.join(self.cache_dir, "texturepack_{}.json".format(key))
+
+	def load(self):
+		"""Load the persisted listing, if present and for this same pack."""
+		path = self.cache_file()
+		if not path or not os.path.isfile(path):
+			return False
+		try:
+			with open(path, 'r') as fd:
+				data = json.load(fd)
+		except (OSError, ValueError):
+			return False
+		if data.get("version") != CACHE_VERSION or data.get("root") != self.root:
+			return False
+		self.dirs = {
+			rel: (entry[0], set(entry[1]), list(entry[2]))
+			for rel, entry in data.get("dirs", {}).items()}
+		return True
+
+	def save(self):
+		"""Write the listing to the cache file, atomically replacing any old."""
+		path = self.cache_file()
+		if not path:
+			return False
+		data = {
+			"version": CACHE_VERSION,
+			"root": self.root,
+			"dirs": {
+				rel: [entry[0], sorted(entry[1]), entry[2]]
+				for rel, entry in self.dirs.items()}
+		}
+		try:
+			atomic_write.write_json(path, data)
+		except OSError:
+			return False
+		return True
+
+	def refresh(self):
+		"""Walk the pack comparing directory mtimes, rescan only changed dirs.
+
+		Unchanged directories reuse their cached listing (and subfolders) so
+		only one stat per directory is made. Returns True if anything changed.
+		"""
+		new_dirs = {}
+		self.rescanned = 0
+		pending = [""]
+		while pending:
+			rel = pending.pop()
+			abs_dir = self.abspath(rel)
+			try:
+				mtime = os.stat(abs_dir).st_mtime
+			except OSError:
+				continue  # removed since parent was scanned
+			cached = self.dirs.get(rel)
+			if cached and cached[0] == mtime:
+				entry = cached
+			else:
+				try:
+					files, subdirs = _scan_dir(abs_dir)
+				except OSError:
+					continue
+				entry = (mtime, set(files), subdirs)
+				self.rescanned += 1
+			new_dirs[rel] = entry
+			for sub in entry[2]:
+				pending.append(sub if not rel else rel + "/" + sub)
+
+		changed = self.rescanned > 0 or set(new_dirs) != set(self.dirs)
+		self.dirs = new_dirs
+		self.last_validated = time.time()
+		if changed or not self.lookup:
+			self._build_lookups()
+		return changed
+
+	def _build_lookups(self):
+		self.lookup = {}
+		self.basenames = {}
+		for rel in sorted(self.dirs):
+			files = {}
+			for name in sorted(self.dirs[rel][1]):
+				key = os.path.normcase(name)
+				files[key] = name
+				relpath = name if not rel else rel + "/" + name
+				self.basenames.setdefault(key, []).append(relpath)
+			self.lookup[_casekey(rel)] = (rel, files)
+
+	def ensure_valid(self, force=False):
+		"""Re-check mtimes if not done recently, persisting any changes."""
+		if not force and time.time() - self.last_validated < REVALIDATE_SECONDS:
+			return
+		if self.refresh():
+			self.save()
+
+	# -------------------------------------------------------------------------
+	# Lookups
+	# -------------------------------------------------------------------------
+
+	def abspath(self, relpath):
+		"""Convert a forward slash relative path into an absolute path."""
+		if not relpath:
+			return self.root
+		return os.path.join(self.root, *relpath.split("/"))
+
+	def relpath(self, abs_path):
+		"""Returns path relative to the textures folder, or None if outside."""
+		abs_path = os.path.normpath(abs_path)
+		case_path = os.path.normcase(abs_path)
+		case_root = os.path.normcase(self.root)
+		if case_path == case_root:
+			return ""
+		if not case_path.startswith(case_root + os.path.sep):
+			return None
+		return abs_path[len(self.root)+1:].replace(os.path.sep, "/")
+
+	def real_dir(self, rel_dir):
+		"""Returns the indexed spelling of a relative directory, None if absent."""
+		entry = self.lookup.get(_casekey(rel_dir))
+		return entry[0] if entry else None
+
+	def real_path(self, relpath):
+		"""Returns the indexed spelling of a relative file path, None if absent."""
+		rel_dir, _, name = relpath.rpartition("/")
+		entry = self.lookup.get(_casekey(rel_dir))
+		if entry is None:
+			return None
+		name = entry[1].get(os.path.normcase(name))
+		if name is None:
+			return None
+		return name if not entry[0] else entry[0] + "/" + name
+
+	def has_file(self, relpath):
+		"""Check if a file exists, from a path relative to the textures folder."""
+		return self.real_path(relpath) is not None
+
+	def list_dir(self, abs_dir):
+		"""Returns file names of a directory in the pack, None if not indexed."""
+		rel = self.relpath(abs_dir)
+		rel = self.real_dir(rel) if rel is not None else None
+		if rel is None:
+			return None
+		return self.dirs[rel][1]
+
+	def contains_file(self, abs_path):
+		"""Returns True/False for files within this pack, None if outside."""
+		rel = self.relpath(abs_path)
+		if rel is None:
+			return None
+		return self.has_file(rel)
+
+	def find_basename(self, filename):
+		"""Returns all relative paths of files with this file name."""
+		return self.basenames.get(os.path.normcase(filename), [])
+
+	def list_files(self, rel_dirs, extensions):
+		"""Returns absolute paths of files in given dirs ending in extensions.
+
+		Extensions are compared lowercase.
+		"""
+		res = []
+		for rel in rel_dirs:
+			rel = self.real_dir(rel)
+			if rel is None:
+				continue
+			entry = self.dirs[rel]
+			res += [self.abspath(name if not rel else rel + "/" + name)
+				for name in entry[1]
+				if os.path.splitext(name.lower())[-1] in extensions]
+		return res
+
+	def find(self, blockname):
+		"""Find the image filepath for a block, in the same priority as probing.
+
+		If the name includes a subpath, that is checked first from the textures
+		folder. Otherwise (or after) the standard subfolders are searched,
+		with a final fallback to the Mineways assets for mineways tile names.
+		"""
+		if "/" in blockname:
+			for ext in IMAGE_EXTENSIONS:
+				relpath = self.real_path(blockname+ext)
+				if relpath is not None:
+					return self.abspath(relpath)
+			base = blockname.rsplit("/", 1)[-1]
+			for ext in IMAGE_EXTENSIONS:
+				relpath = self.real_path(base+ext)
+				if relpath is not None:
+					return self.abspath(relpath)
+
+		for sub in SEARCH_SUBFOLDERS:
+			if self.real_dir(sub) is None:
+				continue
+			for ext in IMAGE_EXTENSIONS:
+				relpath = self.real_path(
+					blockname+ext if not sub else sub + "/" + blockname+ext)
+				if relpath is not None:
+					return self.abspath(relpath)
+
+		for suffix in MINEWAYS_SUFFIXES:
+			if blockname.endswith(suffix):
+				relpath = self.real_path("mineways_assets/mineways"+suffix+".png")
+				if relpath is not None:
+					return self.abspath(relpath)
+		return None
+
+
+def get_index(resource_folder, cache_dir=None, refresh=False):
+	"""Returns the index for a resource pack folder, building it if needed.
+
+	The textures folder of each resource folder is resolved once, so a lookup
+	of an already loaded index only checks the disk every REVALIDATE_SECONDS.
+
+	Args:
+		resource_folder: any folder level of the pack above the textures folder
+		cache_dir: folder to persist the index in between sessions, or a
+			function returning it, only called when the index is first loaded
+		refresh: force re-resolving the folder and re-checking mtimes now
+	Returns:
+		texturepack_index, or None if the folder does not exist
+	"""
+	root = None if refresh else _roots.get(resource_folder)
+	if root is None:
+		root = resolve_textures_folder(resource_folder)
+		if not root:
+			return None
+		root = os.path.normpath(root)
+		_roots[resource_folder] = root
+	index = _indexes.get(os.path.normcase(root))
+	if index is None:
+		if callable(cache_dir):
+			cache_dir = cache_dir()
+		index = texturepack_index(root, cache_dir)
+		index.load()
+		_indexes[os.path.normcase(root)] = index
+	index.ensure_valid(force=refresh)
+	return index
+
+
+def get_index_for_path(abs_path):
+	"""Returns an already loaded index which contains the given path, if any."""
+	for index in list(_indexes.values()):
+		if index.relpath(abs_path) is not None:
+			index.ensure_valid()
+			return index
+	return None
+
+
+def clear_indexes():
+	"""Drop all in-memory indexes, persisted cache files are kept."""
+	_indexes.clear()
+	_roots.clear()
+	_pass_maps.clear()
+
+
+class pass_map():
+	"""Map of the additional pass files within one directory.
+
+	Files are classified once by pass type from their name endings, leaving
+	only the (few) pass files to compare against each queried base name.
+	"""
+
+	def __init__(self, directory, filenames, mtime):
+		self.directory = directory
+		self.mtime = mtime
+		self.pass_files = []  # (lowercase name, filename, pass types)
+		self._found = {}  # lowercase base name: passes dict
+
+		for filename in sorted(filenames):
+			stem, ext = os.path.splitext(filename)
+			if ext.lower() not in PASS_EXTENSIONS:
+				continue
+			stem = stem.lower()
+			types = [pass_type for pass_type, suffixes in PASS_SUFFIXES
+				if stem.endswith(suffixes)]
+			if types:
+				self.pass_files.append((filename.lower(), filename, types))
+
+	def find(self, base_name):
+		"""Returns dict of pass type: filepath for files starting with base_name.
+
+		Same as comparing each file of the folder in turn, the last file in
+		name order wins where several files match the same pass type.
+		"""
+		base_name = base_name.lower()
+		res = self._found.get(base_name)
+		if res is not None:
+			return dict(res)
+		res = {}
+		for lower_name, filename, types in self.pass_files:
+			if lower_name.startswith(base_name):
+				for pass_type in types:
+					res[pass_type] = os.path.join(self.directory, filename)
+		self._found[base_name] = res
+		return dict(res)
+
+
+def get_pass_map(directory):
+	"""Returns the pass map of a directory, rebuilt only if its mtime changed.
+
+	Directories within a loaded resource pack index use that listing, others
+	are listed here. Returns None if the directory cannot be read.
+	"""
+	directory = os.path.normpath(directory)
+	index = get_index_for_path(directory)
+	rel = index.relpath(directory) if index else None
+	rel = index.real_dir(rel) if rel is not None else None
+	if rel is not None:
+		mtime, filenames, _ = index.dirs[rel]
+	else:
+		try:
+			mtime = os.stat(directory).st_mtime
+		except OSError:
+			return None
+		filenames = None
+
+	cached = _pass_maps.get(directory)
+	if cached and cached.mtime == mtime:
+		return cached
+	if filenames is None:
+		try:
+			filenames, _ = _scan_dir(directory)
+		except OSError:
+			return None
+	res = pass_map(directory, filenames, mtime)
+	_pass_maps[directory] = res
+	return res
@@ -0,0 +1,238 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Numeric UV operations on flat arrays of mesh data.
+
+Mesh data is read by the caller in bulk with foreach_get, e.g. the loop
+uv coordinates as [u0, v0, u1, v1, ...] and the polygon loop_start and
+loop_total values, and results are written back with foreach_set. NumPy is
+used when available, falling back to plain python otherwise.
+"""
+
+import itertools
+import math
+import operator
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+class alpha_table():
+	"""Summed-area table of an image's alpha channel.
+
+	Built once per image, after which the summed alpha of any rectangle of
+	pixels is a constant time lookup of four corners.
+	"""
+
+	def __init__(self, alpha, width, height):
+		"""Build the table.
+
+		Args:
+			alpha: flat sequence of width*height alpha values, rows bottom up
+			width: image width in pixels
+			height: image height in pixels
+		"""
+		self.width = width
+		self.height = height
+		stride = width + 1
+
+		if numpy is not None:
+			table = numpy.zeros((height + 1, stride), dtype=numpy.float64)
+			table[1:, 1:] = numpy.asarray(alpha, dtype=numpy.float64).reshape(
+				height, width).cumsum(axis=0).cumsum(axis=1)
+			self.table = table
+			return
+
+		table = [0.0] * stride
+		prev = table
+		for row in range(height):
+			row_sums = itertools.accumulate(alpha[row*width:(row+1)*width])
+			prev = [0.0] + list(map(operator.add, prev[1:], row_sums))
+			table.extend(prev)
+		self.table = table
+
+	def sum(self, col_min, col_max, row_min, row_max):
+		"""Returns summed alpha of columns [col_min, col_max), rows likewise."""
+		if numpy is not None:
+			table = self.table
+			return float(table[row_max, col_max] - table[row_min, col_max]
+				- table[row_max, col_min] + table[row_min, col_min])
+		stride = self.width + 1
+		table = self.table
+		return (table[row_max*stride + col_max] - table[row_min*stride + col_max]
+			- table[row_max*stride + col_min] + table[row_min*stride + col_min])
+
+
+def _pixel_range(low, high, size):
+	"""Pixels [start, end) covered by a uv range, wrapped into the 0-1 tile.
+
+	Shifts by whole tiles so the range starts within the image, where the
+	range is measured from, then clamps to the image size.
+	"""
+	shift = math.floor(low)
+	start = min(max(int(round((low - shift) * size)), 0), size)
+	end = min(max(int(round((high - shift) * size)), 0), size)
+	return start, end
+
+
+def face_uv_bounds(uvs, loop_starts, loop_totals):
+	"""Per face min and max of its loop uvs.
+
+	Returns four lists (or arrays): u_min, u_max, v_min, v_max, where faces
+	without loops have 0 for each.
+	"""
+	if numpy is not None and len(loop_starts):
+		uvs = numpy.asarray(uvs, dtype=numpy.float64).reshape(-1, 2)
+		starts = numpy.asarray(loop_starts, dtype=numpy.int64)
+		totals = numpy.asarray(loop_totals, dtype=numpy.int64)
+		# reduceat needs ascending starts of non empty faces, as blender makes
+		valid = totals > 0
+		if valid.all() and (numpy.diff(starts) >= 0).all() and len(uvs):
+			res = []
+			for axis in (0, 1):
+				res.append(numpy.minimum.reduceat(uvs[:, axis], starts))
+				res.append(numpy.maximum.reduceat(uvs[:, axis], starts))
+			return res[0], res[1], res[2], res[3]
+
+	u_min = []
+	u_max = []
+	v_min = []
+	v_max = []
+	for start, total in zip(loop_starts, loop_totals):
+		if not total:
+			u_min.append(0.0)
+			u_max.append(0.0)
+			v_min.append(0.0)
+			v_max.append(0.0)
+			continue
+		us = uvs[2*start:2*(start+total):2]
+		vs = uvs[2*start+1:2*(start+total):2]
+		u_min.append(min(us))
+		u_max.append(max(us))
+		v_min.append(min(vs))
+		v_max.append(max(vs))
+	return u_min, u_max, v_min, v_max
+
+
+def face_alpha_ratios(uvs, loop_starts, loop_totals, material_indices, tables):
+	"""Average alpha of the image pixels each face covers in uv space.
+
+	Faces are assumed to be roughly rectangular in uv space, so the pixels
+	of the face's uv bounding box are averaged. Faces covering no pixels
+	count as fully transparent.
+
+	Args:
+		uvs: flat loop uv coordinates
+		loop_starts, loop_totals: per polygon loop ranges
+		material_indices: per polygon material slot index
+		tables: list of alpha_table (or None) per material slot
+	Returns:
+		List of alpha per face, None for faces with fewer than 3 loops or
+		without an image to check.
+	"""
+	u_min, u_max, v_min, v_max = face_uv_bounds(uvs, loop_starts, loop_totals)
+	ratios = []
+	for ind, total in enumerate(loop_totals):
+		mat_ind = material_indices[ind]
+		table = tables[mat_ind] if 0 <= mat_ind < len(tables) else None
+		if total < 3 or table is None:
+			ratios.append(None)
+			continue
+		col_min, col_max = _pixel_range(u_min[ind], u_max[ind], table.width)
+		row_min, row_max = _pixel_range(v_min[ind], v_max[ind], table.height)
+		count = (col_max - col_min) * (row_max - row_min)
+		if count <= 0:
+			ratios.append(0.0)
+			continue
+		ratios.append(table.sum(col_min, col_max, row_min, row_max) / count)
+	return ratios
+
+
+def scale_face_uvs(uvs, loop_starts, loop_totals, scale, face_select=None,
+		loop_select=None):
+	"""Scale the uvs of each face towards the face's uv center, in place.
+
+	Args:
+		uvs: flat loop uv coordinates, modified in place
+		loop_starts, loop_totals: per polygon loop ranges
+		scale: factor, 1 keeping uvs as they are and 0 collapsing them
+		face_select: per polygon flags, only selected faces are scaled
+		loop_select: per loop uv select flags, only selected loops are used
+			for the center and scaled
+	Returns:
+		Number of loops moved.
+	"""
+	if numpy is not None and isinstance(uvs, numpy.ndarray):
+		return _scale_face_uvs_numpy(
+			uvs, loop_starts, loop_totals, scale, face_select, loop_select)
+
+	moved = 0
+	for ind, start in enumerate(loop_starts):
+		if face_select is not None and not face_select[ind]:
+			continue
+		loops = range(start, start + loop_totals[ind])
+		if loop_select is not None:
+			loops = [loop for loop in loops if loop_select[loop]]
+		if not loops:
+			continue
+		center_u = sum(uvs[2*loop] for loop in loops) / len(loops)
+		center_v = sum(uvs[2*loop+1] for loop in loops) / len(loops)
+		for loop in loops:
+			uvs[2*loop] = uvs[2*loop]*scale + center_u*(1-scale)
+			uvs[2*loop+1] = uvs[2*loop+1]*scale + center_v*(1-scale)
+		moved += len(loops)
+	return moved
+
+
+def _scale_face_uvs_numpy(uvs, loop_starts, loop_totals, scale, face_select,
+		loop_select):
+	"""Vectorized scale_face_uvs, per loop face index from the loop ranges."""
+	uv_pairs = uvs.reshape(-1, 2)
+	starts = numpy.asarray(loop_starts, dtype=numpy.int64)
+	totals = numpy.asarray(loop_totals, dtype=numpy.int64)
+	face_count = len(starts)
+
+	# the face of each loop, allowing for loop ranges in any order
+	loop_face = numpy.full(len(uv_pairs), -1, dtype=numpy.int64)
+	offsets = numpy.arange(totals.sum()) - numpy.repeat(
+		numpy.cumsum(totals) - totals, totals)
+	loop_face[numpy.repeat(starts, totals) + offsets] = numpy.repeat(
+		numpy.arange(face_count), totals)
+
+	mask = loop_face >= 0
+	if face_select is not None:
+		mask &= numpy.asarray(face_select, dtype=bool)[
+			numpy.maximum(loop_face, 0)]
+	if loop_select is not None:
+		mask &= numpy.asarray(loop_select, dtype=bool)
+	if not mask.any():
+		return 0
+
+	faces = loop_face[mask]
+	counts = numpy.bincount(faces, minlength=face_count)
+	counts[counts == 0] = 1
+	centers = numpy.empty((face_count, 2), dtype=numpy.float64)
+	for axis in (0, 1):
+		centers[:, axis] = numpy.bincount(
+			faces, weights=uv_pairs[mask, axis], minlength=face_count) / counts
+
+	uv_pairs[mask] = uv_pairs[mask]*scale + centers[faces]*(1-scale)
+	return int(mask.sum())
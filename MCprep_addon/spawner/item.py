@@ -24,6 +24,7 @@ from bpy_extras.io_utils import ImportHelper
 from .. import conf
 from .. import util
 from .. import tracking
+from ..materials import generate
 
 try:
 	import bpy.utils.previews
@@ -49,29 +50,13 @@ def reload_items(context):
 		except:
 			conf.log("MCPREP: Failed to remove icon set, items")
 
-	if not os.path.isdir(resource_folder):
+	# refresh, as this is also the operator to pick up pack changes on disk
+	index = generate.get_texturepack_index(resource_folder, refresh=True)
+	if index is None:
 		conf.log("Error, resource folder does not exist")
 		return
-	elif os.path.isdir(os.path.join(resource_folder,"textures")):
-		resource_folder = os.path.join(resource_folder,"textures")
-	elif os.path.isdir(os.path.join(resource_folder,"minecraft","textures")):
-		resource_folder = os.path.join(resource_folder,"minecraft","textures")
-	elif os.path.isdir(os.path.join(resource_folder,"assets","minecraft","textures")):
-		resource_folder = os.path.join(resource_folder,"assets","minecraft","textures")
-
-	search_paths = [
-		resource_folder,
-		os.path.join(resource_folder,"items"),
-		os.path.join(resource_folder,"item")]
-	files = []
-
-	for path in search_paths:
-		if not os.path.isdir(path):
-			continue
-		files += [os.path.join(path, item_file)
-					for item_file in os.listdir(path)
-					if os.path.isfile(os.path.join(path, item_file))
-					and os.path.splitext(item_file.lower())[-1] in extensions]
+	files = index.list_files(["", "items", "item"], extensions)
+
 	for i, item_file in enumerate(sorted(files)):
 		basename = os.path.splitext(os.path.basename(item_file))[0]
 		asset = mcprep_props.item_list.add()
@@ -17,19 +17,21 @@
 # ##### END GPL LICENSE BLOCK #####
 
 
-import math
 import os
-import random
 import time
+import traceback
 
 import bpy
 import mathutils
 
 # addon imports
+from .. import buffers
 from .. import conf
 from ..materials import generate
 from .. import util
 from .. import tracking
+from . import meshswap_engine
+from . import meshswap_manifest
 
 
 # -----------------------------------------------------------------------------
@@ -39,6 +41,103 @@ from .. import tracking
 meshswap_cache = {}
 meshswap_cache_path = None
 
+# Blocks added per chunk when adding an object per block, and the time spent
+# per timer event when meshswapping interactively
+CHUNK_BLOCKS = 500
+MODAL_STEP_TIME = 0.1
+
+# Phase timings of the last meshswap run, see meshswap_engine.timing_report
+last_timing_report = None
+
+def _id_items(idblock):
+	"""Custom properties of a datablock, skipping datablock pointers."""
+	items = []
+	for key in idblock.keys():
+		value = idblock[key]
+		if hasattr(value, "name"):
+			continue # will NOT work if property UI, or a datablock
+		if hasattr(value, "to_list"):
+			value = value.to_list()
+		items.append((key, value))
+	return items
+
+
+def read_meshswap_library(meshswap_path):
+	"""Read the groups, objects and their swap props of a meshswap library.
+
+	Datablocks are linked in just long enough to read custom properties, and
+	removed again unless they were already linked before.
+	"""
+	if hasattr(bpy.data, "groups"): # blender 2.7
+		get_attr = "groups"
+	else: # 2.8
+		get_attr = "collections"
+	pre_libs = set(bpy.data.libraries)
+	pre_ids = set(getattr(bpy.data, get_attr)) | set(bpy.data.objects)
+
+	with bpy.data.libraries.load(meshswap_path, link=True) as (data_from, data_to):
+		setattr(data_to, get_attr, list(getattr(data_from, get_attr)))
+		data_to.objects = list(data_from.objects)
+
+	groups = {}
+	objects = {}
+	for grp in getattr(data_to, get_attr):
+		if grp is not None:
+			groups[grp.name] = meshswap_manifest.swap_props(_id_items(grp))
+	for obj in data_to.objects:
+		if obj is not None:
+			objects[obj.name] = meshswap_manifest.swap_props(_id_items(obj))
+
+	# clean up what was only linked for reading, objects before their groups
+	linked = [block for block in list(data_to.objects) + list(getattr(data_to, get_attr))
+		if block is not None and block not in pre_ids]
+	if hasattr(bpy.data, "batch_remove"):  # 2.81+
+		bpy.data.batch_remove(ids=linked)
+	else:
+		for block in linked:
+			if isinstance(block, bpy.types.Object):
+				bpy.data.objects.remove(block)
+			else:
+				getattr(bpy.data, get_attr).remove(block)
+	for lib in list(bpy.data.libraries):
+		if lib not in pre_libs:
+			try:
+				bpy.data.libraries.remove(lib)
+			except (AttributeError, RuntimeError, ReferenceError):
+				pass # removed along with its datablocks, or unsupported
+	return groups, objects
+
+
+def get_meshswap_manifest(context, clear=False):
+	"""Returns manifest of the meshswap library, reading the blend if needed.
+
+	The manifest is persisted in the user cache folder, so the library blend
+	is only read again once it changes.
+	"""
+	meshswap_path = os.path.normpath(
+		bpy.path.abspath(context.scene.meshswap_path))
+	if clear:
+		meshswap_manifest.clear_manifests()
+	manifest = meshswap_manifest.get_manifest(
+		meshswap_path, util.get_cache_dir("meshswap"))
+	canon_mapping = {}
+	if not conf.json_data:
+		util.load_mcprep_json()
+	if conf.json_data and "blocks" in conf.json_data:
+		canon_mapping = conf.json_data["blocks"].get("canon_mapping_block", {})
+
+	if clear or manifest.hash is None:
+		if not os.path.isfile(meshswap_path):
+			return manifest
+		conf.log("Reading meshswap library "+meshswap_path)
+		groups, objects = read_meshswap_library(meshswap_path)
+		manifest.set_contents(groups, objects, canon_mapping)
+		manifest.save()
+	elif manifest.update_aliases(canon_mapping):
+		manifest.save()
+	return manifest
+
+
 def get_meshswap_cache(context, clear=False):
 	"""Load groups/objects from meshswap lib if not cached, return key vars."""
 	global meshswap_cache
@@ -49,30 +148,17 @@ def get_meshswap_cache(context, clear=False):
 		meshswap_cache_path = meshswap_path
 		clear = True
 	if meshswap_cache_path != meshswap_path:
+		meshswap_cache_path = meshswap_path
 		clear = True
 
 	if not meshswap_cache or clear is True:
-		meshswap_cache = {"groups":[], "objects":[]}
-		with bpy.data.libraries.load(meshswap_path) as (data_from, data_to):
-			if hasattr(data_from, "groups"): # blender 2.7
-				get_attr = "groups"
-				prefix = "Group/"
-			else: # 2.8
-				get_attr = "collections"
-				prefix = "Collection/"
-			grp_list = list(getattr(data_from, get_attr))
-			# canons = [generate.get_mc_canonical_name(grp) for grp in grp_list]
-			meshswap_cache["groups"] = grp_list
-			for obj in list(data_from.objects):
-				if obj in meshswap_cache["groups"]:
-					# conf.log("Skipping meshwap obj already in cache: "+str(obj))
-					continue
-				# ignore list? e.g. Point.001,
-				# canon = generate.get_mc_canonical_name(obj)
-				meshswap_cache["objects"].append(obj)
-		return meshswap_cache
-	else:
-		return meshswap_cache
+		# answered from the persisted manifest, only reading the blend file
+		# if changed (or explicitly reloaded)
+		manifest = get_meshswap_manifest(context)
+		meshswap_cache = {
+			"groups": sorted(manifest.groups),
+			"objects": sorted(manifest.objects)}
+	return meshswap_cache
 
 
 def getMeshswapList(context):
@@ -101,6 +187,55 @@ def move_assets_to_excluded_layer(context, collections):
 		initial_view_coll.collection.children.unlink(grp)
 
 
+def read_mesh_arrays(mesh):
+	"""Read a mesh's geometry, materials and uvs in bulk."""
+	co = buffers.float_buffer(len(mesh.vertices) * 3)
+	mesh.vertices.foreach_get("co", co)
+	edges = buffers.int_buffer(len(mesh.edges) * 2)
+	mesh.edges.foreach_get("vertices", edges)
+	loop_verts = buffers.int_buffer(len(mesh.loops))
+	mesh.loops.foreach_get("vertex_index", loop_verts)
+	loop_starts = buffers.int_buffer(len(mesh.polygons))
+	mesh.polygons.foreach_get("loop_start", loop_starts)
+	loop_totals = buffers.int_buffer(len(mesh.polygons))
+	mesh.polygons.foreach_get("loop_total", loop_totals)
+	material_indices = buffers.int_buffer(len(mesh.polygons))
+	mesh.polygons.foreach_get("material_index", material_indices)
+	smooth = [False] * len(mesh.polygons)
+	mesh.polygons.foreach_get("use_smooth", smooth)
+
+	arrays = meshswap_engine.mesh_arrays(co, edges, loop_verts, loop_starts,
+		loop_totals, material_indices, smooth)
+	for layer in mesh.uv_layers:
+		uvs = buffers.float_buffer(len(mesh.loops) * 2)
+		layer.data.foreach_get("uv", uvs)
+		arrays.uvs[layer.name] = uvs
+	return arrays
+
+
+def write_mesh_arrays(mesh, arrays):
+	"""Fill an empty mesh from mesh_arrays in bulk."""
+	mesh.vertices.add(arrays.vertex_count)
+	mesh.vertices.foreach_set("co", arrays.co)
+	mesh.edges.add(arrays.edge_count)
+	mesh.edges.foreach_set("vertices", arrays.edges)
+	mesh.loops.add(arrays.loop_count)
+	mesh.loops.foreach_set("vertex_index", arrays.loop_verts)
+	mesh.polygons.add(arrays.polygon_count)
+	mesh.polygons.foreach_set("loop_start", arrays.loop_starts)
+	mesh.polygons.foreach_set("loop_total", arrays.loop_totals)
+	mesh.polygons.foreach_set("material_index", arrays.material_indices)
+	mesh.polygons.foreach_set("use_smooth", [bool(val) for val in arrays.smooth])
+
+	for name, uvs in arrays.uvs.items():
+		if hasattr(mesh, "uv_textures"): # 2.7
+			mesh.uv_textures.new(name=name)
+		else:
+			mesh.uv_layers.new(name=name)
+		mesh.uv_layers[name].data.foreach_set("uv", uvs)
+	mesh.update(calc_edges=True)
+
+
 def update_meshswap_path(self, context):
 	"""for UI list path callback"""
 	conf.log("Updating meshswap path", vv_only=True)
@@ -149,14 +284,6 @@ def updateMeshswapList(context):
 		item.description = itm[2]
 
 
-class face_struct():
-	"""Structure class for preprocessed faces of a mesh"""
-	def __init__(self, normal_coord, global_coord, local_coord):
-		self.n = normal_coord
-		self.g = global_coord
-		self.l = local_coord
-
-
 # -----------------------------------------------------------------------------
 # Mesh swap functions
 # -----------------------------------------------------------------------------
@@ -241,20 +368,22 @@ class MCPREP_OT_meshswap_spawner(bpy.types.Operator):
 			# if blender 2.8, see if collection part of the MCprepLib coll.
 			use_cache = True
 		else:
-			util.bAppendLink(os.path.join(meshSwapPath,method), block, toLink)
+			for ob in util.get_objects_conext(context):
+				util.select_set(ob, False)
+			key = "objects" if method == "Object" else "collections"
+			loaded = util.bulk_append(
+				meshSwapPath, {key: [block]}, link=toLink, context=context)
 
 		if method=="Object":
 			# Object-level disabled! Must have better
 			# asset management for this to work
-			for ob in bpy.context.selected_objects:
-				if ob.type != 'MESH':
-					util.select_set(ob, False)
-			try:
-				importedObj = bpy.context.selected_objects[0]
-			except:
-				print("selected object not found") #in case nothing selected.. which happens even during selection?
+			imported = [ob for ob in loaded["objects"] if ob.type == 'MESH']
+			if not imported:
+				print("imported object not found")
 				self.report({'WARNING'}, "Imported object not found")
 				return {'CANCELLED'}
+			importedObj = imported[0]
+			util.select_set(importedObj, True)
 			importedObj["MCprep_noSwap"] = 1
 			importedObj.location = self.location
 			if self.prep_materials is True:
@@ -432,6 +561,7 @@ class MCPREP_OT_reload_meshswap(bpy.types.Operator):
 	def execute(self, context):
 		if not os.path.isfile(bpy.path.abspath(context.scene.meshswap_path)):
 			self.report({'WARNING'}, "Meshswap blend file does not exist")
+		get_meshswap_manifest(context, clear=True)
 		get_meshswap_cache(context, clear=True)
 		updateMeshswapList(context)
 		return {'FINISHED'}
@@ -469,9 +599,15 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 		description=("Join together swapped blocks of the same type "
 			"(unless swapped with a group)"))
 	use_dupliverts = bpy.props.BoolProperty(
-		name="Use dupliverts (faster)",
-		default=True,
-		description="Use dupliverts to add meshes")
+		name="Instance blocks (faster)",
+		default=False,
+		description=("Place blocks as instances on one point cloud object per "
+			"block type, instead of adding an object per block"))
+	share_mesh_data = bpy.props.BoolProperty(
+		name="Share mesh data",
+		default=False,
+		description=("Add blocks as linked duplicates sharing one mesh per "
+			"block type, saving memory and file size (when not joining)"))
 	link_groups = bpy.props.BoolProperty(
 		name="Link groups",
 		default=False,
@@ -494,6 +630,15 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 		name="Use filmic lamp values",
 		default=False,
 		description="Set added lamp values with appropriate filmic rendering values")
+	instance_budget = bpy.props.IntProperty(
+		name="Instance budget",
+		default=0,
+		min=0,
+		description=("Stop before swapping any object that would bring the "
+			"number of placed blocks over this, 0 for no limit"))
+	run_modal = bpy.props.BoolProperty(
+		default=False,
+		options={'HIDDEN', 'SKIP_SAVE'})
 
 
 	@classmethod
@@ -502,6 +647,7 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 		return addon_prefs.MCprep_exporter_type != "(choose)" and context.mode == 'OBJECT'
 
 	def invoke(self, context, event):
+		self.run_modal = True # interactive, so run in chunks
 		return context.window_manager.invoke_props_dialog(
 			self, width=400*util.ui_scale())
 
@@ -517,12 +663,13 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 
 		layout.label(text="GENERAL SETTINGS")
 		row = layout.row()
-		# row.prop(self,"use_dupliverts") # coming soon
+		row.prop(self,"use_dupliverts")
 		row.prop(self,"meshswap_join")
 		row = layout.row()
 		row.prop(self,"link_groups")
 		row.prop(self,"prep_materials")
 		row = layout.row()
+		row.prop(self,"share_mesh_data")
 		if not util.bv28():
 			row.prop(self,"append_layer")
 
@@ -541,12 +688,67 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 			col.label(text="WARNING: May take a long time to process!!", icon="ERROR")
 			col.label(text="If you selected a large number of blocks to meshswap,", icon="BLANK1")
 			col.label(text="consider using a smaller area closer to the camera", icon="BLANK1")
+			col.label(text="or an instance budget. Press Esc to stop early.", icon="BLANK1")
+		row = layout.row()
+		row.prop(self, "instance_budget")
 
 	track_function = "meshswap"
 	track_exporter = None
 	@tracking.report_error
 	def execute(self, context):
-		tprep = time.time()
+		res = self.start_swap(context)
+		if res:
+			return res
+
+		redo = hasattr(self, "is_repeat") and self.is_repeat()
+		if self.run_modal and context.window and not redo:
+			# process in chunks on a timer, to show progress and allow escape
+			wm = context.window_manager
+			self.timer = wm.event_timer_add(0.01, window=context.window)
+			wm.modal_handler_add(self)
+			return {'RUNNING_MODAL'}
+
+		for _ in self.steps:
+			pass
+		return self.finish_swap(context)
+
+	def modal(self, context, event):
+		if event.type == 'ESC':
+			self.steps.close()
+			self.rollback_pending(context)
+			self.stop_reason = "cancelled"
+			return self.end_modal(context)
+		elif event.type != 'TIMER':
+			return {'RUNNING_MODAL'} # block other interaction meanwhile
+
+		tstart = time.time()
+		try:
+			while time.time() - tstart < MODAL_STEP_TIME:
+				next(self.steps)
+		except StopIteration:
+			return self.end_modal(context)
+		except Exception:
+			print(traceback.format_exc())
+			self.rollback_pending(context)
+			self.stop_reason = "error"
+			self.end_modal(context)
+			self.report({'ERROR'}, "Meshswap failed, see console for details")
+			return {'CANCELLED'}
+		context.window_manager.progress_update(self.units_done)
+		return {'RUNNING_MODAL'}
+
+	def end_modal(self, context):
+		context.window_manager.event_timer_remove(self.timer)
+		self.timer = None
+		return self.finish_swap(context)
+
+	def start_swap(self, context):
+		"""Prepare the swap of all selected objects, before the primary loop.
+
+		Returns a result set if cancelled, else None with self.steps ready to
+		run the swaps.
+		"""
+		self.tprep = time.time()
 		addon_prefs = util.get_user_preferences(context)
 		self.track_exporter = addon_prefs.MCprep_exporter_type
 
@@ -560,43 +762,63 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 
 		# Assign vars used across operator
 		self.runcount = 0 # counter; if zero by end, raise error nothing matched
-		objList = self.prep_obj_list(context)
-		selList = context.selected_objects # re-grab having made new objects
-		new_groups = [] # for new imported groups
-		removeList = [] # for objects that should be removed
-		new_objects = [] # all the newly added objects
-
-		# setup the progress bar
-		denom = len(objList)
-		conf.log("Meshswap to check over {} objects".format(denom))
-		bpy.context.window_manager.progress_begin(0, 100)
-
-		tprep = time.time() - tprep
-		t0s = [] # start of loop
-		t1s = [] # between prep and face process
-		t2s = [] # between face process and
-		t3s = [] # end of loop
+		self.shared_meshes = 0 # mesh datablocks not created, being shared
+		self.shared_bytes = 0 # estimated size of those meshes
+		self.objList = self.prep_obj_list(context)
+		self.selList = list(context.selected_objects) # re-grab having made new objects
+		self.dropped = set() # objects in selList not to reselect, e.g. joined
+		self.removeList = [] # for objects that should be removed
+		self.new_objects = [] # all the newly added objects
+		self.pending = [] # blocks added for the object being swapped
+		self.stop_reason = None # set if stopped before swapping all objects
+
+		# plan every swap from the library manifest, then import each needed
+		# asset once for all objects using it
+		self.swapGens = [util.nameGeneralize(swap.name) for swap in self.objList]
+		self.plans = [self.checkExternal(context, swapGen) for swapGen in self.swapGens]
+		self.new_groups, self.bases = self.import_assets(context, self.plans)
+
+		# setup the progress bar, measured in faces to process
+		self.units = [max(len(swap.data.polygons), 1) for swap in self.objList]
+		self.units_done = 0
+		conf.log("Meshswap to check over {} objects".format(len(self.objList)))
+		context.window_manager.progress_begin(0, max(sum(self.units), 1))
+
+		self.tprep = time.time() - self.tprep
+		self.t0s = [] # start of loop
+		self.t1s = [] # between prep and face process
+		self.t2s = [] # between face process and
+		self.t3s = [] # end of loop
+		self.swapped_names = [] # per timing row
+		self.swapped_counts = []
+		self.steps = self.swap_steps(context)
+
+	def swap_steps(self, context):
+		"""Swap each object in turn, yielding after each bounded chunk of work.
+
+		Objects are swapped entirely before being marked for removal, so
+		stopping between steps leaves any remaining objects untouched, after
+		removing the blocks of the object in progress (see rollback_pending).
+		"""
+		t0s = self.t0s
+		t1s = self.t1s
+		t2s = self.t2s
+		t3s = self.t3s
 
 		# primary loop, for each OBJECT needing swapping
-		for iter_index, swap in enumerate(objList):
-			t0s.append(time.time())
-			t1s.append(t0s[-1])
-			t2s.append(t0s[-1])
-			t3s.append(t0s[-1])
-			bpy.context.window_manager.progress_update(iter_index/denom)
-			swapGen = util.nameGeneralize(swap.name)
-			#swapGen = generate.get_mc_canonical_name(swap.name)
+		for iter_index, swap in enumerate(self.objList):
+			units_start = self.units_done
+			self.units_done += self.units[iter_index] # unless swapped below
+			swapGen = self.swapGens[iter_index]
 			conf.log("Simplified name: {x}".format(x=swapGen))
-			swapProps = self.checkExternal(context, swapGen) # IMPORTS, gets lists properties, etc
+			swapProps = self.plans[iter_index]
 
 			if swapProps == False: # issue in swapProps, e.g. not a mesh or not in lib or some error
 				continue
 
-			if swapProps.get('new_groups'):
-				new_groups += swapProps['new_groups']
 			# special cases, for "extra" mesh pieces we don't want around afterwards
 			if swapProps['removable']:
-				removeList.append(swap)
+				self.removeList.append(swap)
 				continue
 			# just selecting mesh with same name and if in objList
 			if not (swapProps['meshSwap'] or swapProps['groupSwap']):
@@ -604,9 +826,11 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 
 			conf.log("Swapping '{x}', simplified name '{y}".format(
 					x=swap.name, y=swapGen))
+			t0s.append(time.time())
+			paused = 0 # time between chunks, not part of the timings
 
 			# loop through each face or "polygon" of mesh, throw out invalids
-			t1s[-1] = time.time()
+			t1s.append(time.time())
 			offset = 0.5 if self.track_exporter == 'Mineways' else 0
 			facebook = self.get_face_list(swap, offset)
 
@@ -614,32 +838,53 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 				for obj in context.selected_objects:
 					util.select_set(obj, False)
 
-			# removing duplicates and checking orientation
-			instance_configs = {} # structure of: "x-y-z":[[x,y,z], [xr, yr, zr]]
-			for face in facebook:
-				# updates instance_configs
-				self.proccess_poly_orientations(face, swapProps, swapGen, instance_configs)
+			# removing duplicates and checking orientation, all faces at once
+			placements = meshswap_engine.plan_placements(
+				facebook, swapProps, self.track_exporter, swapGen)
+			conf.log("{} faces to {} placements".format(
+				len(facebook), len(placements)), vv_only=True)
+
+			# stop before any object that would go over the instance budget
+			if (self.instance_budget
+					and self.runcount + len(placements) > self.instance_budget):
+				for times in (t0s, t1s):
+					times.pop()
+				self.units_done = units_start
+				self.stop_reason = "budget"
+				return
 
 			# Primary function for adding the actual instances
 			# Critical path process section!
-			t2s[-1] = time.time()
-			grouped, dupedObj = self.add_instances_with_transforms(
-				context, swap, swapProps, instance_configs)
-			base = swapProps["object"]
-
-			# Having completed adding instances, remove the 'base copy'
-			if not grouped:
-				if base in dupedObj:
-					dupedObj.pop(dupedObj.index(base))
-				if base in selList: # gaurd for stability, but shouldn't happen
-					selList.pop(selList.index(base))
-				util.obj_unlink_remove(base, True, context)
-
-			if grouped:
-				new_objects += dupedObj # list
+			t2s.append(time.time())
+			instanced = self.use_dupliverts and self.can_instance(swapProps)
+			merged = (not instanced and self.meshswap_join
+				and self.can_merge(swapProps))
+			if instanced:
+				grouped, dupedObj = self.add_instances_as_clouds(
+					context, swap, swapProps, placements)
+			elif merged:
+				grouped, dupedObj = self.add_instances_merged(
+					context, swap, swapProps, placements)
+			else:
+				# one object per block, so add these in chunks
+				grouped = swapProps["groupSwap"]
+				dupedObj = self.pending
+				for chunk in range(0, len(placements), CHUNK_BLOCKS):
+					_, chunk_objs = self.add_instances_with_transforms(
+						context, swap, swapProps,
+						placements[chunk:chunk+CHUNK_BLOCKS])
+					dupedObj += chunk_objs
+					self.units_done = units_start + self.units[iter_index] * min(
+						chunk+CHUNK_BLOCKS, len(placements)) // len(placements)
+					tpause = time.time()
+					yield
+					paused += time.time() - tpause
+				self.pending = []
+
+			if grouped or instanced or merged:
+				added = dupedObj # list
 			elif dupedObj and self.meshswap_join:
-				# join meshes together, carefully removing old selected objects
-				# from selection lists
+				# join meshes together, e.g. rigged blocks not merged directly
 				util.set_active_object(context, dupedObj[0])
 				for d in dupedObj:
 					if d.type != 'MESH':
@@ -649,26 +894,21 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 					bpy.ops.object.mode_set(mode='OBJECT')
 
 				# to avoid reselection later objects that were joined
-				for obtemp in context.selected_objects:
-					if obtemp in selList:
-						selList.pop(selList.index(obtemp))
-					if obtemp in dupedObj:
-						dupedObj.pop(dupedObj.index(obtemp))
+				joined = set(context.selected_objects)
 				bpy.ops.object.join()
-				if context.selected_objects:
-					new_objects.append(context.selected_objects[0])
-				else:
+				added = list(context.selected_objects[:1])
+				if not added:
 					conf.log("No selected objects after join")
+				self.dropped |= joined - set(added)
 			else:
 				# no joining, so just directly append to new_objects
-				new_objects += dupedObj # a list
+				added = dupedObj # a list
+			self.new_objects += added
 
-			removeList.append(swap)
+			self.removeList.append(swap)
 
 			# Setup for later re-selection and applying no-re-meshswap property
-			for obj in new_objects:
-				if obj in removeList:
-					continue
+			for obj in added:
 				# Setup below is for cross compatibility, in 2.8 & 2.7
 				# where accessing a field on deleted object will raise error
 				# (but, we should have already excluded deleted objects anyways)
@@ -679,26 +919,51 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 						continue
 				except ReferenceError:
 					continue
-				selList.append(obj)
+				self.selList.append(obj)
 				obj['MCprep_noSwap'] = 1 # property to avoid duplicate future swap
-			t3s[-1] = time.time()
-
+			t3s.append(time.time() - paused)
+			self.swapped_names.append(swap.name)
+			self.swapped_counts.append(len(placements))
+			self.units_done = units_start + self.units[iter_index]
+			yield
+
+	def rollback_pending(self, context):
+		"""Remove blocks added for an object whose swap did not complete."""
+		for obj in self.pending:
+			try:
+				util.obj_unlink_remove(obj, True, context)
+			except ReferenceError:
+				pass
+		self.runcount -= len(self.pending)
+		self.pending = []
+		# timings only of fully swapped objects
+		count = len(self.t3s)
+		for times in (self.t0s, self.t1s, self.t2s):
+			del times[count:]
+
+	def finish_swap(self, context):
+		"""Remove swapped objects and assets, reselect, and report."""
 		t4 = time.time()
+		# Having completed adding instances, remove the shared 'base copies'
+		for base in self.bases:
+			self.dropped.add(base) # gaurd for stability, but shouldn't be selected
+			util.obj_unlink_remove(base, True, context)
+
 		# final re-selection and deletion
 		if self.runcount > 0:
-			for rm in removeList:
-				if rm in selList:
-					# prevent later operations on deleted object
-					selList.pop(selList.index(rm))
-				if rm in new_objects:
-					# prevent later operations on deleted object
-					new_objects.pop(new_objects.index(rm))
+			# prevent later operations on deleted objects
+			self.dropped.update(self.removeList)
+			self.new_objects = [obj for obj in self.new_objects
+				if obj not in self.dropped]
+			for rm in self.removeList:
 				try:
 					util.obj_unlink_remove(rm, True, context)
 				except:
 					print("Failed to clear user/remove object: "+rm.name)
 
-		for obj in selList:
+		for obj in self.selList:
+			if obj in self.dropped:
+				continue
 			# Risk if object was joined against another object that its data
 			# no longer exists, which can result in a failure e.g. for 2.72
 			# However, pre-work should have prevented interacting with already
@@ -716,25 +981,34 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 		# spawned instances into a collection of its own (2.8 only)
 		if util.bv28():
 			swaped_vl = util.get_or_create_viewlayer(context, "Meshswap Render")
-			for obj in new_objects:
+			for obj in self.new_objects:
 				util.move_to_collection(obj, swaped_vl.collection)
 
-			move_assets_to_excluded_layer(context, new_groups)
+			move_assets_to_excluded_layer(context, self.new_groups)
 
 		# end progress bar, end of primary section
-		bpy.context.window_manager.progress_end()
+		context.window_manager.progress_end()
 		t5 = time.time()
 
 		# run timing calculations
-		if conf.vv:
-			loop_prep = sum(t1s) - sum(t0s)
-			face_process = sum(t2s) - sum(t1s)
-			instancing = sum(t3s) - sum(t2s)
-			cleanup = t5-t4
-			total = tprep+loop_prep+face_process+instancing+cleanup
-			conf.log("Total time: {}s, init: {}, prep: {}, poly process: {}, instance:{}, cleanup: {}".format(
-				round(total, 1), round(tprep, 1), round(loop_prep, 1), round(face_process, 1),
-				round(instancing, 1), round(cleanup, 1)))
+		global last_timing_report
+		last_timing_report = meshswap_engine.timing_report(
+			self.tprep, self.t0s, self.t1s, self.t2s, self.t3s, t5-t4,
+			self.swapped_names, self.swapped_counts)
+		conf.log("Total time: {}s, init: {}, prep: {}, poly process: {}, instance:{}, cleanup: {}".format(
+			*[round(last_timing_report[key], 1) for key in (
+				"total", "init", "loop_prep", "face_process", "instancing", "cleanup")]),
+			vv_only=True)
+
+		if self.stop_reason == "error":
+			return {'CANCELLED'}
+		elif self.stop_reason:
+			msg = "Meshswap cancelled" if self.stop_reason == "cancelled" else (
+				"Meshswap stopped at the instance budget of {}".format(
+					self.instance_budget))
+			self.report({'WARNING'}, "{}, swapped {} of {} objects ({} blocks)".format(
+				msg, len(self.t3s), len(self.objList), self.runcount))
+			return {'FINISHED'} if self.runcount else {'CANCELLED'}
 
 		if self.runcount==0:
 			self.report({'ERROR'}, ("Nothing swapped, likely no materials of "
@@ -743,6 +1017,12 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 		elif self.runcount==1:
 			self.report({'INFO'}, "Swapped 1 object")
 			return {'FINISHED'}
+		elif self.shared_meshes:
+			self.report({'INFO'},
+				"Swapped {} objects, sharing mesh data saved {} meshes (~{} MB)".format(
+					self.runcount, self.shared_meshes,
+					round(self.shared_bytes / 1024.0**2, 2)))
+			return {'FINISHED'}
 		self.report({'INFO'}, "Swapped {} objects".format(self.runcount))
 		return {'FINISHED'}
 
@@ -770,47 +1050,32 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 		return objList
 
 	def get_face_list(self, swap, offset):
-		"""Returns list of relevant faces and mapped coordinates.
+		"""Returns table of relevant faces and mapped coordinates.
 
 		Offset is for Mineways to virtually shift all block centers to half ints
 
-		Returns list with each item: n (normal), g (global pos), l (local pos)
+		Returns meshswap_engine.face_table, with index aligned arrays of local
+		centers, normals, areas and global centers of the faces
 		"""
-		facebook = []
-		for poly in swap.data.polygons:
-			gtmp = util.matmul(
-				swap.matrix_world, mathutils.Vector(poly.center))
-			# even without offset, list this to make values unlinked to mesh
-			g = [gtmp[0]+offset, gtmp[1]+offset, gtmp[2]+offset]
-			n = poly.normal # in local coordinates
-			tmp2 = poly.center
-			# even without offset, list this
-			l = [tmp2[0]+offset, tmp2[1]+offset, tmp2[2]+offset]
-			if 0.015 < poly.area and poly.area < 0.016:
-				continue # hack for not having too many torches show up, both jmc2obj and Mineways
-			facebook.append(face_struct(n,g,l)) # g is global, l is local
-		return facebook
+		polygons = swap.data.polygons
+		centers = buffers.float_buffer(len(polygons) * 3)
+		normals = buffers.float_buffer(len(polygons) * 3)
+		areas = buffers.float_buffer(len(polygons))
+		polygons.foreach_get("center", centers)
+		polygons.foreach_get("normal", normals)
+		polygons.foreach_get("area", areas)
+		matrix = [list(row) for row in swap.matrix_world]
+		return meshswap_engine.build_face_table(
+			centers, normals, areas, matrix, offset)
 
 	def checkExternal(self, context, name):
-		"""Called for each object in the loop as soon as possible."""
-
-		groupSwap = False
-		meshSwap = False # if object  is in both group and mesh swap, group will be used
-		edgeFlush = False # blocks perfectly on edges, require rotation
-		edgeFloat = False # floating off edge into air, require rotation ['vines','ladder','lilypad']
-		torchlike = False # ['torch','redstone_torch_on','redstone_torch_off']
-		removable = False # to be removed, hard coded.
-		doorlike = False # appears like a door.
-		front_face_rotate = False # rotate mesh with this material's face forward (+y local=default)
-		# for varied positions from exactly center on the block, 1 for Z random too
-		# 1= x,y,z random; 0= only x,y random; 2=rotation random only (vertical)
-		#variance = [ ['tall_grass',1], ['double_plant_grass_bottom',1],
-		#			['flower_yellow',0], ['flower_red',0] ]
-		variance = [False,0] # needs to be in this structure
-		new_groups = [] # list of newly added groups in this process
+		"""Plan the swap of an object by name, without importing anything.
 
-		addon_prefs = util.get_user_preferences(context)
-		meshSwapPath = context.scene.meshswap_path
+		Called for each object in the loop as soon as possible. Swap
+		properties come from the meshswap library manifest, or from the group
+		itself if already in this file. Assets are imported afterwards for all
+		planned swaps at once, see import_assets.
+		"""
 		rmable = []
 		if self.track_exporter == "jmc2obj":
 			rmable = ['double_plant_grass_top','torch_flame','cactus_top','cactus_bottom','book',
@@ -837,326 +1102,158 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 
 		# check the actual name against the library
 		name = generate.get_mc_canonical_name(name)[0]
-		cache = get_meshswap_cache(context)
-		if name in conf.json_data["blocks"]["canon_mapping_block"]:
-			# e.g. remaps entity/chest/normal back to chest
-			name_remap = conf.json_data["blocks"]["canon_mapping_block"][name]
-		else:
-			name_remap = None
-
-		if name in cache["groups"] or name in util.collections():
-			groupSwap = True
-		elif name in cache["objects"]:
-			meshSwap = True
-		elif not name_remap:
-			return False
-		elif name_remap in cache["groups"] or name_remap in util.collections():
-			groupSwap = True
-			name = name_remap
-		elif name_remap in cache["objects"]:
-			meshSwap = True
-			name = name_remap
+		manifest = get_meshswap_manifest(context)
+		local_groups = util.collections()
+		name_remap = conf.json_data["blocks"]["canon_mapping_block"].get(name)
+
+		# groups already in this file take priority over the library
+		if name in local_groups:
+			entry = ("group", name, meshswap_manifest.swap_props(
+				_id_items(local_groups[name])))
 		else:
+			entry = manifest.lookup(name)
+			if entry is None and name_remap and name_remap in local_groups:
+				entry = ("group", name_remap, meshswap_manifest.swap_props(
+					_id_items(local_groups[name_remap])))
+		if entry is None:
 			return False # if not present, continue
+		kind, name, props = entry
 
-		# now import
-		conf.log("about to link, group {} / mesh {}?".format(
-			groupSwap, meshSwap))
-		toLink = self.link_groups
-		for ob in context.selected_objects:
-			util.select_set(ob, False)
-		#import: guaranteed to have same name as "appendObj" for the first instant afterwards
-		grouped = False # used to check if to join or not
-		importedObj = None # need to initialize to something, though this obj not used
-		groupAppendLayer = self.append_layer
-
-		# for blender 2.8 compatibility
-		if hasattr(bpy.data, "groups"):
-			g_or_c = 'Group'
-		elif hasattr(bpy.data, "collections"):
-			g_or_c = 'Collection'
-
-		if groupSwap:
-			if name not in util.collections():
-				# if group not linked, put appended group data onto the GUI field layer
-				if hasattr(context.scene, "layers"): # blender 2.7x
-					activeLayers = list(context.scene.layers)
-				else:
-					activeLayers = None
-				if (not toLink) and (groupAppendLayer!=0):
-					x = [False]*20
-					x[groupAppendLayer-1] = True
-					if hasattr(context.scene, "layers"):
-						context.scene.layers = x
-
-				# Get prelist of groups/collections to check against afterwards
-				pre_colls = list(util.collections())
-
-				# special cases, make another list for this? number of variants can vary..
-				if name == "torch" or name == "Torch":
-					if name+".1" not in pre_colls:
-						util.bAppendLink(os.path.join(meshSwapPath, g_or_c), name+".1", toLink)
-					if name+".2" not in pre_colls:
-						util.bAppendLink(os.path.join(meshSwapPath, g_or_c), name+".2", toLink)
-				util.bAppendLink(os.path.join(meshSwapPath, g_or_c), name, toLink)
-
-				if util.bv28():
-					post_colls = list(util.collections())
-					new_groups += list(set(post_colls)-set(pre_colls))
-
-				grouped = True
-				# if activated a different layer, go back to the original ones
-				if hasattr(context.scene, "layers") and activeLayers:
-					context.scene.layers = activeLayers
-				# 2.8 handled later with everything at once
-			grouped = True
-			# set properties
-			for item in util.collections()[name].items():
-				conf.log("GROUP PROPS:" + str(item))
-				try:
-					x = item[1].name #will NOT work if property UI
-				except:
-					x = item[0] # the name of the property, [1] is the value
-					if x=='variance':
-						variance = [True, item[1]]
-					elif x=='edgeFloat':
-						edgeFloat = True
-					elif x=='doorlike':
-						doorlike = True
-					elif x=='edgeFlush':
-						edgeFlush = True
-					elif x=='torchlike':
-						torchlike = True
-					elif x=='removable':
-						removable = True
-					elif x=='frontFaceRotate':
-						front_face_rotate = True
-		else:
-			util.bAppendLink(os.path.join(meshSwapPath, 'Object'), name, False)
-			### NOTICE: IF THERE IS A DISCREPENCY BETWEEN ASSETS FILE AND WHAT IT SAYS SHOULD
-			### BE IN FILE, EG NAME OF MESH TO SWAP CHANGED, INDEX ERROR IS THROWN HERE
-			### >> MAKE a more graceful error indication.
-			# filter out non-meshes in case of parent grouping or other pull-ins
-			# conf.log("DEBUG - post importing {}, selected objects: {}".format(
-			# 	name, list(bpy.context.selected_objects)), vv_only=True)
-
-			for ob in bpy.context.selected_objects:
-				# 2.79b specific hack to clear brought in empties with the mesh
-				# e.g. in case of animated deformation modifiers via object
-				if ob.type != 'MESH':
-					util.select_set(ob, False)
-			try:
-				importedObj = bpy.context.selected_objects[0]
-			except:
-				return False #in case nothing selected.. which happens even during selection?
-			importedObj["MCprep_noSwap"] = 1
-			# now check properties
-			for item in importedObj.items():
-				try:
-					x = item[1].name # will NOT work if property UI
-				except:
-					x = item[0] # the name of the property, [1] is the value
-					if x=='variance':
-						variance = [True, item[1]]
-					elif x=='edgeFloat':
-						edgeFloat = True
-					elif x=='doorlike':
-						doorlike = True
-					elif x=='edgeFlush':
-						edgeFlush = True
-					elif x=='torchlike':
-						torchlike = True
-					elif x=='removable':
-						removable = True
-			for ob in context.selected_objects:
-				util.select_set(ob, False)
-		##### HERE set the other properties, e.g. variance and edgefloat, now that the obj exists
-		conf.log("groupSwap: {}, meshSwap: {}".format(groupSwap, meshSwap))
+		# for varied positions from exactly center on the block, 1 for Z random too
+		# 1= x,y,z random; 0= only x,y random; 2=rotation random only (vertical)
+		variance = [False, 0] # needs to be in this structure
+		if "variance" in props:
+			variance = [True, props["variance"]]
+		swapProps = {
+			'importName': name,
+			'object': None, # the imported object to copy, set on import
+			'meshSwap': kind == "object",
+			'groupSwap': kind == "group",
+			'variance': variance,
+			'edgeFlush': "edgeFlush" in props, # blocks perfectly on edges, require rotation
+			'edgeFloat': "edgeFloat" in props, # floating off edge into air, e.g. vines, ladder
+			'torchlike': "torchlike" in props,
+			'removable': "removable" in props, # to be removed, hard coded.
+			'doorlike': "doorlike" in props, # appears like a door.
+			'new_groups': []}
+		conf.log("groupSwap: {}, meshSwap: {}".format(
+			swapProps['groupSwap'], swapProps['meshSwap']))
 		conf.log("edgeFloat: {}, variance: {}, torchlike: {}".format(
-			edgeFloat, variance, torchlike))
-		return {'importName':name,'object':importedObj,'meshSwap':meshSwap, 'groupSwap':groupSwap,'variance':variance,
-				'edgeFlush':edgeFlush,'edgeFloat':edgeFloat,'torchlike':torchlike,
-				'removable':removable,'doorlike':doorlike,
-				'new_groups':new_groups}
+			swapProps['edgeFloat'], variance, swapProps['torchlike']))
+		return swapProps
 
-	def proccess_poly_orientations(self, face, swapProps, swapGen, instance_configs):
-		"""Iterate over individual face, updating instance loc/rotation
+	def import_assets(self, context, plans):
+		"""Import the assets of all planned swaps, once per asset.
 
-		Arguments:
-			face: face struct with n (normal), g (global coord), l (local coord)
-			instance_configs: pass by ref dict of instances to make, with rot and loc info
+		Groups not yet in the file are appended (or linked), meshswap objects
+		appended, and set as the 'object' of each swap using them.
+		Returns list of newly added groups, and of the imported objects.
 		"""
+		meshSwapPath = bpy.path.abspath(context.scene.meshswap_path)
+		toLink = self.link_groups
+		groupAppendLayer = self.append_layer
 
-		offset = 0.5 if self.track_exporter == 'Mineways' else 0
-
-		# Transform so centers are half ints (jmc2obj default), from local coords
-		x = round(face.l[0])
-		y = round(face.l[1])
-		z = round(face.l[2])
-
-		# Reverses which block to count 'on edge' for so that the instances
-		# are placed in "front" of where it hangs, as this is how the meshswap
-		# assets are setup (object origin will be in front of the hanging item)
-		outside_hanging = 1 if swapProps['edgeFloat'] else -1
-		if util.face_on_edge(face.l): #check if face is on unit block boundary (local coord!)
-			a = face.n[0] * 0.1 * outside_hanging
-			b = face.n[1] * 0.1 * outside_hanging
-			c = face.n[2] * 0.1 * outside_hanging
-			x = round(face.l[0]+a)
-			y = round(face.l[1]+b)
-			z = round(face.l[2]+c)
-			#print("ON EDGE, BRO! line, "+str(x) +","+str(y)+","+str(z))
-			#print([facebook[ind].l[0], facebook[ind].l[1], facebook[ind].l[2]])
-		else:
-			a,b,c = 0,0,0
-
-		instance_key = "{}-{}-{}".format(x,y,z)
-		loc = [x,y,z]
-
-		#### TORCHES, hack removes duplicates while not removing "edge" floats
-		# if facebook[ind].l[1]+0.5 - math.floor(facebook[ind].l[1]+0.5) < 0.3:
-		# 	#continue if coord. is < 1/3 of block height, to do with torch's base in wrong cube.
-		# 	if not swapProps['edgeFloat']:
-		# 		#continue
-		# 		print("do nothing, this is for jmc2obj")
-		conf.log("Instance: Snapped loc, face.local, face.nrm, hanging offset, if_edgeFloat:")
-		conf.log(str([loc, face.l, face.n, [a,b,c], outside_hanging]), vv_only=True)
-
-		### START HACK PATCH, FOR MINEWAYS (single-tex export) double-tall blocks
-		# prevent double high grass... which mineways names sunflowers.
-		hack_check = ["Sunflower","Iron_Door","Wooden_Door"]
-		if swapGen in hack_check and "{}-{}-{}".format(x,y-1,z) in instance_configs:
-			overwrite = -1
-		elif swapGen in hack_check and "{}-{}-{}".format(x,y+1,z) in instance_configs:
-			#dupList[dupList.index([x,y+1,z])] = [x,y,z]
-			instance_configs["{}-{}-{}".format(x,y+1,z)][0] = loc # update loc only
-			overwrite = -1
-		else:
-			overwrite = 0 # 0 = normal, -1 = skip, 1 = overwrite the block below
-		### END HACK PATCH
-
-		# rotation value (second append value: 0 means no rotation, rest is 1-4)
-		if overwrite < 0:
-			return
-
-		if instance_key in instance_configs and not swapProps['edgeFloat']:
-			return # no need to overwrite
+		group_names = []
+		object_names = []
+		for swapProps in plans:
+			if not swapProps or swapProps.get('removable'):
+				continue
+			name = swapProps['importName']
+			if swapProps['groupSwap']:
+				# special cases, make another list for this? number of variants can vary..
+				names = [name]
+				if name == "torch" or name == "Torch":
+					names = [name+".1", name+".2", name]
+				for grp_name in names:
+					if grp_name not in group_names and grp_name not in util.collections():
+						group_names.append(grp_name)
+			elif name not in object_names:
+				object_names.append(name)
 
-		# dupList.append([x,y,z])
-		# check difference from rounding, this gets us the rotation!
-		x_diff = x-face.l[0]
-		z_diff = z-face.l[2]
+		for ob in context.selected_objects:
+			util.select_set(ob, False)
 
-		# append rotation, exporter dependent
-		if self.track_exporter == "jmc2obj":
-			if swapProps['torchlike']: # needs fixing
-				if (x_diff>.1 and x_diff < 0.4):
-					rot_type = 1
-				elif (z_diff>.1 and z_diff < 0.4):
-					rot_type = 2
-				elif (x_diff<-.1 and x_diff > -0.4):
-					rot_type = 3
-				elif (z_diff<-.1 and z_diff > -0.4):
-					rot_type = 4
-				else:
-					rot_type = 0
-			elif swapProps['edgeFloat']:
-				conf.log("Edge float!", vv_only=True)
-				if (y-face.l[1] < 0):
-					rot_type = 8
-				elif (x_diff > 0.3):
-					rot_type = 7
-				elif (z_diff > 0.3):
-					rot_type = 0
-				elif (z_diff < -0.3):
-					rot_type = 6
-				else:
-					rot_type = 5
-			elif swapProps['edgeFlush']:
-				# actually 6 cases here, can need rotation below...
-				# currently not necessary/used, so not programmed..
-				rot_type = 0
-			elif swapProps['doorlike']:
-				if (y-face.l[1] < 0):
-					rot_type = 8
-				elif (x_diff > 0.3):
-					rot_type = 7
-				elif (z_diff > 0.3):
-					rot_type = 0
-				elif (z_diff < -0.3):
-					rot_type = 6
-				else:
-					rot_type = 5
-			else:
-				rot_type = 0
-		elif self.track_exporter == "Mineways":
-			conf.log("checking: {} {}".format(x_diff,z_diff))
-			if swapProps['torchlike']: # needs fixing
-				conf.log("recognized it's a torchlike obj..")
-				if (x_diff>.1 and x_diff < 0.6):
-					rot_type = 1
-					#print("rot 1?")
-				elif (z_diff>.1 and z_diff < 0.6):
-					rot_type = 2
-					#print("rot 2?")
-				elif (x_diff<-.1 and x_diff > -0.6):
-					#print("rot 3?")
-					rot_type = 3
-				elif (z_diff<-.1 and z_diff > -0.6):
-					rot_type = 4
-					#print("rot 4?")
-				else:
-					rot_type = 0
-					#print("rot 0?")
-			elif swapProps['edgeFloat']:
-				if (y-face.l[1] < 0):
-					rot_type = 8
-				elif (x_diff > 0.3):
-					rot_type = 7
-				elif (z_diff > 0.3):
-					rot_type = 0
-				elif (z_diff < -0.3):
-					rot_type = 6
-				else:
-					rot_type = 5
-			elif swapProps['edgeFlush']:
-				# actually 6 cases here, can need rotation below...
-				# currently not necessary/used, so not programmed..
-				rot_type = 0
-			elif swapProps['doorlike']:
-				if (y-face.l[1] < 0):
-					rot_type = 8
-				elif (x_diff > 0.3):
-					rot_type = 7
-				elif (z_diff > 0.3):
-					rot_type = 0
-				elif (z_diff < -0.3):
-					rot_type = 6
-				else:
-					rot_type = 5
+		new_groups = []
+		if group_names:
+			# if group not linked, put appended group data onto the GUI field layer
+			if hasattr(context.scene, "layers"): # blender 2.7x
+				activeLayers = list(context.scene.layers)
 			else:
-				rot_type = 0
-		else:
-			rot_type = 0
+				activeLayers = None
+			if (not toLink) and (groupAppendLayer!=0):
+				x = [False]*20
+				x[groupAppendLayer-1] = True
+				if hasattr(context.scene, "layers"):
+					context.scene.layers = x
+
+			# all groups from the one library load
+			loaded = util.bulk_append(
+				meshSwapPath, {"collections": group_names}, link=toLink,
+				context=context)
+			if util.bv28():
+				new_groups += loaded["collections"]
+
+			# if activated a different layer, go back to the original ones
+			if hasattr(context.scene, "layers") and activeLayers:
+				context.scene.layers = activeLayers
+			# 2.8 handled later with everything at once
+
+		imported = {}
+		if object_names:
+			loaded = util.bulk_append(
+				meshSwapPath, {"objects": object_names}, context=context)
+			### NOTICE: IF THERE IS A DISCREPENCY BETWEEN ASSETS FILE AND WHAT IT SAYS SHOULD
+			### BE IN FILE, EG NAME OF MESH TO SWAP CHANGED, IT IS SKIPPED HERE
+			for obj_name in object_names:
+				# appended objects are renamed if the name is already in use
+				matches = [ob for ob in loaded["objects"] if ob.name == obj_name]
+				if not matches:
+					matches = [ob for ob in loaded["objects"]
+						if util.nameGeneralize(ob.name) == obj_name]
+				# skip non-meshes in case of parent grouping or other pull-ins
+				if not matches or matches[0].type != 'MESH':
+					conf.log("Meshswap object not imported: "+obj_name)
+					continue
+				importedObj = matches[0]
+				importedObj["MCprep_noSwap"] = 1
+				imported[obj_name] = importedObj
 
-		# update the instance ref for this face
-		offset = -0.5 if self.track_exporter == 'Mineways' else 0
-		loc_unoffset = [pos+offset for pos in loc]
-		instance_configs[instance_key] = [loc_unoffset, rot_type]
+		for swapProps in plans:
+			if not swapProps or not swapProps.get('meshSwap'):
+				continue
+			swapProps['object'] = imported.get(swapProps['importName'])
+			if swapProps['object'] is None:
+				swapProps['meshSwap'] = False # in case nothing imported
+		return new_groups, list(imported.values())
 
-	def add_instances_with_transforms(self, context, swap, swapProps, instance_configs):
+	def add_instances_with_transforms(self, context, swap, swapProps, placements):
 		"""Creates all block instances for a single object.
 
 		Will add and apply rotations, add loc variances, and run random group
 		imports if any relevant.
+
+		Arguments:
+			placements: rows of (x, y, z, rotation code) from the placement
+				table of meshswap_engine.plan_placements
 		"""
 
 		base = swapProps["object"]
 		grouped = swapProps["groupSwap"]
 		dupedObj = [] # duplicating, rotating and moving
+		offset = meshswap_engine.placement_offset(self.track_exporter)
+
+		# joined blocks end up as one mesh anyways, so only share otherwise
+		linked = self.share_mesh_data and not self.meshswap_join and not grouped
+		if linked:
+			mesh = base.data
+			self.shared_meshes += len(placements)
+			self.shared_bytes += len(placements) * meshswap_engine.mesh_data_bytes(
+				len(mesh.vertices), len(mesh.edges), len(mesh.loops),
+				len(mesh.polygons), len(mesh.uv_layers))
 
-		for instance_key in list(instance_configs):
-			loc_local, rot = instance_configs[instance_key]
+		for row in placements:
+			loc_local = [float(row[0])+offset, float(row[1])+offset, float(row[2])+offset]
+			rot = int(row[3])
 
 			### HIGH COMPUTATION/CRITICAL SECTION
 			# refresh the scene every once in awhile
@@ -1185,68 +1282,26 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 				dupedObj.append(new_ob)
 			else:
 				# TODO: Change to adding a single vertex, dupliverts
-				new_ob = util.obj_copy(base, context)
+				new_ob = util.obj_copy(base, context, linked=linked)
 				new_ob.location = mathutils.Vector(loc)
 				util.select_set(new_ob, True)  # needed?
 				dupedObj.append(new_ob)
 
 			# obj = new_ob # bpy.context.selected_objects[-1]
 			# do extra transformations now as necessary
-			new_ob.rotation_euler = swap.rotation_euler
-			# special case of un-applied, 90(+/- 0.01)-0-0 rotation on source (y-up conversion)
-			if (swap.rotation_euler[0]>= math.pi/2-.01 and swap.rotation_euler[0]<= math.pi/2+.01
-				and swap.rotation_euler[1]==0 and swap.rotation_euler[2]==0):
-				new_ob.rotation_euler[0] -= math.pi/2
+			new_ob.rotation_euler = meshswap_engine.instance_rotation(
+				swap.rotation_euler, rot)
 			new_ob.scale = swap.scale
 
-			# rotation/translation for walls, assumes last added object still selected
-			x,y,offset,rotValue,z = 0,0,0.28,0.436332,0.12
-
-			if rot == 1:
-				# torch rotation 1
-				x = -offset
-				new_ob.location += mathutils.Vector((x, y, z))
-				new_ob.rotation_euler[1]+=rotValue
-			elif rot == 2:
-				# torch rotation 2
-				y = offset
-				new_ob.location += mathutils.Vector((x, y, z))
-				new_ob.rotation_euler[0]+=rotValue
-			elif rot == 3:
-				# torch rotation 3
-				x = offset
-				new_ob.location += mathutils.Vector((x, y, z))
-				new_ob.rotation_euler[1]-=rotValue
-			elif rot == 4:
-				# torch rotation 4
-				y = -offset
-				new_ob.location += mathutils.Vector((x, y, z))
-				new_ob.rotation_euler[0]-=rotValue
-			elif rot == 5:
-				# edge block rotation 1
-				new_ob.rotation_euler[2]+= -math.pi/2
-			elif rot == 6:
-				# edge block rotation 2
-				new_ob.rotation_euler[2]+= math.pi
-			elif rot == 7:
-				# edge block rotation 3
-				new_ob.rotation_euler[2]+= math.pi/2
-			elif rot==8:
-				# edge block rotation 4 (ceiling, not 'keep same')
-				new_ob.rotation_euler[0]+= math.pi/2
+			# rotation/translation for walls, torches leaning against them
+			if rot in meshswap_engine.ROTATION_OFFSETS:
+				new_ob.location += mathutils.Vector(
+					meshswap_engine.ROTATION_OFFSETS[rot])
 
 			# extra variance to break up regularity, e.g. for tall grass
-			# first, xy and z variance
-			if [True,1] == swapProps['variance']:
-				x = (random.random()-0.5)*0.5
-				y = (random.random()-0.5)*0.5
-				z = (random.random()/2-0.5)*0.6
-				new_ob.location += mathutils.Vector((x, y, z))
-			# now for just xy variance, base stays the same
-			elif [True,0] == swapProps['variance']: # for non-z variance
-				x = (random.random()-0.5)*0.5	 # values LOWER than *1.0 make it less variable
-				y = (random.random()-0.5)*0.5
-				new_ob.location += mathutils.Vector((x, y, 0))
+			if swapProps['variance'][0]:
+				new_ob.location += mathutils.Vector(
+					meshswap_engine.variance_offset(swapProps['variance']))
 
 			# Clear selection before moving on with next iteration
 			for ob in context.selected_objects:
@@ -1256,6 +1311,149 @@ class MCPREP_OT_meshswap(bpy.types.Operator):
 		return grouped, dupedObj
 
 
+	def can_merge(self, swapProps):
+		"""Whether the blocks of an object swap can be built as one mesh.
+
+		Objects needing their own deformation, e.g. rigged, shape keyed or
+		parented, are instead copied and joined.
+		"""
+		base = swapProps["object"]
+		if swapProps["groupSwap"] or base is None or base.type != 'MESH':
+			return False
+		elif base.parent or base.children:
+			return False
+		elif base.vertex_groups or base.modifiers or base.data.shape_keys:
+			return False
+		return True
+
+	def add_instances_merged(self, context, swap, swapProps, placements):
+		"""Creates all block instances for a single object, as one mesh.
+
+		Builds the mesh of all blocks directly from the base mesh and the
+		placements, the same as copying the base per block and joining them,
+		without the intermediate objects.
+		"""
+		base = swapProps["object"]
+		clouds = meshswap_engine.instance_points(
+			placements,
+			meshswap_engine.placement_offset(self.track_exporter),
+			matrix=[list(row) for row in swap.matrix_world],
+			variance=swapProps['variance'])
+		self.runcount += len(placements)
+		if not clouds:
+			return False, []
+
+		# per rotation code, the rotation and scale of each block's copy
+		transforms = []
+		for (_, rot), points in clouds.items():
+			rot_mat = mathutils.Euler(
+				meshswap_engine.instance_rotation(swap.rotation_euler, rot)).to_matrix()
+			matrix = [[rot_mat[row][col] * swap.scale[col] for col in range(3)]
+				for row in range(3)]
+			transforms.append((matrix, points))
+		origin = transforms[0][1][0]
+
+		arrays = meshswap_engine.merge_instances(
+			read_mesh_arrays(base.data), transforms, origin)
+		mesh = bpy.data.meshes.new(base.data.name)
+		write_mesh_arrays(mesh, arrays)
+		for slot in base.material_slots:
+			mesh.materials.append(slot.material)
+
+		new_ob = bpy.data.objects.new(base.name, mesh)
+		util.obj_link_scene(new_ob, context)
+		new_ob.location = origin
+		conf.log("Merged {} blocks of {} into one mesh".format(
+			len(placements), base.name), vv_only=True)
+		return False, [new_ob]
+
+	def can_instance(self, swapProps):
+		"""Whether a block can be instanced from a point cloud.
+
+		Rigged or parented meshswap objects need their own copy per block,
+		so fall back to adding one object per block for those.
+		"""
+		if swapProps["groupSwap"]:
+			return True
+		base = swapProps["object"]
+		if base is None or base.type != 'MESH':
+			return False
+		elif base.parent or base.children:
+			return False
+		elif any(mod.type == 'ARMATURE' for mod in base.modifiers):
+			return False
+		return True
+
+	def add_instances_as_clouds(self, context, swap, swapProps, placements):
+		"""Creates all block instances for a single object, as point clouds.
+
+		Rather than an object per block, one vertex-cloud object is added per
+		asset variant and rotation, with a vertex per block and the asset
+		instanced onto its vertices (dupliverts). The rotation code is also
+		stored as a per vertex attribute where supported.
+		"""
+		base = swapProps["object"]
+		grouped = swapProps["groupSwap"]
+		name = swapProps["importName"]
+		variant = None
+		if grouped:
+			variant = lambda: util.randomizeMeshSawp(name, 3)
+
+		matrix = [list(row) for row in swap.matrix_world]
+		clouds = meshswap_engine.instance_points(
+			placements,
+			meshswap_engine.placement_offset(self.track_exporter),
+			matrix=matrix,
+			variance=swapProps['variance'],
+			variant=variant)
+		self.runcount += len(placements)
+
+		new_objs = []
+		for (variant_name, rot), points in clouds.items():
+			mesh = bpy.data.meshes.new("{} instances".format(name))
+			mesh.vertices.add(len(points))
+			mesh.vertices.foreach_set(
+				"co", [val for point in points for val in point])
+			if hasattr(mesh, "attributes"):
+				attr = mesh.attributes.new("mcprep_rotation", 'INT', 'POINT')
+				attr.data.foreach_set("value", [rot] * len(points))
+			mesh.update()
+			cloud = bpy.data.objects.new(mesh.name, mesh)
+			cloud["MCprep_instancer"] = 1
+			util.obj_link_scene(cloud, context)
+
+			if grouped:
+				child = bpy.data.objects.new(variant_name, None)
+				if util.bv28():
+					child.instance_type = 'COLLECTION'
+					child.instance_collection = util.collections().get(variant_name)
+					child.empty_display_size = 0.25
+				else:
+					child.dupli_type = 'GROUP'
+					child.dupli_group = util.collections().get(variant_name)
+					child.empty_draw_size = 0.25
+			else:
+				# linked duplicate with modifiers, all clouds share the one mesh
+				child = base.copy()
+			util.obj_link_scene(child, context)
+
+			# instances are placed at each vertex, relative to the child's own
+			# transform, which therefore only rotates and scales
+			child.parent = cloud
+			child.location = (0, 0, 0)
+			child.rotation_euler = meshswap_engine.instance_rotation(
+				swap.rotation_euler, rot)
+			child.scale = swap.scale
+			if hasattr(cloud, "instance_type"):
+				cloud.instance_type = 'VERTS'
+			else:
+				cloud.dupli_type = 'VERTS'
+			new_objs += [cloud, child]
+
+		conf.log("Instanced {} blocks of {} with {} objects".format(
+			len(placements), name, len(new_objs)), vv_only=True)
+		return grouped, new_objs
+
 	def offsetByHalf(self, obj):
 		if obj.type != 'MESH':
 			return
@@ -0,0 +1,582 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Array based processing of the faces of world objects to meshswap.
+
+Polygon data is read by the operator in bulk with foreach_get into flat
+buffers, and processed here all at once. NumPy is used when available,
+falling back to plain python otherwise.
+
+Kept free of bpy, as test_files/meshswap_benchmark.py imports it on its own
+to time synthetic face arrays without blender.
+"""
+
+import collections
+import math
+import random
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+# Faces with an area in this range are skipped, a hack for not having too
+# many torches show up, for both jmc2obj and Mineways
+TORCH_AREA_MIN = 0.015
+TORCH_AREA_MAX = 0.016
+
+# Mineways (single-tex export) names of double-tall blocks, where only the
+# lower block of the two is kept
+DOUBLE_TALL_NAMES = ("Sunflower", "Iron_Door", "Wooden_Door")
+
+# Block coordinates within +/- this range are packed into single int64 keys
+PACK_RANGE = 1 << 20
+
+# Rotation code: global location shift, for torches leaning against walls
+ROTATION_OFFSETS = {
+	1: (-0.28, 0, 0.12),
+	2: (0, 0.28, 0.12),
+	3: (0.28, 0, 0.12),
+	4: (0, -0.28, 0.12)}
+
+# Rotation code: (euler axis, angle added), torches then edge blocks
+ROTATION_EULERS = {
+	1: (1, 0.436332),
+	2: (0, 0.436332),
+	3: (1, -0.436332),
+	4: (0, -0.436332),
+	5: (2, -math.pi/2),
+	6: (2, math.pi),
+	7: (2, math.pi/2),
+	8: (0, math.pi/2)}  # ceiling, not 'keep same'
+
+
+class face_table():
+	"""Index aligned arrays of the faces of a mesh to swap.
+
+	With numpy, each attribute is an array of shape (N, 3) (areas (N,)),
+	otherwise a list of 3-tuples (areas a list of floats).
+	"""
+	__slots__ = ("local", "normals", "areas", "world")
+
+	def __init__(self, local, normals, areas, world):
+		self.local = local  # face centers in local space, plus offset
+		self.normals = normals  # face normals in local space
+		self.areas = areas
+		self.world = world  # face centers in global space, plus offset
+
+	def __len__(self):
+		return len(self.areas)
+
+
+def build_face_table(centers, normals, areas, matrix=None, offset=0.0):
+	"""Build the face table of a mesh from flat polygon arrays.
+
+	Args:
+		centers: flat polygon centers [x0, y0, z0, x1, ...] in local space
+		normals: flat polygon normals, likewise
+		areas: polygon areas
+		matrix: 4x4 world matrix as rows, or None for identity
+		offset: added to all coordinates after transforming, e.g. for
+			Mineways to virtually shift all block centers to half ints
+	Returns:
+		face_table of the faces, excluding those of torch like area
+	"""
+	if numpy is not None:
+		centers = numpy.asarray(centers, dtype=numpy.float64).reshape(-1, 3)
+		normals = numpy.asarray(normals, dtype=numpy.float64).reshape(-1, 3)
+		areas = numpy.asarray(areas, dtype=numpy.float64)
+		keep = ~((areas > TORCH_AREA_MIN) & (areas < TORCH_AREA_MAX))
+		centers = centers[keep]
+		normals = normals[keep]
+		areas = areas[keep]
+		if matrix is None:
+			world = centers.copy()
+		else:
+			mat = numpy.asarray(matrix, dtype=numpy.float64)
+			world = centers @ mat[:3, :3].T + mat[:3, 3]
+		return face_table(centers + offset, normals, areas, world + offset)
+
+	local = []
+	norms = []
+	kept_areas = []
+	world = []
+	for ind, area in enumerate(areas):
+		if TORCH_AREA_MIN < area < TORCH_AREA_MAX:
+			continue
+		x, y, z = centers[3*ind:3*ind+3]
+		local.append((x+offset, y+offset, z+offset))
+		norms.append(tuple(normals[3*ind:3*ind+3]))
+		kept_areas.append(area)
+		if matrix is None:
+			world.append((x+offset, y+offset, z+offset))
+		else:
+			world.append(tuple(
+				row[0]*x + row[1]*y + row[2]*z + row[3] + offset
+				for row in matrix[:3]))
+	return face_table(local, norms, kept_areas, world)
+
+
+def placement_offset(exporter):
+	"""Offset from snapped block coordinates to the local placement location.
+
+	Mineways block centers are virtually shifted to half ints in the face
+	table, which is undone here.
+	"""
+	return -0.5 if exporter == "Mineways" else 0.0
+
+
+def face_on_edge(local):
+	"""Check if a face is on the boundary between two blocks (local coordinates)."""
+	face_decimals = [loc - loc//1 for loc in local]
+	if face_decimals[0] > 0.4999 and face_decimals[0] < 0.501:
+		return True
+	elif face_decimals[1] > 0.499 and face_decimals[1] < 0.501:
+		return True
+	elif face_decimals[2] > 0.499 and face_decimals[2] < 0.501:
+		return True
+	return False
+
+
+def _rotation_flags(swap_props, exporter):
+	"""Returns which rotation rule applies: "torch", "edge" or None."""
+	if exporter not in ("jmc2obj", "Mineways"):
+		return None
+	elif swap_props.get("torchlike"):
+		return "torch"
+	elif swap_props.get("edgeFloat"):
+		return "edge"
+	elif swap_props.get("edgeFlush"):
+		# actually 6 cases here, can need rotation below...
+		# currently not necessary/used, so not programmed..
+		return None
+	elif swap_props.get("doorlike"):
+		return "edge"
+	return None
+
+
+def rotation_code(coord, local, rule, exporter):
+	"""Rotation code of a single placement, from its rounding difference.
+
+	0 means no rotation, 1-4 are torch rotations (leaning against a wall),
+	5-7 edge rotations around z and 8 a ceiling rotation.
+	"""
+	x_diff = coord[0] - local[0]
+	z_diff = coord[2] - local[2]
+	if rule == "torch":
+		upper = 0.4 if exporter == "jmc2obj" else 0.6
+		if x_diff > .1 and x_diff < upper:
+			return 1
+		elif z_diff > .1 and z_diff < upper:
+			return 2
+		elif x_diff < -.1 and x_diff > -upper:
+			return 3
+		elif z_diff < -.1 and z_diff > -upper:
+			return 4
+		return 0
+	elif rule == "edge":
+		if coord[1] - local[1] < 0:
+			return 8
+		elif x_diff > 0.3:
+			return 7
+		elif z_diff > 0.3:
+			return 0
+		elif z_diff < -0.3:
+			return 6
+		return 5
+	return 0
+
+
+def _dedup_sequential(coords, rots, edge_float, double_tall):
+	"""Deduplicate placements in face order, one per block.
+
+	The first face of a block wins, unless edge floating where the last
+	face wins (while keeping the position of the first in the output). For
+	double tall blocks, only the lower of two stacked blocks is kept.
+	Returns list of [x, y, z, rot].
+	"""
+	configs = collections.OrderedDict()
+	for (x, y, z), rot in zip(coords, rots):
+		if double_tall:
+			if (x, y-1, z) in configs:
+				continue
+			elif (x, y+1, z) in configs:
+				configs[(x, y+1, z)][:3] = [x, y, z] # update loc only
+				continue
+		if (x, y, z) in configs and not edge_float:
+			continue # no need to overwrite
+		configs[(x, y, z)] = [x, y, z, rot]
+	return list(configs.values())
+
+
+def _plan_python(table, rule, edge_float, exporter, double_tall):
+	"""Reference implementation of plan_placements, one face at a time."""
+	# Reverses which block to count 'on edge' for so that the instances
+	# are placed in "front" of where it hangs, as this is how the meshswap
+	# assets are setup (object origin will be in front of the hanging item)
+	outside_hanging = 1 if edge_float else -1
+	coords = []
+	rots = []
+	for local, normal in zip(table.local, table.normals):
+		if face_on_edge(local):
+			coord = tuple(
+				int(round(local[axis] + normal[axis] * 0.1 * outside_hanging))
+				for axis in range(3))
+		else:
+			coord = tuple(int(round(local[axis])) for axis in range(3))
+		coords.append(coord)
+		rots.append(rotation_code(coord, local, rule, exporter))
+	return [tuple(row) for row in _dedup_sequential(
+		coords, rots, edge_float, double_tall)]
+
+
+def _plan_numpy(table, rule, edge_float, exporter, double_tall):
+	"""Vectorized plan_placements, deduplicating by packed integer keys."""
+	local = numpy.asarray(table.local, dtype=numpy.float64).reshape(-1, 3)
+	normals = numpy.asarray(table.normals, dtype=numpy.float64).reshape(-1, 3)
+	if not len(local):
+		return numpy.zeros((0, 4), dtype=numpy.int32)
+
+	outside_hanging = 1 if edge_float else -1
+	decimals = local - numpy.floor(local)
+	on_edge = ((decimals[:, 0] > 0.4999) & (decimals[:, 0] < 0.501)
+		| (decimals[:, 1] > 0.499) & (decimals[:, 1] < 0.501)
+		| (decimals[:, 2] > 0.499) & (decimals[:, 2] < 0.501))
+	shifted = numpy.where(
+		on_edge[:, None], local + normals * 0.1 * outside_hanging, local)
+	coords = numpy.rint(shifted).astype(numpy.int64)
+
+	x_diff = coords[:, 0] - local[:, 0]
+	z_diff = coords[:, 2] - local[:, 2]
+	if rule == "torch":
+		upper = 0.4 if exporter == "jmc2obj" else 0.6
+		rots = numpy.select([
+			(x_diff > .1) & (x_diff < upper),
+			(z_diff > .1) & (z_diff < upper),
+			(x_diff < -.1) & (x_diff > -upper),
+			(z_diff < -.1) & (z_diff > -upper)], [1, 2, 3, 4], 0)
+	elif rule == "edge":
+		rots = numpy.select([
+			coords[:, 1] - local[:, 1] < 0,
+			x_diff > 0.3,
+			z_diff > 0.3,
+			z_diff < -0.3], [8, 7, 0, 6], 5)
+	else:
+		rots = numpy.zeros(len(coords), dtype=numpy.int64)
+
+	in_range = (coords.min() > -PACK_RANGE and coords.max() < PACK_RANGE)
+	if double_tall or not in_range:
+		# order dependent stacking, or too far out to pack; rare enough
+		rows = _dedup_sequential(
+			[tuple(row) for row in coords.tolist()], rots.tolist(),
+			edge_float, double_tall)
+		return numpy.array(rows, dtype=numpy.int32).reshape(-1, 4)
+
+	packed = coords + PACK_RANGE
+	keys = (packed[:, 0] << 42) | (packed[:, 1] << 21) | packed[:, 2]
+	# first face of each block decides the order, as with a dict
+	_, first = numpy.unique(keys, return_index=True)
+	if edge_float:
+		# but the last face of a block wins the placement
+		_, last_rev = numpy.unique(keys[::-1], return_index=True)
+		chosen = len(keys) - 1 - last_rev
+	else:
+		chosen = first
+	order = numpy.argsort(first, kind="stable")
+	chosen = chosen[order]
+
+	placements = numpy.empty((len(chosen), 4), dtype=numpy.int32)
+	placements[:, :3] = coords[chosen]
+	placements[:, 3] = rots[chosen]
+	return placements
+
+
+def plan_placements(table, swap_props, exporter, swap_name=None,
+		vectorized=True):
+	"""Work out which blocks to place for all faces of a swapped object.
+
+	Face centers are snapped to integer block coordinates (faces on block
+	boundaries nudged along their normal), rotation codes derived from the
+	rounding differences, and placements deduplicated to one per block.
+
+	Args:
+		table: face_table of the object
+		swap_props: dict of meshswap properties of the block, of which
+			torchlike, edgeFloat, edgeFlush and doorlike are used
+		exporter: "jmc2obj" or "Mineways"
+		swap_name: generalized name of the swapped object
+		vectorized: use numpy if available, else the reference loop
+	Returns:
+		Placement table of rows (x, y, z, rotation code), as an (N, 4) int
+		array with numpy and a list of tuples otherwise. Add
+		placement_offset(exporter) to x, y, z for the local location.
+	"""
+	rule = _rotation_flags(swap_props, exporter)
+	edge_float = bool(swap_props.get("edgeFloat"))
+	double_tall = swap_name in DOUBLE_TALL_NAMES
+	if vectorized and numpy is not None:
+		return _plan_numpy(table, rule, edge_float, exporter, double_tall)
+	return _plan_python(table, rule, edge_float, exporter, double_tall)
+
+
+def mesh_data_bytes(vertices, edges, loops, polygons, uv_layers=0):
+	"""Rough in memory (and on disk) size of a mesh's core data, in bytes.
+
+	Counts coordinates and normals per vertex, vertex pairs per edge,
+	vertex and edge per loop, loop range and material per polygon, plus
+	the uv layers, ignoring any other custom data.
+	"""
+	return (vertices * 24 + edges * 8 + loops * (8 + 8 * uv_layers)
+		+ polygons * 12)
+
+
+def base_rotation(swap_euler):
+	"""Rotation of instances before their rotation code, from the swapped obj.
+
+	Special case of un-applied, 90(+/- 0.01)-0-0 rotation on source (y-up
+	conversion), which is undone.
+	"""
+	rot = list(swap_euler)
+	if (rot[0] >= math.pi/2-.01 and rot[0] <= math.pi/2+.01
+			and rot[1] == 0 and rot[2] == 0):
+		rot[0] -= math.pi/2
+	return rot
+
+
+def instance_rotation(swap_euler, code):
+	"""Euler rotation of an instance with the given rotation code."""
+	rot = base_rotation(swap_euler)
+	if code in ROTATION_EULERS:
+		axis, angle = ROTATION_EULERS[code]
+		rot[axis] += angle
+	return rot
+
+
+def variance_offset(variance, rand=random):
+	"""Random location shift to break up regularity, e.g. for tall grass.
+
+	Args:
+		variance: meshswap variance property, [True, 1] for xyz variance and
+			[True, 0] for only xy variance (base stays the same)
+	"""
+	if [True, 1] == variance:
+		return (
+			(rand.random()-0.5)*0.5,
+			(rand.random()-0.5)*0.5,
+			(rand.random()/2-0.5)*0.6)
+	elif [True, 0] == variance:
+		# values LOWER than *1.0 make it less variable
+		return ((rand.random()-0.5)*0.5, (rand.random()-0.5)*0.5, 0)
+	return (0, 0, 0)
+
+
+def instance_points(placements, offset, matrix=None, variance=None,
+		variant=None, rand=random):
+	"""Group placements into point clouds of global instance locations.
+
+	Each cloud holds the instances sharing an asset variant and rotation
+	code, so that a single instancer object per cloud can place them all.
+
+	Args:
+		placements: rows of (x, y, z, rotation code), from plan_placements
+		offset: placement_offset of the exporter
+		matrix: 4x4 world matrix of the swapped object as rows, or None
+		variance: meshswap variance property, see variance_offset
+		variant: function returning the asset variant for the next instance,
+			e.g. a random torch, or None for a single asset
+	Returns:
+		OrderedDict of (variant, rotation code): list of (x, y, z)
+	"""
+	clouds = collections.OrderedDict()
+	for row in placements:
+		x = float(row[0]) + offset
+		y = float(row[1]) + offset
+		z = float(row[2]) + offset
+		code = int(row[3])
+		if matrix is not None:
+			x, y, z = (
+				mrow[0]*x + mrow[1]*y + mrow[2]*z + mrow[3]
+				for mrow in matrix[:3])
+		key = (variant() if variant else None, code)
+		shift = ROTATION_OFFSETS.get(code, (0, 0, 0))
+		vary = variance_offset(variance, rand)
+		clouds.setdefault(key, []).append((
+			x + shift[0] + vary[0],
+			y + shift[1] + vary[1],
+			z + shift[2] + vary[2]))
+	return clouds
+
+
+class mesh_arrays():
+	"""Flat arrays of a mesh's data, as read and written with foreach_get/set.
+
+	Coordinates are flat x, y, z values and edges flat vertex index pairs,
+	with loop and polygon attributes one value per element. Uv layers are
+	flat u, v values per loop, by layer name.
+	"""
+
+	def __init__(self, co, edges, loop_verts, loop_starts, loop_totals,
+			material_indices, smooth, uvs=None):
+		self.co = co
+		self.edges = edges
+		self.loop_verts = loop_verts
+		self.loop_starts = loop_starts
+		self.loop_totals = loop_totals
+		self.material_indices = material_indices
+		self.smooth = smooth
+		self.uvs = uvs if uvs is not None else collections.OrderedDict()
+
+	@property
+	def vertex_count(self):
+		return len(self.co) // 3
+
+	@property
+	def edge_count(self):
+		return len(self.edges) // 2
+
+	@property
+	def loop_count(self):
+		return len(self.loop_verts)
+
+	@property
+	def polygon_count(self):
+		return len(self.loop_starts)
+
+
+def merge_instances(base, transforms, origin=(0, 0, 0)):
+	"""Merge transformed copies of a mesh into the arrays of a single mesh.
+
+	Copies are added in order, each taking its own block of vertices, edges,
+	loops and polygons with indices shifted accordingly, as joining the
+	objects of each copy would.
+
+	Args:
+		base: mesh_arrays of the mesh to copy
+		transforms: list of (matrix, locations), where matrix is a 3x3
+			rotation and scale as rows, applied to copies at each (x, y, z)
+			of locations
+		origin: location of the merged object, coordinates being relative
+	Returns:
+		mesh_arrays of the merged mesh
+	"""
+	copies = sum(len(points) for _, points in transforms)
+	verts = base.vertex_count
+	loops = base.loop_count
+	if numpy is not None:
+		return _merge_numpy(base, transforms, origin, copies, verts, loops)
+
+	co = []
+	for matrix, points in transforms:
+		local = []
+		for ind in range(verts):
+			x, y, z = base.co[3*ind:3*ind+3]
+			local.append([row[0]*x + row[1]*y + row[2]*z for row in matrix])
+		for point in points:
+			shift = [point[axis] - origin[axis] for axis in range(3)]
+			for vert in local:
+				co += [vert[0]+shift[0], vert[1]+shift[1], vert[2]+shift[2]]
+
+	edges = []
+	loop_verts = []
+	loop_starts = []
+	for copy in range(copies):
+		edges += [ind + copy*verts for ind in base.edges]
+		loop_verts += [ind + copy*verts for ind in base.loop_verts]
+		loop_starts += [ind + copy*loops for ind in base.loop_starts]
+	uvs = collections.OrderedDict(
+		(name, list(values) * copies) for name, values in base.uvs.items())
+	return mesh_arrays(
+		co, edges, loop_verts, loop_starts,
+		list(base.loop_totals) * copies,
+		list(base.material_indices) * copies,
+		list(base.smooth) * copies,
+		uvs)
+
+
+def _merge_numpy(base, transforms, origin, copies, verts, loops):
+	"""Vectorized merge_instances, one broadcast per transform matrix."""
+	co = numpy.asarray(base.co, dtype=numpy.float64).reshape(-1, 3)
+	origin = numpy.asarray(origin, dtype=numpy.float64)
+	chunks = []
+	for matrix, points in transforms:
+		if not len(points):
+			continue
+		local = co.dot(numpy.asarray(matrix, dtype=numpy.float64).T)
+		shifts = numpy.asarray(points, dtype=numpy.float64) - origin
+		chunks.append((shifts[:, None, :] + local[None, :, :]).reshape(-1, 3))
+	if chunks:
+		merged_co = numpy.concatenate(chunks).astype(numpy.float32).ravel()
+	else:
+		merged_co = numpy.zeros(0, dtype=numpy.float32)
+
+	def shifted(values, size):
+		values = numpy.asarray(values, dtype=numpy.int64)
+		steps = numpy.repeat(numpy.arange(copies, dtype=numpy.int64) * size,
+			len(values))
+		return (numpy.tile(values, copies) + steps).astype(numpy.int32)
+
+	uvs = collections.OrderedDict(
+		(name, numpy.tile(numpy.asarray(values, dtype=numpy.float32), copies))
+		for name, values in base.uvs.items())
+	return mesh_arrays(
+		merged_co,
+		shifted(base.edges, verts),
+		shifted(base.loop_verts, verts),
+		shifted(base.loop_starts, loops),
+		numpy.tile(numpy.asarray(base.loop_totals, dtype=numpy.int32), copies),
+		numpy.tile(numpy.asarray(base.material_indices, dtype=numpy.int32), copies),
+		numpy.tile(numpy.asarray(base.smooth, dtype=bool), copies),
+		uvs)
+
+
+def timing_report(init, t0s, t1s, t2s, t3s, cleanup, names=None,
+		placements=None):
+	"""Structured summary of the timings of a meshswap run, in seconds.
+
+	Args:
+		init: time spent before the primary loop, e.g. importing assets
+		t0s, t1s, t2s, t3s: per object timestamps of the loop start, face
+			processing start, instancing start and loop end, excluding any
+			time paused between chunks
+		cleanup: time spent after the loop
+		names: per object name, for the per object rows
+		placements: per object number of blocks placed
+	Returns:
+		OrderedDict of the total per phase, and a row per object swapped
+	"""
+	report = collections.OrderedDict()
+	report["init"] = init
+	report["loop_prep"] = sum(t1s) - sum(t0s)
+	report["face_process"] = sum(t2s) - sum(t1s)
+	report["instancing"] = sum(t3s) - sum(t2s)
+	report["cleanup"] = cleanup
+	report["total"] = (init + report["loop_prep"] + report["face_process"]
+		+ report["instancing"] + cleanup)
+	rows = []
+	for ind in range(len(t0s)):
+		row = collections.OrderedDict()
+		row["name"] = names[ind] if names else None
+		row["placements"] = placements[ind] if placements else None
+		row["loop_prep"] = t1s[ind] - t0s[ind]
+		row["face_process"] = t2s[ind] - t1s[ind]
+		row["instancing"] = t3s[ind] - t2s[ind]
+		rows.append(row)
+	report["objects"] = rows
+	return report
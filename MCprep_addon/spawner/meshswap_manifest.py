@@ -0,0 +1,234 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""
+Persistent manifest of the contents of a meshswap library blend file.
+
+Lists every group (collection) and object of the library with its swap
+properties, so that swaps can be planned and the UI list drawn without
+opening the blend file. The manifest is read once from the blend file by
+the caller, and is valid for as long as the file's mtime and size match,
+or else its content hash.
+"""
+
+import hashlib
+import json
+import os
+
+from .. import atomic_write
+
+
+MANIFEST_VERSION = 1
+
+# Custom properties of meshswap groups and objects which affect swapping
+SWAP_PROPS = ("variance", "edgeFloat", "doorlike", "edgeFlush", "torchlike",
+	"removable", "frontFaceRotate")
+
+# path: meshswap_manifest
+_manifests = {}
+
+
+def file_hash(path):
+	"""Returns md5 hex digest of a file's content, or None if unreadable."""
+	md5 = hashlib.md5()
+	try:
+		with open(path, 'rb') as fd:
+			for chunk in iter(lambda: fd.read(1 << 20), b""):
+				md5.update(chunk)
+	except OSError:
+		return None
+	return md5.hexdigest()
+
+
+def swap_props(items):
+	"""Filter the custom properties of a datablock to its swap properties.
+
+	Args:
+		items: (key, value) pairs of custom properties, with values already
+			converted to json compatible ones where possible
+	"""
+	return {key: value for key, value in items
+		if key in SWAP_PROPS and isinstance(value, (bool, int, float, str))}
+
+
+def alias_table(canon_mapping, names):
+	"""Map canonical names onto the library names they are remapped to.
+
+	Args:
+		canon_mapping: json canon_mapping_block, e.g. entity/chest/normal:
+			chest
+		names: all group and object names of the library
+	"""
+	names = set(names)
+	return {canon: target for canon, target in canon_mapping.items()
+		if target in names and canon not in names}
+
+
+def mapping_digest(canon_mapping):
+	"""Hash of the json alias mapping, to recompute aliases if it changes."""
+	data = json.dumps(sorted(canon_mapping.items()))
+	return hashlib.md5(data.encode("utf-8")).hexdigest()
+
+
+class meshswap_manifest():
+	"""Groups and objects of a meshswap library, with their swap properties."""
+
+	def __init__(self, path, cache_dir=None):
+		self.path = path
+		self.cache_dir = cache_dir
+		self.mtime = None
+		self.size = None
+		self.hash = None
+		self.groups = {}  # name: {prop: value}
+		self.objects = {}  # name: {prop: value}, excluding group names
+		self.aliases = {}  # canonical name: group or object name
+		self.alias_source = None
+
+	def cache_file(self):
+		if not self.cache_dir:
+			return None
+		key = hashlib.md5(self.path.encode("utf-8")).hexdigest()
+		return os.path.join(self.cache_dir, "meshswap_{}.json".format(key))
+
+	def set_contents(self, groups, objects, canon_mapping):
+		"""Set the contents as read from the blend file, stamping its state.
+
+		Args:
+			groups: dict of group name: swap props
+			objects: dict of object name: swap props
+			canon_mapping: json canon_mapping_block, for aliases
+		"""
+		stat = os.stat(self.path)
+		self.mtime = stat.st_mtime
+		self.size = stat.st_size
+		self.hash = file_hash(self.path)
+		self.groups = dict(groups)
+		self.objects = {name: props for name, props in objects.items()
+			if name not in self.groups}
+		self.update_aliases(canon_mapping)
+
+	def update_aliases(self, canon_mapping):
+		"""Recompute aliases if the json mapping changed, returns if so."""
+		digest = mapping_digest(canon_mapping)
+		if digest == self.alias_source:
+			return False
+		self.aliases = alias_table(
+			canon_mapping, list(self.groups) + list(self.objects))
+		self.alias_source = digest
+		return True
+
+	def is_current(self):
+		"""Whether the manifest still describes the blend file on disk.
+
+		Compares mtime and size first, falling back to the content hash so a
+		touched but unchanged file does not need re-reading.
+		"""
+		if self.hash is None:
+			return False
+		try:
+			stat = os.stat(self.path)
+		except OSError:
+			return False
+		if stat.st_mtime == self.mtime and stat.st_size == self.size:
+			return True
+		if stat.st_size != self.size or file_hash(self.path) != self.hash:
+			return False
+		self.mtime = stat.st_mtime
+		self.save()
+		return True
+
+	def load(self):
+		"""Load the persisted manifest, returns False if none or outdated."""
+		path = self.cache_file()
+		if not path or not os.path.isfile(path):
+			return False
+		try:
+			with open(path, 'r') as fd:
+				data = json.load(fd)
+		except (OSError, ValueError):
+			return False
+		if data.get("version") != MANIFEST_VERSION or data.get("path") != self.path:
+			return False
+		self.mtime = data.get("mtime")
+		self.size = data.get("size")
+		self.hash = data.get("hash")
+		self.groups = data.get("groups", {})
+		self.objects = data.get("objects", {})
+		self.aliases = data.get("aliases", {})
+		self.alias_source = data.get("alias_source")
+		return self.is_current()
+
+	def save(self):
+		"""Write the manifest, atomically replacing any old one."""
+		path = self.cache_file()
+		if not path:
+			return False
+		data = {
+			"version": MANIFEST_VERSION,
+			"path": self.path,
+			"mtime": self.mtime,
+			"size": self.size,
+			"hash": self.hash,
+			"groups": self.groups,
+			"objects": self.objects,
+			"aliases": self.aliases,
+			"alias_source": self.alias_source}
+		try:
+			atomic_write.write_json(path, data)
+		except OSError:
+			return False
+		return True
+
+	def lookup(self, name):
+		"""Find the library entry to swap a canonical name with.
+
+		Returns tuple of (kind, library name, swap props) where kind is
+		"group" or "object", or None if not in the library. Groups take
+		priority over objects, and the name itself over its alias.
+		"""
+		for target in (name, self.aliases.get(name)):
+			if not target:
+				continue
+			if target in self.groups:
+				return ("group", target, self.groups[target])
+			elif target in self.objects:
+				return ("object", target, self.objects[target])
+		return None
+
+
+def get_manifest(path, cache_dir=None):
+	"""Returns the in memory manifest for a library path, loading if needed.
+
+	The returned manifest is empty (hash None) if there is no current one
+	persisted, in which case the caller reads the blend file and sets its
+	contents.
+	"""
+	manifest = _manifests.get(path)
+	if manifest is not None and manifest.cache_dir == cache_dir:
+		if manifest.is_current():
+			return manifest
+	manifest = meshswap_manifest(path, cache_dir)
+	if not manifest.load():
+		manifest = meshswap_manifest(path, cache_dir)
+	_manifests[path] = manifest
+	return manifest
+
+
+def clear_manifests():
+	"""Forget the in memory manifests, e.g. to force re-reading libraries."""
+	_manifests.clear()
@@ -382,14 +382,25 @@ class MCPREP_OT_mob_spawner(bpy.types.Operator):
 
 		path = bpy.path.abspath(path)
 		act = None
-		if hasattr(bpy.data, "groups"):
-			util.bAppendLink(path + '/Group', name, True)
-			act = context.object  # assumption of object after linking, 2.7 only
-		elif hasattr(bpy.data, "collections"):
-			util.bAppendLink(path + '/Collection', name, True)
-			act = context.selected_objects[0] # better for 2.8
+		loaded = util.bulk_append(
+			path, {"collections": [name]}, link=True, context=context)
+		if loaded["collections"]:
+			# instance the linked group at the cursor, as linking would
+			coll = loaded["collections"][0]
+			for ob in util.get_objects_conext(context):
+				util.select_set(ob, False)
+			act = bpy.data.objects.new(coll.name, None)
+			if hasattr(act, "instance_type"): # 2.8
+				act.instance_type = 'COLLECTION'
+				act.instance_collection = coll
+			else:
+				act.dupli_type = 'GROUP'
+				act.dupli_group = coll
+			util.obj_link_scene(act, context)
+			act.location = util.get_cuser_location(context)
+			util.select_set(act, True)
+			util.set_active_object(context, act)
 
-		# util.bAppendLink(os.path.join(path, g_or_c), name, True)
 		# proxy any and all armatures
 		# here should do all that jazz with hacking by copying files, checking nth number
 		#probably consists of checking currently linked libraries, checking if which
@@ -473,12 +484,11 @@ class MCPREP_OT_mob_spawner(bpy.types.Operator):
 			subpath = 'Collection'
 
 		conf.log(os.path.join(path, subpath) + ', ' + name)
-		pregroups = list(util.collections())
-		util.bAppendLink(os.path.join(path, subpath), name, False)
-		postgroups = list(util.collections())
+		loaded = util.bulk_append(
+			path, {"collections": [name]}, context=context)
 
 		g1 = None
-		new_groups = list(set(postgroups)-set(pregroups))
+		new_groups = loaded["collections"]
 		if not new_groups and name in util.collections():
 			# this is more likely to fail but serves as a fallback
 			conf.log("Mob spawn: Had to go to fallback group name grab")
@@ -503,14 +513,12 @@ class MCPREP_OT_mob_spawner(bpy.types.Operator):
 		cl = util.get_cuser_location(context)
 
 		# For some reason, adding group objects on its own doesn't work
-		all_objects = context.selected_objects
 		addedObjs = [ob for ob in grp_added.objects]
-		for ob in all_objects:
-			if ob not in addedObjs:
-				conf.log("This obj not in group: " + ob.name)
-				# removes things like random bone shapes pulled in,
-				# without deleting them, just unlinking them from the scene
-				util.obj_unlink_remove(ob, False, context)
+		for ob in loaded["loose_objects"]:
+			conf.log("This obj not in group: " + ob.name)
+			# removes things like random bone shapes pulled in,
+			# without deleting them, just unlinking them from the scene
+			util.obj_unlink_remove(ob, False, context)
 
 		if not util.bv28():
 			grp_added.name = "reload-blend-to-remove-this-empty-group"
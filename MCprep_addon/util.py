@@ -16,6 +16,7 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 
+import hashlib
 import json
 import operator
 import os
@@ -62,6 +63,7 @@ def materialsFromObj(obj_list):
 	Loop over every object, adding each material if not already added
 	"""
 	mat_list = []
+	seen = set()  # pointers, to avoid a linear search of mat_list
 	for obj in obj_list:
 		# also capture obj materials from dupliverts/instances on e.g. empties
 		if hasattr(obj, "dupli_group") and obj.dupli_group: # 2.7
@@ -73,7 +75,11 @@ def materialsFromObj(obj_list):
 		if obj.type != 'MESH':
 			continue
 		for slot in obj.material_slots:
-			if slot.material is not None and slot.material not in mat_list:
+			if slot.material is None:
+				continue
+			ptr = slot.material.as_pointer()
+			if ptr not in seen:
+				seen.add(ptr)
 				mat_list.append(slot.material)
 	return mat_list
 
@@ -114,29 +120,124 @@ def bAppendLink(directory, name, toLink, active_layer=True):
 					) #, activelayer=True
 
 
-def obj_copy(base, context=None, vertex_groups=True, modifiers=True):
+def bulk_append(blendfile, datablocks, link=False, context=None,
+		instantiate=True):
+	"""Append or link many datablocks from one blend file in a single load.
+
+	Unlike bAppendLink, the library is only opened once, no operators are
+	run, and the loaded datablocks are returned directly so no selection
+	state needs to be read back. Names not in the library are skipped.
+
+	Args:
+		blendfile: path to the library blend file
+		datablocks: dict of bpy.data attribute name to list of names, e.g.
+			{"collections": [...], "objects": [...]}; "collections" and
+			"groups" are treated the same, as per the blender version
+		link: whether to link rather than append
+		instantiate: link loaded objects and appended collections into the
+			scene as append would, plus any other new objects appended along
+			with them (e.g. parents or driver targets) which are left loose;
+			when linking, only the requested objects are, as objects of a
+			linked group are instanced by the caller instead
+	Returns:
+		dict of the same keys to lists of the loaded datablocks, plus
+		"loose_objects" of the other new objects linked into the scene
+	"""
+	if not context:
+		context = bpy.context
+	conf.log("Bulk {} from {}: {}".format(
+		"linking" if link else "appending", blendfile, datablocks), vv_only=True)
+
+	attrs = {}
+	for key in datablocks:
+		if key in ("groups", "collections"):
+			attrs[key] = "groups" if hasattr(bpy.data, "groups") else "collections"
+		else:
+			attrs[key] = key
+	pre_objects = set(bpy.data.objects)
+
+	with bpy.data.libraries.load(blendfile, link=link) as (data_from, data_to):
+		for key, names in datablocks.items():
+			available = set(getattr(data_from, attrs[key]))
+			request = []
+			for name in names:
+				if name in request:
+					continue
+				elif name not in available:
+					conf.log("Not in library: {}/{}".format(attrs[key], name))
+					continue
+				request.append(name)
+			setattr(data_to, attrs[key], request)
+
+	loaded = {}
+	for key in datablocks:
+		loaded[key] = [block for block in getattr(data_to, attrs[key])
+			if block is not None]
+	loaded["loose_objects"] = []
+	if not instantiate:
+		return loaded
+
+	scene_objs = []
+	for key, blocks in loaded.items():
+		if attrs.get(key) == "objects":
+			scene_objs += blocks
+		elif attrs.get(key) in ("groups", "collections") and not link:
+			for coll in blocks:
+				if bv28():
+					# appended collections go under the active collection
+					active = context.view_layer.active_layer_collection
+					active.collection.children.link(coll)
+				else:
+					scene_objs += list(coll.objects)
+
+	def is_loose(obj):
+		return not obj.users_collection if bv28() else not obj.users_scene
+
+	for obj in scene_objs:
+		if is_loose(obj):
+			obj_link_scene(obj, context)
+
+	# objects of linked groups are never in a scene of their own
+	if not link:
+		for obj in bpy.data.objects:
+			if obj in pre_objects or obj in scene_objs:
+				continue
+			if is_loose(obj):
+				obj_link_scene(obj, context)
+				loaded["loose_objects"].append(obj)
+
+	# as per append to the active layer, blender 2.7
+	if hasattr(context.scene, "active_layer") and not link:
+		layers = [ind == context.scene.active_layer for ind in range(20)]
+		for obj in scene_objs + loaded["loose_objects"]:
+			obj.layers = layers
+	return loaded
+
+
+def obj_copy(base, context=None, vertex_groups=True, modifiers=True,
+		linked=False):
 	"""Copy an object's data, vertex groups, and modifiers without operators.
 
-	Input must be a valid object in bpy.data.objects
+	Input must be a valid object in bpy.data.objects. If linked, the copy
+	is a linked duplicate sharing the base's mesh (and so its materials and
+	vertex weights), else the mesh is copied along with its weights. Either
+	way only vertex group names and modifiers are copied as object settings.
 	"""
 	if not base or base.name not in bpy.data.objects:
 		raise Exception("Invalid object passed")
 	if not context:
 		context = bpy.context
 
-	new_ob = bpy.data.objects.new(base.name, base.data.copy())
+	new_ob = bpy.data.objects.new(
+		base.name, base.data if linked else base.data.copy())
 	obj_link_scene(new_ob, context)
 
 	if vertex_groups:
-		verts = len(base.data.vertices)
+		# weights live on the mesh by group index, so only the object level
+		# groups are needed, by name in the same order
 		for vgroup in base.vertex_groups:
-			print("Running vertex group: ", vgroup.name)
-			new_g = new_ob.vertex_groups.new(name=vgroup.name)
-			for i in range(0, verts):
-				try:
-					new_g.add([i], vgroup.weight(i), "REPLACE")
-				except:
-					pass  # no way to check if a given vertex is part of src group
+			if vgroup.name not in new_ob.vertex_groups:
+				new_ob.vertex_groups.new(name=vgroup.name)
 
 	if modifiers:
 		for mod_src in base.modifiers:
@@ -159,18 +260,6 @@ def bv28():
 	return BV_IS_28
 
 
-def face_on_edge(faceLoc):
-	"""Check if a face is on the boundary between two blocks (local coordinates)."""
-	face_decimals = [loc - loc//1 for loc in faceLoc]
-	if face_decimals[0] > 0.4999 and face_decimals[0] < 0.501:
-		return True
-	elif face_decimals[1] > 0.499 and face_decimals[1] < 0.501:
-		return True
-	elif face_decimals[2] > 0.499 and face_decimals[2] < 0.501:
-		return True
-	return False
-
-
 def randomizeMeshSawp(swap,variations):
 	"""Randomization for model imports, add extra statements for exta cases."""
 	randi=''
@@ -221,6 +310,128 @@ def remap_users(old, new):
 		return "not available prior to blender 2.78"
 
 
+def consolidation_map(datablocks, key_func):
+	"""Map each duplicate datablock to the canonical one of its group.
+
+	Datablocks are grouped by key in a single hashed pass, and the target of
+	each group is the first by name. Datablocks with a fake user or linked
+	from a library are never mapped.
+
+	Args:
+		datablocks: iterable of ID datablocks
+		key_func: function returning the group key of a datablock, or None
+			to leave the datablock out
+	Returns:
+		dict of duplicate.as_pointer(): (duplicate, target)
+	"""
+	groups = {}
+	for block in datablocks:
+		key = key_func(block)
+		if key is not None:
+			groups.setdefault(key, []).append(block)
+	res = {}
+	for blocks in groups.values():
+		if len(blocks) < 2:
+			continue
+		blocks.sort(key=lambda block: block.name)
+		for block in blocks[1:]:
+			if block.use_fake_user or block.library:
+				continue
+			res[block.as_pointer()] = (block, blocks[0])
+	return res
+
+
+def remap_material_slots(objects, remap):
+	"""Reassign material slots of the given objects in one pass.
+
+	Args:
+		objects: objects to update, only these are affected
+		remap: dict from consolidation_map
+	Returns:
+		number of slots reassigned
+	"""
+	count = 0
+	for obj in objects:
+		if obj.library:
+			continue
+		for slot in obj.material_slots:
+			if slot.material is None:
+				continue
+			entry = remap.get(slot.material.as_pointer())
+			if entry:
+				slot.material = entry[1]
+				count += 1
+	return count
+
+
+def remap_image_users(materials, textures, remap):
+	"""Reassign images of material nodes and textures in one pass.
+
+	Args:
+		materials: materials whose image nodes to update
+		textures: image textures to update (blender internal)
+		remap: dict from consolidation_map
+	Returns:
+		number of image users reassigned
+	"""
+	count = 0
+	for mat in materials:
+		if mat.library or not mat.use_nodes or not mat.node_tree:
+			continue
+		for node in mat.node_tree.nodes:
+			image = getattr(node, "image", None)
+			if image is None:
+				continue
+			entry = remap.get(image.as_pointer())
+			if entry:
+				node.image = entry[1]
+				count += 1
+	for tex in textures:
+		image = getattr(tex, "image", None)
+		if tex.library or image is None:
+			continue
+		entry = remap.get(image.as_pointer())
+		if entry:
+			tex.image = entry[1]
+			count += 1
+	return count
+
+
+def remove_orphans(data_collection, datablocks):
+	"""Remove all of the given datablocks which have no users left at once.
+
+	Returns the number of datablocks removed.
+	"""
+	orphans = [block for block in datablocks if block.users == 0]
+	if not orphans:
+		return 0
+	if hasattr(bpy.data, "batch_remove"):  # 2.81+
+		bpy.data.batch_remove(ids=orphans)
+	else:
+		for block in orphans:
+			data_collection.remove(block)
+	return len(orphans)
+
+
+def image_content_hash(image):
+	"""Returns md5 hex digest of an image's file or packed data, or None.
+
+	Generated images and sequences are not hashed.
+	"""
+	if image.packed_file:
+		return hashlib.md5(image.packed_file.data).hexdigest()
+	if image.source != 'FILE':
+		return None
+	path = bpy.path.abspath(image.filepath)
+	if not os.path.isfile(path):
+		return None
+	digest = hashlib.md5()
+	with open(path, 'rb') as fd:
+		for chunk in iter(lambda: fd.read(65536), b''):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+
 def get_objects_conext(context):
 	"""Returns list of objects, either from view layer if 2.8 or scene if 2.8"""
 	if bv28():
@@ -401,6 +612,31 @@ def load_mcprep_json():
 			conf.json_data = default
 
 
+def get_cache_dir(subfolder=None):
+	"""Returns folder for MCprep's persistent caches, creating it if needed.
+
+	Placed in blender's user config folder, falling back to the temp folder
+	if that is unavailable. Returns None if neither can be created.
+	"""
+	try:
+		path = bpy.utils.user_resource('CONFIG', path="mcprep_cache", create=True)
+	except Exception as err:
+		conf.log("Could not get user config folder: "+str(err))
+		path = None
+	if not path:
+		import tempfile
+		path = os.path.join(tempfile.gettempdir(), "mcprep_cache")
+	if subfolder:
+		path = os.path.join(path, subfolder)
+	if not os.path.isdir(path):
+		try:
+			os.makedirs(path)
+		except OSError as err:
+			conf.log("Could not create cache folder: "+str(err))
+			return None
+	return path
+
+
 def ui_scale():
 	"""Returns scale of UI, for width drawing. Compatible down to blender 2.72"""
 	prefs = get_preferences()
@@ -624,19 +624,30 @@ class MCPREP_OT_add_mc_sky(bpy.types.Operator):
 				self.report({'ERROR'}, "Source MCprep world blend file does not exist: "+blendfile)
 				conf.log("Source MCprep world blend file does not exist: "+blendfile)
 				return {'CANCELLED'}
-			resource = blendfile +"/Object"
+			mesh_names = ["MoonMesh", "SunMesh"]
+		else:
+			mesh_names = []
+		if self.add_clouds:
+			mesh_names.append("clouds")
+
+		# sun, moon and cloud meshes all from the one library load
+		loaded = {"objects": [], "loose_objects": []}
+		if mesh_names and os.path.isfile(blendfile):
+			loaded = util.bulk_append(
+				blendfile, {"objects": mesh_names}, context=context)
+		appended = {util.nameGeneralize(obj.name): obj
+			for obj in loaded["objects"]}
 
-			util.bAppendLink(resource, "MoonMesh", False)
-			if context.selected_objects:
-				moonmesh = context.selected_objects[0]
+		if self.world_type in ("world_static_mesh", "world_mesh"):
+			if "MoonMesh" in appended:
+				moonmesh = appended["MoonMesh"]
 				moonmesh.parent = get_time_object()
 				new_objs.append(moonmesh)
 			else:
 				self.report({'WARNING'}, "Could not add moon")
 
-			util.bAppendLink(resource, "SunMesh", False)
-			if context.selected_objects:
-				sunmesh = context.selected_objects[0]
+			if "SunMesh" in appended:
+				sunmesh = appended["SunMesh"]
 				sunmesh.parent = get_time_object()
 				new_objs.append(sunmesh)
 			else:
@@ -645,12 +656,14 @@ class MCPREP_OT_add_mc_sky(bpy.types.Operator):
 		if prev_world:
 			bpy.data.worlds.remove(prev_world)
 
+		# anything else appended along with the meshes, e.g. parents
+		new_objs += loaded["loose_objects"]
+
 		if self.add_clouds:
-			resource = blendfile +"/Object"
-			util.bAppendLink(resource, "clouds", False)
-			new_objs += list(context.selected_objects)
+			clouds = [appended["clouds"]] if "clouds" in appended else []
+			new_objs += clouds
 			if engine in ('BLENDER_RENDER', 'BLENDER_GAME'):
-				materials = util.materialsFromObj(context.selected_objects)
+				materials = util.materialsFromObj(clouds)
 				for mat in materials:
 					mat.use_nodes = False
 					mat.use_shadeless = False
@@ -686,7 +699,6 @@ class MCPREP_OT_add_mc_sky(bpy.types.Operator):
 
 	def create_dynamic_world(self, context, blendfile, wname):
 		"""Setup fpr creating a dynamic world and setting up driver targets"""
-		resource = blendfile + "/World"
 		obj_list = []
 
 		global time_obj_cache
@@ -698,9 +710,9 @@ class MCPREP_OT_add_mc_sky(bpy.types.Operator):
 
 		time_obj_cache = None # force reset to use newer cache object
 
-		# Append the world (and time control elements)
-		util.bAppendLink(resource, wname, False)
-		obj_list += list(context.selected_objects)
+		# Append the world, and its time control elements along with it
+		loaded = util.bulk_append(blendfile, {"worlds": [wname]}, context=context)
+		obj_list += loaded["loose_objects"]
 
 		if wname in bpy.data.worlds:
 			context.scene.world = bpy.data.worlds[wname]
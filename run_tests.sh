@@ -16,6 +16,9 @@
 # Run only a single unit test, but across all blender versions
 # ./run_tests.sh -all -run change_skin
 
+# Benchmark meshswap on synthetic worlds, compared against the baseline
+# python3 test_files/meshswap_benchmark.py --blender "/path/to/blender"
+
 TEST_ALL=$1 # pass in -all or only does first
 
 
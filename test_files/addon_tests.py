@@ -51,6 +51,11 @@ class mcprep_testing():
 		self.test_cases = [
 			self.enable_mcprep,
 			self.prep_materials,
+			self.prep_materials_templates,
+			self.prep_materials_fingerprint,
+			self.combine_materials,
+			self.select_alpha_faces,
+			self.scale_uv,
 			self.openfolder,
 			self.spawn_mob,
 			self.change_skin,
@@ -60,11 +65,30 @@ class mcprep_testing():
 			self.import_mineways_separated,
 			self.import_mineways_combined,
 			self.name_generalize,
+			self.obj_copy_vertex_groups,
+			self.canonical_name_resolver,
+			self.block_list_matcher,
+			self.texturepack_index,
+			self.prep_materials_plan,
+			self.meshswap_face_table,
+			self.meshswap_placements,
+			self.meshswap_manifest,
+			self.meshswap_merge_arrays,
+			self.bulk_append,
 			self.meshswap_spawner,
 			self.meshswap_jmc2obj,
+			self.meshswap_instancing,
+			self.meshswap_shared_data,
+			self.meshswap_merged,
+			self.meshswap_budget,
 			self.meshswap_mineways_separated,
 			self.meshswap_mineways_combined,
 			self.detect_desaturated_images,
+			self.grayscale_image_cache,
+			self.sequence_export,
+			self.sequence_frame_cache,
+			self.sequence_mcmeta_timing,
+			self.sequence_parallel_export,
 			self.find_missing_images_cycles,
 			self.qa_meshswap_file,
 			self.item_spawner,
@@ -234,6 +258,30 @@ class mcprep_testing():
 		mcmob_type='hostile/mobs - Rymdnisse.blend:/:silverfish'
 		bpy.ops.mcprep.mob_spawner(mcmob_type=mcmob_type)
 
+	def _add_uv_quads(self, name, uv_rects):
+		"""Add a mesh object of one quad per (u_min, v_min, u_max, v_max)."""
+		verts = []
+		faces = []
+		for ind, _ in enumerate(uv_rects):
+			verts += [(ind, 0, 0), (ind+1, 0, 0), (ind+1, 1, 0), (ind, 1, 0)]
+			faces.append([4*ind, 4*ind+1, 4*ind+2, 4*ind+3])
+		mesh = bpy.data.meshes.new(name)
+		mesh.from_pydata(verts, [], faces)
+		if hasattr(mesh, "uv_textures"):
+			mesh.uv_textures.new()
+		else:
+			mesh.uv_layers.new()
+		uv_data = mesh.uv_layers.active.data
+		for poly, rect in zip(mesh.polygons, uv_rects):
+			corners = [(rect[0], rect[1]), (rect[2], rect[1]),
+				(rect[2], rect[3]), (rect[0], rect[3])]
+			for loop_ind, corner in zip(poly.loop_indices, corners):
+				uv_data[loop_ind].uv = corner
+		obj = bpy.data.objects.new(name, mesh)
+		from MCprep import util
+		util.obj_link_scene(obj)
+		return obj
+
 	def _import_jmc2obj_full(self):
 		"""Import the full jmc2obj test set"""
 		testdir = os.path.dirname(__file__)
@@ -387,6 +435,114 @@ class mcprep_testing():
 	def prep_materials_cycles(self):
 		"""Cycles-specific tests"""
 
+	def prep_materials_templates(self):
+		"""Cycles materials share template node groups, and are not rebuilt"""
+		self._clear_scene()
+		bpy.context.scene.render.engine = 'CYCLES'
+		bpy.ops.mesh.primitive_plane_add()
+		obj = bpy.context.object
+		mat_a, _ = self._create_canon_mat()
+		mat_b, _ = self._create_canon_mat()
+		obj.data.materials.append(mat_a)
+		obj.data.materials.append(mat_b)
+
+		bpy.ops.mcprep.prep_materials(
+			animateTextures=False,
+			autoFindMissingTextures=False,
+			improveUiSettings=False)
+		groups = [node.node_tree for mat in [mat_a, mat_b]
+			for node in mat.node_tree.nodes if node.type == 'GROUP']
+		if len(groups) != 2 or groups[0] != groups[1]:
+			return "Materials do not share one template: "+str(groups)
+
+		# prepping again should keep the existing nodes
+		diffuse = [node for node in mat_a.node_tree.nodes
+			if "MCPREP_diffuse" in node][0]
+		diffuse["MCPREP_test_marker"] = True
+		bpy.ops.mcprep.prep_materials(
+			animateTextures=False,
+			autoFindMissingTextures=False,
+			improveUiSettings=False,
+			forceRebuild=True)
+		markers = [node for node in mat_a.node_tree.nodes
+			if "MCPREP_test_marker" in node]
+		if not markers:
+			return "Material was rebuilt although already matching its template"
+
+	def prep_materials_fingerprint(self):
+		"""Unchanged materials are skipped on re-prep, unless forced"""
+		self._clear_scene()
+		bpy.context.scene.render.engine = 'CYCLES'
+		bpy.ops.mesh.primitive_plane_add()
+		mat, _ = self._create_canon_mat()
+		bpy.context.object.active_material = mat
+
+		bpy.ops.mcprep.prep_materials(
+			animateTextures=False,
+			autoFindMissingTextures=False,
+			improveUiSettings=False)
+		if not mat.get("MCPREP_fingerprint"):
+			return "No fingerprint stored on prepped material"
+
+		# removing a node would be fixed by a rebuild, but not by a skip
+		sat_node = [node for node in mat.node_tree.nodes if "SATURATE" in node][0]
+		mat.node_tree.nodes.remove(sat_node)
+		bpy.ops.mcprep.prep_materials(
+			animateTextures=False,
+			autoFindMissingTextures=False,
+			improveUiSettings=False)
+		if [node for node in mat.node_tree.nodes if "SATURATE" in node]:
+			return "Unchanged material was prepped again"
+
+		bpy.ops.mcprep.prep_materials(
+			animateTextures=False,
+			autoFindMissingTextures=False,
+			improveUiSettings=False,
+			useReflections=False)
+		if not [node for node in mat.node_tree.nodes if "SATURATE" in node]:
+			return "Material not prepped again after changing options"
+
+	def combine_materials(self):
+		"""Duplicate materials and identical images are consolidated"""
+		self._clear_scene()
+		for mat in list(bpy.data.materials):
+			bpy.data.materials.remove(mat)
+		for img in list(bpy.data.images):
+			bpy.data.images.remove(img)
+
+		objs = []
+		mats = []
+		for _ in range(3):
+			bpy.ops.mesh.primitive_plane_add()
+			mat, _ = self._create_canon_mat("sugar_cane")
+			bpy.context.object.active_material = mat
+			objs.append(bpy.context.object)
+			mats.append(mat)
+		if [mat.name for mat in mats] != ["sugar_cane", "sugar_cane.001",
+				"sugar_cane.002"]:
+			return "Failed to setup test, material names: "+str(
+				[mat.name for mat in mats])
+
+		# the same file loaded three times under different names
+		for i, img in enumerate(bpy.data.images):
+			img.name = "copy_{}".format("abc"[i])
+
+		bpy.ops.mcprep.combine_materials(selection_only=False)
+		names = [obj.active_material.name for obj in objs]
+		if names != ["sugar_cane"]*3:
+			return "Materials not consolidated: "+str(names)
+		if len(bpy.data.materials) != 1:
+			return "Old materials not removed: "+str(list(bpy.data.materials))
+
+		bpy.ops.mcprep.combine_images(selection_only=False)
+		if len(bpy.data.images) != 3:
+			return "Differently named images consolidated by default: "+str(
+				list(bpy.data.images))
+		bpy.ops.mcprep.combine_images(selection_only=False, by_content=True)
+		if len(bpy.data.images) != 1:
+			return "Identical images not consolidated: "+str(
+				list(bpy.data.images))
+
 	def find_missing_images_cycles(self):
 		"""Find missing images from selected materials, cycles.
 
@@ -526,6 +682,73 @@ class mcprep_testing():
 		os.remove(tmp_image)
 
 
+	def select_alpha_faces(self):
+		"""Checks faces over transparent pixels get selected, per object"""
+		from MCprep import util
+		self._clear_scene()
+		img = bpy.data.images.new("half_alpha", 8, 8, alpha=True)
+		# left half fully transparent, right half opaque
+		pixels = []
+		for row in range(8):
+			for col in range(8):
+				pixels += [1, 1, 1, 0 if col < 4 else 1]
+		img.pixels[:] = pixels
+		mat = bpy.data.materials.new("alpha_test")
+		mat.use_nodes = True
+		node = mat.node_tree.nodes.new("ShaderNodeTexImage")
+		node.image = img
+
+		# second face is shifted by a whole tile, which wraps around
+		objs = [
+			self._add_uv_quads("alpha_a", [(0, 0, 0.5, 1), (1.5, 0, 2, 1)]),
+			self._add_uv_quads("alpha_b", [(0.5, 0, 1, 1), (0, 0, 0.25, 0.5)])]
+		for obj in objs:
+			obj.data.materials.append(mat)
+			util.select_set(obj, True)
+		util.set_active_object(bpy.context, objs[0])
+
+		bpy.ops.object.mode_set(mode="EDIT")
+		res = bpy.ops.mcprep.select_alpha_faces(threshold=0.2)
+		bpy.ops.object.mode_set(mode="OBJECT")
+		if res != {"FINISHED"}:
+			return "Operator did not finish: "+str(res)
+
+		expected = {"alpha_a": [True, False], "alpha_b": [False, True]}
+		if not hasattr(bpy.context, "objects_in_mode"):
+			del expected["alpha_b"] # no multi-object edit mode before 2.8
+		for name in expected:
+			selected = [poly.select for poly in bpy.data.objects[name].data.polygons]
+			if selected != expected[name]:
+				return "Wrong faces selected on {}: {}".format(name, selected)
+
+	def scale_uv(self):
+		"""Checks UV faces are scaled about their own centers, per object"""
+		from MCprep import util
+		self._clear_scene()
+		objs = [
+			self._add_uv_quads("scale_a", [(0, 0, 1, 1), (1, 1, 2, 2)]),
+			self._add_uv_quads("scale_b", [(0, 0, 0.5, 0.5)])]
+		for obj in objs:
+			util.select_set(obj, True)
+		util.set_active_object(bpy.context, objs[0])
+
+		res = bpy.ops.mcprep.scale_uv(scale=0.5, selected_only=False)
+		if res != {"FINISHED"}:
+			return "Operator did not finish: "+str(res)
+
+		expected = {
+			"scale_a": [(0.25, 0.25, 0.75, 0.75), (1.25, 1.25, 1.75, 1.75)],
+			"scale_b": [(0.125, 0.125, 0.375, 0.375)]}
+		for name in expected:
+			mesh = bpy.data.objects[name].data
+			uv_data = mesh.uv_layers.active.data
+			for poly, rect in zip(mesh.polygons, expected[name]):
+				us = [uv_data[i].uv[0] for i in poly.loop_indices]
+				vs = [uv_data[i].uv[1] for i in poly.loop_indices]
+				res = (min(us), min(vs), max(us), max(vs))
+				if any(abs(a-b) > 0.0001 for a, b in zip(res, rect)):
+					return "Wrong UVs on {}: {}, expected {}".format(name, res, rect)
+
 	def openfolder(self):
 		if bpy.app.background is True:
 			return "" # can't test this in background mode
@@ -777,6 +1000,33 @@ class mcprep_testing():
 		res = self.import_materials_util("block_mapping_mineways")
 		return res
 
+	def obj_copy_vertex_groups(self):
+		"""Checks copied objects keep vertex groups and current weights"""
+		from MCprep import util
+		self._clear_scene()
+		bpy.ops.mesh.primitive_cube_add()
+		base = bpy.context.object
+		top = base.vertex_groups.new(name="top")
+		half = base.vertex_groups.new(name="half")
+		top.add([0, 1, 2], 1.0, "REPLACE")
+		half.add([2, 3], 0.5, "REPLACE")
+		half.add([4], 0.25, "REPLACE")
+
+		for linked in (False, False, True):
+			new_ob = util.obj_copy(base, linked=linked)
+			if [vg.name for vg in new_ob.vertex_groups] != ["top", "half"]:
+				return "Wrong copied vertex groups"
+			for vert in new_ob.data.vertices:
+				src = {base.vertex_groups[elem.group].name: round(elem.weight, 3)
+					for elem in base.data.vertices[vert.index].groups}
+				dst = {new_ob.vertex_groups[elem.group].name: round(elem.weight, 3)
+					for elem in vert.groups}
+				if src != dst:
+					return "Vertex {} weights differ: {} vs {}".format(
+						vert.index, src, dst)
+			# a weight edit between copies must show in the next copy
+			half.add([3], 0.75, "REPLACE")
+
 	def name_generalize(self):
 		"""Tests the outputs of the generalize function"""
 		from MCprep.util import nameGeneralize
@@ -804,7 +1054,211 @@ class mcprep_testing():
 		if errors:
 			return "Generalize failed: "+", ".join(errors)
 
-	def meshswap_util(self, mat_name):
+	def canonical_name_resolver(self):
+		"""Tests the precompiled canonical name lookup and its invalidation"""
+		from MCprep import conf
+		from MCprep.util import load_mcprep_json
+		from MCprep.materials import generate
+
+		load_mcprep_json()
+		resolver = generate.get_canonical_resolver()
+		blocks = conf.json_data["blocks"]
+
+		# every mapping should resolve the same as a direct sequential lookup
+		errors = []
+		for key, form in [("block_mapping_mc", "mc"),
+				("block_mapping_jmc", "jmc2obj"),
+				("block_mapping_mineways", "mineways")]:
+			for name in list(blocks[key])[:50]:
+				if name in blocks["block_mapping_mc"]:
+					expected = (blocks["block_mapping_mc"][name], "mc")
+				elif name in blocks["block_mapping_jmc"]:
+					expected = (blocks["block_mapping_jmc"][name], "jmc2obj")
+				else:
+					expected = (blocks[key][name], form)
+				res = generate.get_mc_canonical_name(name+".001")
+				if res != expected:
+					errors.append("{} gave {}, expected {}".format(
+						name, res, expected))
+		if errors:
+			return "Resolver mismatch: "+", ".join(errors[:5])
+
+		res = resolver.resolve_many(["not_a_block.002", "not_a_block.002"])
+		if res != [("not_a_block", None), ("not_a_block", None)]:
+			return "Unexpected unmatched batch result: "+str(res)
+
+		# reloading the json must result in a new resolver
+		load_mcprep_json()
+		if generate.get_canonical_resolver() is resolver:
+			return "Resolver was not invalidated after json reload"
+
+	def block_list_matcher(self):
+		"""Tests the precompiled block list membership with wildcards"""
+		from MCprep.materials import canon_index
+
+		json_data = {"blocks": {
+			"solid": ["stone", "wool_*", "*_ore"],
+			"reflective": ["glass", "stained_*_pane"],
+			"emit": []}}
+		matcher = canon_index.block_list_matcher(json_data)
+		test_sets = {
+			"stone": {"solid"},  # exact
+			"wool_red": {"solid"},  # suffix wildcard
+			"colored_wool_red": {"solid"},  # fragments match anywhere
+			"iron_ore": {"solid"},  # prefix wildcard
+			"glass": {"reflective"},
+			"stained_glass_pane": {"reflective"},  # both fragments in order
+			"stained_glass": set(),  # only one fragment
+			"pane_stained_": set(),  # fragments out of order
+			"stone_bricks": set(),
+			"wool": set(),
+			"": set()}
+		errors = []
+		for name in test_sets:
+			res = matcher.classify(name)
+			if res != test_sets[name]:
+				errors.append("{} gave {}, expected {}".format(
+					name, sorted(res), sorted(test_sets[name])))
+		if errors:
+			return "Block list mismatch: "+", ".join(errors)
+		if not matcher.check("iron_ore", "solid") or matcher.check("iron_ore", "emit"):
+			return "Unexpected check result for iron_ore"
+		if not matcher.has_list("emit") or matcher.has_list("water"):
+			return "Unexpected lists compiled: "+str(sorted(matcher.lists))
+
+	def texturepack_index(self):
+		"""Tests the resource pack file index lookups and incremental rescan"""
+		from MCprep.materials import texturepack_index
+
+		pack = tempfile.mkdtemp()
+		root = os.path.join(pack, "assets", "minecraft", "textures")
+		for sub in ["block", "item", "mineways_assets"]:
+			os.makedirs(os.path.join(root, sub))
+		for relpath in ["block/stone.png", "block/stone.png.mcmeta",
+				"block/stone_n.png", "block/stone_s.png", "item/stick.jpg", "dirt.png", "mineways_assets/mineways-RGB.png"]:
+			open(os.path.join(root, *relpath.split("/")), 'w').close()
+
+		cache_dir = os.path.join(pack, "cache")
+		texturepack_index.clear_indexes()
+		index = texturepack_index.get_index(pack, cache_dir=cache_dir)
+		test_sets = {
+			"stone": os.path.join(root, "block", "stone.png"),
+			"block/stone": os.path.join(root, "block", "stone.png"),
+			"stick": os.path.join(root, "item", "stick.jpg"),
+			"dirt": os.path.join(root, "dirt.png"),
+			"tile-RGB": os.path.join(root, "mineways_assets", "mineways-RGB.png"),
+			"missing": None}
+		errors = []
+		for key in test_sets:
+			res = index.find(key)
+			if res != test_sets[key]:
+				errors.append("{} found {}, expected {}".format(
+					key, res, test_sets[key]))
+		if errors:
+			return "Index lookup failed: "+", ".join(errors)
+		if not index.has_file("block/stone.png.mcmeta"):
+			return "Index missing mcmeta file"
+
+		# other spellings are found where the filesystem ignores case
+		ignores_case = os.path.normcase("A") == "a"
+		res = index.find("Block/STONE")
+		expected = os.path.join(root, "block", "stone.png") if ignores_case else None
+		if res != expected:
+			return "Mixed case lookup found {}, expected {}".format(res, expected)
+		if index.contains_file(os.path.join(root, "ITEM", "stick.jpg")) != ignores_case:
+			return "Mixed case containment not by the filesystem's case rules"
+
+		passes = texturepack_index.get_pass_map(os.path.join(root, "block"))
+		res = passes.find("stone")
+		if res != {"normal": os.path.join(root, "block", "stone_n.png"),
+				"specular": os.path.join(root, "block", "stone_s.png")}:
+			return "Unexpected passes found: "+str(res)
+		if texturepack_index.get_pass_map(os.path.join(root, "block")) is not passes:
+			return "Pass map was rebuilt for an unchanged folder"
+
+		# a warm lookup neither resolves the folder nor asks for the cache dir
+		resolve = texturepack_index.resolve_textures_folder
+		texturepack_index.resolve_textures_folder = None
+		try:
+			warm = texturepack_index.get_index(
+				pack, cache_dir=lambda: 1/0)
+		finally:
+			texturepack_index.resolve_textures_folder = resolve
+		if warm is not index:
+			return "Warm lookup did not return the loaded index"
+
+		# reloading from the persisted cache should rescan nothing
+		reloaded = texturepack_index.texturepack_index(root, cache_dir)
+		if not reloaded.load():
+			return "Failed to load persisted index"
+		reloaded.refresh()
+		if reloaded.rescanned != 0:
+			return "Unchanged pack rescanned {} dirs".format(reloaded.rescanned)
+
+		block_dir = os.path.join(root, "block")
+		open(os.path.join(block_dir, "sand.png"), 'w').close()
+		mtime = os.stat(block_dir).st_mtime + 1  # in case of coarse timestamps
+		os.utime(block_dir, (mtime, mtime))
+		reloaded.refresh()
+		if reloaded.rescanned != 1:
+			return "Expected one dir rescanned, got {}".format(reloaded.rescanned)
+		if not reloaded.find("sand"):
+			return "New file not picked up after rescan"
+		texturepack_index.clear_indexes()
+
+	def prep_materials_plan(self):
+		"""Tests the planning phase of material prep, on plain data only"""
+		from MCprep.materials import canon_index
+		from MCprep.materials import prep_engine
+		from MCprep.materials import texturepack_index
+		from MCprep.util import nameGeneralize
+
+		json_data = {"blocks": {
+			"block_mapping_mc": {"stone": "stone"},
+			"block_mapping_jmc": {"lava_still": "lava_still"},
+			"block_mapping_mineways": {},
+			"emit": ["lava_still"],
+			"solid": ["stone"]}}
+		resolver = canon_index.canonical_resolver(json_data, nameGeneralize)
+		matcher = canon_index.block_list_matcher(json_data)
+
+		pack = tempfile.mkdtemp()
+		root = os.path.join(pack, "textures")
+		os.makedirs(os.path.join(root, "block"))
+		for relpath in ["block/stone.png", "block/lava_still.png",
+				"block/lava_still.png.mcmeta"]:
+			open(os.path.join(root, *relpath.split("/")), 'w').close()
+		texturepack_index.clear_indexes()
+		index = texturepack_index.get_index(pack)
+
+		missing = prep_engine.image_info("stone.png",
+			os.path.join(pack, "nowhere", "stone.png"), has_size=True)
+		packed = prep_engine.image_info("lava_still.png",
+			os.path.join(pack, "nowhere", "lava_still.png"),
+			has_size=True, is_packed=True)
+		infos = [
+			prep_engine.material_info("stone.001", passes={"diffuse": missing}),
+			prep_engine.material_info("lava_still", passes={"diffuse": packed}),
+			prep_engine.material_info("linked", is_linked=True)]
+		plans = prep_engine.plan_materials(
+			infos, resolver, matcher, index=index, animate=True)
+		texturepack_index.clear_indexes()
+
+		if [plan.skip for plan in plans] != [False, False, True]:
+			return "Linked material not skipped"
+		if plans[0].canon != "stone" or plans[1].block_lists != {"emit"}:
+			return "Wrong canon or lists: {}, {}".format(
+				plans[0].canon, plans[1].block_lists)
+		if plans[0].replacements != {
+				"diffuse": os.path.join(root, "block", "stone.png")}:
+			return "Missing image not planned to replace: "+str(
+				plans[0].replacements)
+		if plans[1].replacements:
+			return "Packed image should not be replaced"
+		if [plan.animate for plan in plans] != [False, True, False]:
+			return "Wrong animate plan: "+str([plan.animate for plan in plans])
+
+	def meshswap_util(self, mat_name, **kwargs):
 		"""Run meshswap on the first object with found mat_name"""
 		if mat_name not in bpy.data.materials:
 			return "Not a material: "+mat_name
@@ -826,10 +1280,196 @@ class mcprep_testing():
 		from MCprep.util import select_set
 		bpy.ops.object.select_all(action='DESELECT')
 		select_set(obj, True)
-		res = bpy.ops.mcprep.meshswap()
+		res = bpy.ops.mcprep.meshswap(**kwargs)
 		if res != {'FINISHED'}:
 			return "Meshswap returned cancelled for "+mat_name
 
+	def meshswap_face_table(self):
+		"""Checks the bulk face table of meshswap, outside of any object"""
+		from MCprep.spawner import meshswap_engine
+
+		centers = [0.5, 0, 0, 1.5, 0, 0, 2.5, 0, 0]
+		normals = [0, 0, 1, 0, 0, 1, 1, 0, 0]
+		areas = [1, 0.0155, 0.25] # the middle one is torch like, skipped
+		matrix = [[1, 0, 0, 10], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]
+		table = meshswap_engine.build_face_table(
+			centers, normals, areas, matrix, offset=0.5)
+
+		if len(table) != 2:
+			return "Expected 2 faces after torch filter, got "+str(len(table))
+		local = [tuple(float(val) for val in row) for row in table.local]
+		world = [tuple(float(val) for val in row) for row in table.world]
+		normal = [tuple(float(val) for val in row) for row in table.normals]
+		if local != [(1.0, 0.5, 0.5), (3.0, 0.5, 0.5)]:
+			return "Wrong local centers: "+str(local)
+		if world != [(11.0, 0.5, 0.5), (13.0, 0.5, 0.5)]:
+			return "Wrong global centers: "+str(world)
+		if normal != [(0.0, 0.0, 1.0), (1.0, 0.0, 0.0)]:
+			return "Wrong normals: "+str(normal)
+
+	def meshswap_placements(self):
+		"""Checks batch block placement against the face by face reference"""
+		import random
+		from MCprep.spawner import meshswap_engine
+
+		# two faces of one block, and one face on the boundary of two blocks
+		table = meshswap_engine.build_face_table(
+			[0.1, 0, 0, -0.1, 0.2, 0, 2, 0.5, 0], [0, 1, 0, 0, 1, 0, 0, 1, 0],
+			[1, 1, 1])
+		res = [tuple(int(val) for val in row) for row in
+			meshswap_engine.plan_placements(table, {}, "jmc2obj", "grass")]
+		if res != [(0, 0, 0, 0), (2, 0, 0, 0)]:
+			return "Wrong placements: "+str(res)
+		res = [tuple(int(val) for val in row) for row in
+			meshswap_engine.plan_placements(table, {"edgeFloat": True}, "jmc2obj", "vine")]
+		if res != [(0, 0, 0, 8), (2, 1, 0, 5)]:
+			return "Wrong edge float placements: "+str(res)
+
+		# random faces on and off block boundaries, compare both code paths
+		rand = random.Random(0)
+		centers = []
+		normals = []
+		for _ in range(2000):
+			center = [rand.randint(-10, 10) + rand.uniform(-0.45, 0.45) for _ in range(3)]
+			normal = [0, 0, 0]
+			axis = rand.randrange(3)
+			if rand.random() < 0.5:
+				normal[axis] = rand.choice([-1, 1])
+				center[axis] = round(center[axis]) + 0.5*normal[axis]
+			else:
+				normal[1] = 1
+			centers += center
+			normals += normal
+		table = meshswap_engine.build_face_table(
+			centers, normals, [1]*2000, offset=0.5)
+		for props in [{}, {"edgeFloat": True}, {"torchlike": True}, {"doorlike": True}]:
+			for name in ["grass", "Sunflower"]:
+				vectorized = meshswap_engine.plan_placements(
+					table, props, "Mineways", name)
+				reference = meshswap_engine.plan_placements(
+					table, props, "Mineways", name, vectorized=False)
+				vectorized = [tuple(int(val) for val in row) for row in vectorized]
+				reference = [tuple(int(val) for val in row) for row in reference]
+				if vectorized != reference:
+					return "Placements differ from reference for {} {}".format(
+						name, props)
+
+	def meshswap_manifest(self):
+		"""Checks the persisted meshswap library manifest and its staleness"""
+		from MCprep.spawner import meshswap_manifest
+
+		folder = tempfile.mkdtemp()
+		try:
+			library = os.path.join(folder, "library.blend")
+			with open(library, 'wb') as fd:
+				fd.write(b"BLENDER-v279 fake content")
+			cache_dir = os.path.join(folder, "cache")
+
+			meshswap_manifest.clear_manifests()
+			manifest = meshswap_manifest.get_manifest(library, cache_dir)
+			if manifest.hash is not None:
+				return "Manifest should start empty"
+			manifest.set_contents(
+				{"torch": {"torchlike": 1}, "chest": {}},
+				{"chest": {}, "grass": {"variance": 1}},
+				{"entity/chest/normal": "chest", "missing_block": "other"})
+			if not manifest.save():
+				return "Failed to save manifest"
+			if "chest" in manifest.objects:
+				return "Group names should take priority over objects"
+			if manifest.lookup("entity/chest/normal") != ("group", "chest", {}):
+				return "Alias lookup failed: "+str(manifest.lookup("entity/chest/normal"))
+			if manifest.lookup("grass") != ("object", "grass", {"variance": 1}):
+				return "Object lookup failed"
+			if manifest.lookup("missing_block") is not None:
+				return "Alias to missing block should not resolve"
+
+			# touched but unchanged file is still current, via the hash
+			meshswap_manifest.clear_manifests()
+			stat = os.stat(library)
+			os.utime(library, (stat.st_atime, stat.st_mtime + 10))
+			manifest = meshswap_manifest.get_manifest(library, cache_dir)
+			if manifest.lookup("torch") != ("group", "torch", {"torchlike": 1}):
+				return "Touched library should keep its manifest"
+
+			# changed content invalidates it
+			with open(library, 'ab') as fd:
+				fd.write(b" more")
+			meshswap_manifest.clear_manifests()
+			manifest = meshswap_manifest.get_manifest(library, cache_dir)
+			if manifest.hash is not None or manifest.groups:
+				return "Changed library should need re-reading"
+		finally:
+			meshswap_manifest.clear_manifests()
+			shutil.rmtree(folder)
+
+	def bulk_append(self):
+		"""Checks appending several datablocks from one library load"""
+		from MCprep import util
+		self._clear_scene()
+		path = bpy.path.abspath(bpy.context.scene.meshswap_path)
+		pre_objs = set(bpy.data.objects)
+
+		loaded = util.bulk_append(path, {
+			"collections": ["torch", "fire", "not_a_block"]})
+		names = sorted(coll.name for coll in loaded["collections"])
+		if names != ["fire", "torch"]:
+			return "Wrong collections loaded: "+str(names)
+		added = set(bpy.data.objects) - pre_objs
+		if not added:
+			return "No objects added with the collections"
+		for obj in added:
+			if util.bv28() and not obj.users_collection:
+				return "Appended object not in scene: "+obj.name
+			elif not util.bv28() and not obj.users_scene:
+				return "Appended object not in scene: "+obj.name
+
+		# appending again returns the new, renamed datablocks
+		loaded = util.bulk_append(path, {"collections": ["torch"]})
+		if not loaded["collections"] or loaded["collections"][0].name == "torch":
+			return "Second append should return the renamed new collection"
+
+		# linking leaves the group's objects to be instanced by the caller
+		self._clear_scene()
+		pre_objs = set(bpy.data.objects)
+		loaded = util.bulk_append(path, {"collections": ["fire"]}, link=True)
+		if not loaded["collections"] or loaded["loose_objects"]:
+			return "Linked group objects should not be made loose: {}".format(
+				loaded["loose_objects"])
+		for obj in set(bpy.data.objects) - pre_objs:
+			if obj.name in bpy.context.scene.objects:
+				return "Linked group object put in the scene: "+obj.name
+
+	def meshswap_merge_arrays(self):
+		"""Checks merging transformed mesh copies into one set of arrays"""
+		from MCprep.spawner import meshswap_engine
+
+		# a quad and a triangle, copied rotated and scaled, then as is
+		base = meshswap_engine.mesh_arrays(
+			[0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0.5],
+			[0, 1, 1, 2, 2, 3, 3, 0], [0, 1, 2, 3, 0, 2, 3], [0, 4], [4, 3],
+			[0, 1], [True, False])
+		base.uvs["UVMap"] = [0.1*ind for ind in range(14)]
+		transforms = [
+			([[0, -1, 0], [1, 0, 0], [0, 0, 2]], [(1, 2, 3), (4, 5, 6)]),
+			([[1, 0, 0], [0, 1, 0], [0, 0, 1]], [(-1, 0, 0)])]
+		res = meshswap_engine.merge_instances(base, transforms, origin=(1, 1, 1))
+
+		if res.vertex_count != 12 or res.polygon_count != 6:
+			return "Wrong merged counts: {} verts, {} faces".format(
+				res.vertex_count, res.polygon_count)
+		co = [round(float(val), 4) for val in res.co]
+		if co[:6] != [0, 1, 2, 0, 2, 2] or co[-3:] != [-2, 0, -0.5]:
+			return "Wrong merged coordinates: "+str(co)
+		if [int(val) for val in res.loop_verts[7:11]] != [4, 5, 6, 7]:
+			return "Loop vertices not shifted per copy"
+		if [int(val) for val in res.loop_starts] != [0, 4, 7, 11, 14, 18]:
+			return "Wrong merged loop starts"
+		if [int(val) for val in res.material_indices] != [0, 1]*3:
+			return "Wrong merged material indices"
+		if len(res.uvs["UVMap"]) != 42:
+			return "Uvs not copied per instance"
+
 	def meshswap_spawner(self):
 		"""Tests direct meshswap spawning"""
 		self._clear_scene()
@@ -943,6 +1583,109 @@ class mcprep_testing():
 		if errors:
 			return "Meshswap failed: "+", ".join(errors)
 
+	def meshswap_instancing(self):
+		"""Tests meshswapping into point cloud instancers"""
+		self._clear_scene()
+		self._import_jmc2obj_full()
+		self._set_exporter('jmc2obj')
+
+		errors = []
+		for mat_name in ["torch", "sapling_oak"]: # group and object swaps
+			pre_objs = set(bpy.data.objects)
+			try:
+				res = self.meshswap_util(mat_name, use_dupliverts=True)
+			except Exception as err:
+				res = str(err)[:15].replace("\n", "")
+			if res:
+				errors.append(mat_name+":"+res)
+				continue
+			clouds = [ob for ob in set(bpy.data.objects)-pre_objs
+				if "MCprep_instancer" in ob]
+			if not clouds:
+				errors.append(mat_name+": no instancer objects")
+				continue
+			for cloud in clouds:
+				if not cloud.children:
+					errors.append(mat_name+": nothing instanced on "+cloud.name)
+				elif not cloud.data.vertices:
+					errors.append(mat_name+": no points on "+cloud.name)
+		if errors:
+			return "Meshswap instancing failed: "+", ".join(errors)
+
+	def meshswap_shared_data(self):
+		"""Tests meshswapping into linked duplicates sharing one mesh"""
+		self._clear_scene()
+		self._import_jmc2obj_full()
+		self._set_exporter('jmc2obj')
+
+		pre_objs = set(bpy.data.objects)
+		res = self.meshswap_util(
+			"sapling_oak", share_mesh_data=True, meshswap_join=False)
+		if res:
+			return res
+		new_objs = [ob for ob in set(bpy.data.objects)-pre_objs
+			if ob.type == 'MESH']
+		if len(new_objs) < 2:
+			return "Expected several swapped saplings, got "+str(len(new_objs))
+		meshes = set(ob.data for ob in new_objs)
+		if len(meshes) != 1:
+			return "Swapped blocks should share one mesh, got "+str(len(meshes))
+
+	def meshswap_merged(self):
+		"""Tests joined meshswap blocks built directly as one mesh"""
+		self._clear_scene()
+		self._import_jmc2obj_full()
+		self._set_exporter('jmc2obj')
+
+		pre_objs = set(bpy.data.objects)
+		res = self.meshswap_util("sapling_oak", meshswap_join=True)
+		if res:
+			return res
+		new_objs = [ob for ob in set(bpy.data.objects)-pre_objs
+			if ob.type == 'MESH']
+		if len(new_objs) != 1:
+			return "Expected one merged object, got "+str(len(new_objs))
+		if not new_objs[0].data.polygons:
+			return "Merged object has no faces"
+		if not new_objs[0].material_slots:
+			return "Merged object has no materials"
+
+	def meshswap_budget(self):
+		"""Tests stopping meshswap at an instance budget, and timing report"""
+		from MCprep.spawner import meshswap
+		from MCprep.util import select_set
+		self._clear_scene()
+		self._import_jmc2obj_full()
+		self._set_exporter('jmc2obj')
+
+		mat = bpy.data.materials.get("sapling_oak")
+		if not mat:
+			return "Missing sapling_oak material"
+		obj = [ob for ob in bpy.data.objects
+			if any(slot.material == mat for slot in ob.material_slots)][0]
+		bpy.ops.object.select_all(action='DESELECT')
+		select_set(obj, True)
+		pre_objs = set(bpy.data.objects)
+		res = bpy.ops.mcprep.meshswap(instance_budget=1)
+		if res != {'CANCELLED'}:
+			return "Should stop before swapping more than the budget"
+		if [ob for ob in set(bpy.data.objects)-pre_objs if ob.type == 'MESH'
+				and "MCprep_noSwap" in ob]:
+			return "Blocks left behind after stopping at the budget"
+		report = meshswap.last_timing_report
+		if not report or report["objects"]:
+			return "Expected empty timing report rows, got "+str(report)
+
+		res = self.meshswap_util("sapling_oak")
+		if res:
+			return res
+		report = meshswap.last_timing_report
+		if len(report["objects"]) != 1 or report["objects"][0]["placements"] < 2:
+			return "Wrong timing report rows: "+str(report["objects"])
+		for key in ("init", "loop_prep", "face_process", "instancing", "cleanup"):
+			if report[key] < 0 or report[key] > report["total"]:
+				return "Bad {} timing: {}".format(key, report[key])
+
 	def meshswap_mineways_separated(self):
 		"""Tests jmc2obj meshswapping"""
 		self._clear_scene()
@@ -1064,6 +1807,244 @@ class mcprep_testing():
 		# test that it is caching as expected.. by setting a false
 		# value for cache flag and seeing it's returning the property value
 
+	def grayscale_image_cache(self):
+		"""Checks batch grayscale detection and its on-disk cache"""
+		from MCprep.materials import generate
+		from MCprep.materials import image_stats
+
+		folder = tempfile.mkdtemp()
+		images = {}
+		for name, color in [("gray", (0.5, 0.5, 0.5, 1)), ("red", (1, 0, 0, 1))]:
+			img = bpy.data.images.new(name, 16, 16, alpha=True)
+			img.pixels[:] = color * (16 * 16)
+			img.filepath_raw = os.path.join(folder, name+".png")
+			img.file_format = 'PNG'
+			img.save()
+			img.reload()
+			images[name] = img
+
+		mats = []
+		for name in images:
+			mat = bpy.data.materials.new(name)
+			mat.use_nodes = True
+			node = mat.node_tree.nodes.new("ShaderNodeTexImage")
+			node.image = images[name]
+			mats.append(mat)
+
+		cache = image_stats.image_stats_cache(folder)
+		image_stats._caches[generate.util.get_cache_dir("images")] = cache
+		try:
+			res = generate.classify_grayscale_images(mats)
+			if res != {"gray": True, "red": False}:
+				return "Wrong batch classification: "+str(res)
+			if not os.path.isfile(cache.cache_file()):
+				return "Grayscale results not saved to disk"
+
+			# a fresh session reads results from disk, without the pixels
+			image_stats.clear_caches()
+			reloaded = image_stats.image_stats_cache(folder)
+			path = images["red"].filepath_raw
+			if reloaded.get(path, image_stats.file_key(path), "grayscale") is not False:
+				return "Cached result not found for unchanged file"
+
+			# once the file changes, the cached result no longer applies
+			mtime = os.path.getmtime(path)
+			os.utime(path, (mtime+10, mtime+10))
+			if reloaded.get(path, image_stats.file_key(path), "grayscale") is not None:
+				return "Cached result used for a changed file"
+		finally:
+			image_stats.clear_caches()
+			for mat in mats:
+				bpy.data.materials.remove(mat)
+
+	def sequence_export(self):
+		"""Checks tiled images export to matching PNG frame files"""
+		from MCprep.materials import sequences
+
+		folder = tempfile.mkdtemp()
+		width = 4
+		colors = [(1, 0, 0, 1), (0, 1, 0, 1), (0, 0, 1, 0.5)]
+		img = bpy.data.images.new("seq_tiles", width, width*len(colors), alpha=True)
+		pixels = []
+		for color in reversed(colors):  # bottom rows are the last frame
+			pixels += list(color) * (width * width)
+		img.pixels[:] = pixels
+		img.filepath_raw = os.path.join(folder, "seq_tiles.png")
+		img.file_format = 'PNG'
+		img.save()
+		bpy.data.images.remove(img)
+
+		out = os.path.join(folder, "frames")
+		frames = sequences.export_image_to_sequence(
+			os.path.join(folder, "seq_tiles.png"), {}, out)
+		if not frames or os.path.basename(frames[0]) != "seq_tiles_0001.png":
+			return "Wrong first frame: "+str(frames)
+		files = sorted(os.listdir(out))
+		if files != ["seq_tiles_000{}.png".format(i+1) for i in range(3)]:
+			return "Wrong frame files: "+str(files)
+		for ind, color in enumerate(colors):
+			frame = bpy.data.images.load(os.path.join(out, files[ind]))
+			if tuple(frame.size) != (width, width):
+				return "Wrong frame size: "+str(tuple(frame.size))
+			got = frame.pixels[0:4]
+			bpy.data.images.remove(frame)
+			if any(abs(got[i] - color[i]) > 0.01 for i in range(4)):
+				return "Frame {} has color {}, expected {}".format(ind, got, color)
+
+	def sequence_frame_cache(self):
+		"""Checks frames are exported once into the shared cache and linked"""
+		from MCprep.materials import frame_cache
+		from MCprep.materials import sequences
+
+		folder = tempfile.mkdtemp()
+		img = bpy.data.images.new("cache_tiles", 4, 8, alpha=True)
+		img.filepath_raw = os.path.join(folder, "cache_tiles.png")
+		img.file_format = 'PNG'
+		img.save()
+		bpy.data.images.remove(img)
+		source = os.path.join(folder, "cache_tiles.png")
+
+		cache = frame_cache.frame_cache(os.path.join(folder, "cache"))
+		os.mkdir(cache.cache_dir)
+		frame_cache._caches[sequences.util.get_cache_dir("frames")] = cache
+		try:
+			with open(source + ".mcmeta", 'w') as fd:
+				json.dump({"animation": {"frametime": 2}}, fd)
+			key = frame_cache.cache_key(source, {"frametime": 2})
+			projects = [os.path.join(folder, name) for name in ("one", "two")]
+			for project in projects:
+				os.mkdir(project)
+				# sequences go next to the source path, in each project
+				jobs, err = sequences.plan_material_sequence(
+					os.path.join(project, "cache_tiles.png"), source, None,
+					"original", False)
+				if err or len(jobs) != 1 or jobs[0]["key"] != key:
+					return "Unexpected sequence plan: {} {}".format(jobs, err)
+				sequences.export_sequence_jobs(jobs)
+				first = jobs[0]["first_tile"]
+				if not first or not os.path.isfile(first):
+					return "Frames not exported to "+project
+			if list(cache.entries) != [key]:
+				return "Expected one cached animation, got "+str(list(cache.entries))
+			# two tiles, each shown for two ticks, but linked once
+			seq_paths = [os.path.join(project, "cache_tiles") for project in projects]
+			if frame_cache.sequence_files(seq_paths[1], "cache_tiles") != [
+					"cache_tiles_0001.png", "cache_tiles_0002.png"]:
+				return "Wrong frames linked into project"
+			if len(os.listdir(cache.entry_dir(key))) != 2:
+				return "Repeated frames written to the cache more than once"
+
+			# the timing is played by keying the image user's offset
+			mat = bpy.data.materials.new("cache_tiles")
+			mat.use_nodes = True
+			node = mat.node_tree.nodes.new("ShaderNodeTexImage")
+			sequences.set_sequence_to_texnode(node, first, [0, 0, 1, 1], 20)
+			keys = sequences.generate.get_offset_keyframes(node)
+			bpy.data.materials.remove(mat)
+			if keys != [(1.0, 0.0), (3.0, 1.0), (5.0, 0.0)]:
+				return "Wrong frame offset keyframes: "+str(keys)
+
+			# frames in a project are outdated once the source changes
+			stamp = frame_cache.read_stamp(seq_paths[0], "cache_tiles")
+			if not stamp or stamp["key"] != key or stamp["ticks"] != [0, 0, 1, 1]:
+				return "Stamp of exported frames not current"
+			with open(source, 'ab') as fd:
+				fd.write(b"changed")
+			if frame_cache.cache_key(source, {"frametime": 2}) == key:
+				return "Cache key did not change with the source"
+		finally:
+			frame_cache.clear_caches()
+
+	def sequence_mcmeta_timing(self):
+		"""Checks mcmeta frames, frametime and interpolation are followed"""
+		from MCprep.materials import sequence_frames
+
+		animation = {"frametime": 2, "interpolate": True,
+			"frames": [0, {"index": 1, "time": 3}, 0, 5]}
+		plan = sequence_frames.frame_plan(animation, 2)
+		if plan != [(0, 2), (1, 3), (0, 2)]:
+			return "Wrong frame plan: "+str(plan)
+		ticks = sequence_frames.animation_frames(animation, 2)
+		expected = [(0,), (0, 1, 1, 2), (1,), (1, 0, 1, 3), (1, 0, 2, 3),
+			(0,), (0,)]  # no blend towards the same tile
+		if ticks != expected:
+			return "Wrong tick frames: "+str(ticks)
+		distinct, indices = sequence_frames.tick_indices(ticks)
+		if len(distinct) != 5 or indices != [0, 1, 2, 3, 4, 0, 0]:
+			return "Wrong distinct frames per tick: "+str(indices)
+		keys = sequence_frames.offset_keyframes([0, 0, 1, 1, 1, 0], 40)
+		if keys != [(1, 0), (5, 1), (11, 0), (13, 0)]:
+			return "Wrong offset keyframes at 40fps: "+str(keys)
+
+		folder = tempfile.mkdtemp()
+		width = 2
+		pixels = [0.0] * (width * width * 4) + [1.0] * (width * width * 4)
+		paths = sequence_frames.export_frames(
+			pixels, width, width*2, 4, folder, "lantern", ticks)
+		if len(paths) != len(ticks):
+			return "Expected a frame path per tick"
+		if len(os.listdir(folder)) != 5:
+			return "Repeated frames not written once: "+str(os.listdir(folder))
+		blended = sequence_frames.blend_frames(
+			sequence_frames.frame_slices(pixels, width, 2, 4), [(0, 1, 1, 3)])
+		# tile 0 is the top of the image, i.e. the end of the pixels
+		if abs(blended[(0, 1, 1, 3)][0] - 2.0/3) > 0.001:
+			return "Wrong interpolated value: "+str(blended[(0, 1, 1, 3)][0])
+
+	def sequence_parallel_export(self):
+		"""Checks planned sequences export shared sources once, in parallel"""
+		from MCprep.materials import frame_cache
+		from MCprep.materials import sequences
+
+		folder = tempfile.mkdtemp()
+		sources = []
+		for name, height in [("water", 12), ("lava", 8), ("flat", 6)]:
+			img = bpy.data.images.new(name, 4, height, alpha=True)
+			img.filepath_raw = os.path.join(folder, name+".png")
+			img.file_format = 'PNG'
+			img.save()
+			bpy.data.images.remove(img)
+			sources.append(os.path.join(folder, name+".png"))
+
+		cache = frame_cache.frame_cache(os.path.join(folder, "cache"))
+		os.mkdir(cache.cache_dir)
+		frame_cache._caches[sequences.util.get_cache_dir("frames")] = cache
+		try:
+			jobs = []
+			# two materials using the same water, e.g. in different folders
+			for source, project in [(sources[0], "one"), (sources[0], "two"),
+					(sources[1], "one"), (sources[2], "one")]:
+				seq_path = os.path.join(folder, project, os.path.basename(source)[:-4])
+				os.makedirs(seq_path)
+				jobs.append({
+					"pass": "diffuse",
+					"passfile": source,
+					"pass_name": os.path.basename(source)[:-4],
+					"seq_path": seq_path,
+					"animation": {},
+					"key": frame_cache.cache_key(source, {}),
+					"stamp": None,
+					"fps": 20,
+					"first_tile": None})
+
+			written, hits = sequences.export_sequence_jobs(jobs, threads=2)
+			if written != 3 + 2:  # the water's 3 and lava's 2 frames
+				return "Expected 5 frames written, got {}".format(written)
+			if hits != 1:
+				return "Expected the shared water as a hit, got {}".format(hits)
+			if not all(job["first_tile"] for job in jobs[:3]) or jobs[3]["first_tile"]:
+				return "Wrong first tiles: "+str([job["first_tile"] for job in jobs])
+
+			# planning again finds all frames in the cache
+			for job in jobs:
+				job["first_tile"] = None
+			written, hits = sequences.export_sequence_jobs(jobs[:3])
+			if written != 0 or hits != 3:
+				return "Expected all cache hits, got {} written {} hits".format(
+					written, hits)
+		finally:
+			frame_cache.clear_caches()
+
 	def qa_meshswap_file(self):
 		"""Open the meshswap file, assert there are no relative paths"""
 		blendfile = os.path.join("MCprep_addon", "MCprep_resources", "mcprep_meshSwap.blend")
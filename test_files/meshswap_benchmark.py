@@ -0,0 +1,522 @@
+# ##### MCprep #####
+#
+# Developed by Patrick W. Crawford, see more at
+# http://theduckcow.com/dev/blender/MCprep
+#
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+"""Meshswap benchmark on synthetic jmc2obj and Mineways worlds.
+
+Generates worlds of a given number of faces with ground, tall grass,
+torches, doors and vines, and times swapping them. Results are written to
+a json file, and compared against a stored baseline to flag regressions.
+
+Run with blender, each world swapped in a fresh background blender with
+MCprep installed, timing the meshswap operator:
+
+	python3 test_files/meshswap_benchmark.py --blender /path/to/blender
+
+Run without blender, timing only the array processing of the faces
+(meshswap_engine), e.g. on a headless machine:
+
+	python3 test_files/meshswap_benchmark.py
+
+Other options:
+	--sizes 10000,100000,1000000  number of faces per world
+	--exporters jmc2obj,Mineways
+	--out bench_results.json  results file
+	--baseline test_files/meshswap_baseline.json  to compare against
+	--save-baseline  store these results as the new baseline
+	--tolerance 0.2  relative slowdown of a phase counted as a regression
+"""
+
+import collections
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+	import resource
+except ImportError:
+	resource = None  # windows
+
+BENCH_VERSION = 1
+DEFAULT_SIZES = (10000, 100000, 1000000)
+DEFAULT_EXPORTERS = ("jmc2obj", "Mineways")
+DEFAULT_OUT = "bench_results.json"
+DEFAULT_BASELINE = os.path.join(
+	os.path.dirname(os.path.abspath(__file__)), "meshswap_baseline.json")
+PHASES = ("init", "loop_prep", "face_process", "instancing", "cleanup", "total")
+
+# Phases faster than this are not flagged, as too noisy to compare
+MIN_DELTA = 0.05
+
+# Share of the faces of a world per feature
+FEATURE_SHARES = collections.OrderedDict([
+	("ground", 0.5),
+	("grass", 0.15),
+	("torch", 0.15),
+	("door", 0.1),
+	("vines", 0.1)])
+
+# Material names per exporter and feature, a door being two blocks
+MATERIALS = {
+	"jmc2obj": {
+		"ground": "stone",
+		"grass": "tall_grass",
+		"torch": "torch",
+		"door": "door_wood_bottom",
+		"door_top": "door_wood_top",
+		"vines": "vines"},
+	"Mineways": {
+		"ground": "stone",
+		"grass": "grass",
+		"torch": "torch",
+		"door": "oak_door_bottom",
+		"door_top": "oak_door_top",
+		"vines": "vine"}}
+
+# Swap properties as set in the meshswap library, for engine only runs
+SWAP_PROPS = {
+	"grass": {"variance": 1},
+	"torch": {"torchlike": 1},
+	"door": {"doorlike": 1},
+	"vines": {"edgeFloat": 1}}
+
+ADDON_DIR = os.path.join(
+	os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "MCprep_addon")
+
+
+def _engine():
+	"""Import meshswap_engine straight from the source tree, without bpy."""
+	path = os.path.join(ADDON_DIR, "spawner")
+	if path not in sys.path:
+		sys.path.insert(0, path)
+	import meshswap_engine
+	return meshswap_engine
+
+
+# -----------------------------------------------------------------------------
+# Synthetic worlds
+# -----------------------------------------------------------------------------
+
+
+def _box(x0, x1, y0, y1, z0, z1):
+	"""Quads of an axis aligned box, as lists of four (x, y, z) corners."""
+	return [
+		[(x0, y0, z0), (x0, y1, z0), (x1, y1, z0), (x1, y0, z0)],
+		[(x0, y0, z1), (x1, y0, z1), (x1, y1, z1), (x0, y1, z1)],
+		[(x0, y0, z0), (x1, y0, z0), (x1, y0, z1), (x0, y0, z1)],
+		[(x0, y1, z0), (x0, y1, z1), (x1, y1, z1), (x1, y1, z0)],
+		[(x0, y0, z0), (x0, y0, z1), (x0, y1, z1), (x0, y1, z0)],
+		[(x1, y0, z0), (x1, y1, z0), (x1, y1, z1), (x1, y0, z1)]]
+
+
+def feature_templates():
+	"""Quads of each feature around its block center, blocks being 1 wide.
+
+	Torches are sticks with a top face in the area range meshswap uses to
+	skip torch faces, as exported.
+	"""
+	side = 1.0 / 16
+	return collections.OrderedDict([
+		("ground", _box(-0.5, 0.5, -0.5, 0.5, -0.5, 0.5)),
+		("grass", [
+			[(-0.45, -0.45, -0.5), (0.45, 0.45, -0.5),
+				(0.45, 0.45, 0.5), (-0.45, -0.45, 0.5)],
+			[(-0.45, 0.45, -0.5), (0.45, -0.45, -0.5),
+				(0.45, -0.45, 0.5), (-0.45, 0.45, 0.5)]]),
+		("torch", _box(-side, side, -side, side, -0.5, 0.125)),
+		("door", _box(-0.5, 0.5, -0.5, -0.3125, -0.5, 0.5)),
+		("door_top", _box(-0.5, 0.5, -0.5, -0.3125, -0.5, 0.5)),
+		("vines", [
+			[(-0.45, -0.5, -0.5), (-0.45, 0.5, -0.5),
+				(-0.45, 0.5, 0.5), (-0.45, -0.5, 0.5)]])])
+
+
+def template_arrays(quads):
+	"""mesh_arrays of unconnected quads, edges left to calculate."""
+	engine = _engine()
+	co = [val for quad in quads for corner in quad for val in corner]
+	count = len(quads)
+	return engine.mesh_arrays(
+		co, [], list(range(4 * count)), list(range(0, 4 * count, 4)),
+		[4] * count, [0] * count, [False] * count)
+
+
+def feature_blocks(faces, exporter, seed=0):
+	"""Block centers of each feature of a world with about this many faces.
+
+	Features stand on a layer of ground blocks, on distinct cells of a
+	square grid in random order. Mineways blocks span whole coordinates,
+	jmc2obj blocks are centered on them.
+	"""
+	templates = feature_templates()
+	counts = collections.OrderedDict()
+	for name, share in FEATURE_SHARES.items():
+		per_block = len(templates[name])
+		if name == "door":
+			per_block += len(templates["door_top"])
+		counts[name] = max(int(faces * share / per_block), 1)
+
+	rand = random.Random(seed)
+	features = sum(count for name, count in counts.items() if name != "ground")
+	size = int(math.ceil(math.sqrt(max(features, counts["ground"]))))
+	cells = list(range(size * size))
+	rand.shuffle(cells)
+	shift = 0.5 if exporter == "Mineways" else 0.0
+
+	blocks = collections.OrderedDict()
+	blocks["ground"] = [
+		(cell % size + shift, cell // size + shift, -1 + shift)
+		for cell in range(counts["ground"])]
+	start = 0
+	for name, count in counts.items():
+		if name == "ground":
+			continue
+		centers = [
+			(cell % size + shift, cell // size + shift, shift)
+			for cell in cells[start:start + count]]
+		start += count
+		blocks[name] = centers
+		if name == "door":
+			blocks["door_top"] = [(x, y, z + 1) for x, y, z in centers]
+	return blocks
+
+
+def world_arrays(faces, exporter, seed=0):
+	"""Generate a synthetic world, as mesh_arrays per material name."""
+	engine = _engine()
+	templates = feature_templates()
+	identity = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+	world = collections.OrderedDict()
+	for name, centers in feature_blocks(faces, exporter, seed).items():
+		world[MATERIALS[exporter][name]] = engine.merge_instances(
+			template_arrays(templates[name]), [(identity, centers)])
+	return world
+
+
+def polygon_stats(arrays):
+	"""Flat centers, normals and areas of the quads of mesh_arrays."""
+	co = arrays.co
+	centers = []
+	normals = []
+	areas = []
+	for start in arrays.loop_starts:
+		corners = [arrays.loop_verts[start + ind] for ind in range(4)]
+		pts = [co[3*vert:3*vert+3] for vert in corners]
+		for axis in range(3):
+			centers.append(sum(float(pt[axis]) for pt in pts) / 4.0)
+		edge1 = [float(pts[1][axis]) - float(pts[0][axis]) for axis in range(3)]
+		edge2 = [float(pts[3][axis]) - float(pts[0][axis]) for axis in range(3)]
+		cross = (
+			edge1[1]*edge2[2] - edge1[2]*edge2[1],
+			edge1[2]*edge2[0] - edge1[0]*edge2[2],
+			edge1[0]*edge2[1] - edge1[1]*edge2[0])
+		area = math.sqrt(sum(val*val for val in cross))
+		areas.append(area)
+		normals += [val / area if area else 0.0 for val in cross]
+	return centers, normals, areas
+
+
+# -----------------------------------------------------------------------------
+# Benchmark cases
+# -----------------------------------------------------------------------------
+
+
+def peak_memory_mb():
+	"""Peak resident memory of this process so far, or None if unknown."""
+	if resource is None:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == "darwin":
+		return peak / 1024.0**2  # bytes
+	return peak / 1024.0  # kilobytes
+
+
+def run_engine_case(faces, exporter, seed=0):
+	"""Time only the face processing and instancing arrays of meshswap.
+
+	The face stats blender would provide are computed before timing, so
+	loop_prep stays zero and total is the sum of the engine phases only.
+	Peak memory is the python side peak during the case (tracemalloc).
+	"""
+	engine = _engine()
+	world = world_arrays(faces, exporter, seed)
+	templates = feature_templates()
+	features = {MATERIALS[exporter][name]: name for name in SWAP_PROPS}
+	offset = engine.placement_offset(exporter)
+	stats = collections.OrderedDict(
+		(material, polygon_stats(arrays)) for material, arrays in world.items()
+		if material in features)
+
+	tracemalloc.start()
+	timings = collections.OrderedDict((phase, 0.0) for phase in PHASES)
+	placed = 0
+	for material, (centers, normals, areas) in stats.items():
+		feature = features[material]
+		t1 = time.time()
+		table = engine.build_face_table(centers, normals, areas,
+			offset=0.5 if exporter == "Mineways" else 0.0)
+		placements = engine.plan_placements(
+			table, SWAP_PROPS[feature], exporter, material)
+		t2 = time.time()
+		clouds = engine.instance_points(
+			placements, offset, variance=[True, 1] if feature == "grass" else None)
+		transforms = [([[1, 0, 0], [0, 1, 0], [0, 0, 1]], points)
+			for points in clouds.values()]
+		engine.merge_instances(template_arrays(templates[feature]), transforms)
+		t3 = time.time()
+		timings["face_process"] += t2 - t1
+		timings["instancing"] += t3 - t2
+		placed += len(placements)
+	timings["total"] = timings["face_process"] + timings["instancing"]
+	peak = tracemalloc.get_traced_memory()[1] / 1024.0**2
+	tracemalloc.stop()
+
+	return collections.OrderedDict([
+		("mode", "engine"),
+		("exporter", exporter),
+		("faces", sum(arrays.polygon_count for arrays in world.values())),
+		("placements", placed),
+		("timings", timings),
+		("peak_memory_mb", peak),
+		("datablocks", None)])
+
+
+def _datablock_counts():
+	import bpy
+	return collections.OrderedDict(
+		(attr, len(getattr(bpy.data, attr)))
+		for attr in ("objects", "meshes", "materials", "collections", "groups")
+		if hasattr(bpy.data, attr))
+
+
+def run_blender_case(faces, exporter, seed=0):
+	"""Build the world in blender, and time the meshswap operator on it.
+
+	Must run within a background blender with MCprep installed.
+	"""
+	import bpy
+	import importlib
+
+	if hasattr(bpy.ops, "preferences") and "addon_enable" in dir(bpy.ops.preferences):
+		bpy.ops.preferences.addon_enable(module="MCprep_addon")
+	else:
+		bpy.ops.wm.addon_enable(module="MCprep_addon")
+	meshswap = importlib.import_module("MCprep_addon.spawner.meshswap")
+	util = importlib.import_module("MCprep_addon.util")
+
+	context = bpy.context
+	prefs = util.get_user_preferences(context)
+	prefs.MCprep_exporter_type = exporter
+
+	# one object per material, as a separated world import
+	for obj in list(context.scene.objects):
+		util.obj_unlink_remove(obj, True, context)
+	world = world_arrays(faces, exporter, seed)
+	for material, arrays in world.items():
+		mesh = bpy.data.meshes.new(material)
+		meshswap.write_mesh_arrays(mesh, arrays)
+		mesh.materials.append(bpy.data.materials.new(material))
+		obj = bpy.data.objects.new(material, mesh)
+		util.obj_link_scene(obj, context)
+		util.select_set(obj, True)
+	util.set_active_object(context, obj)
+	pre_counts = _datablock_counts()
+
+	tstart = time.time()
+	res = bpy.ops.mcprep.meshswap()
+	wall = time.time() - tstart
+	report = meshswap.last_timing_report or {}
+
+	timings = collections.OrderedDict(
+		(phase, report.get(phase, 0.0)) for phase in PHASES)
+	timings["wall"] = wall
+	return collections.OrderedDict([
+		("mode", "blender"),
+		("blender", ".".join(str(val) for val in bpy.app.version)),
+		("exporter", exporter),
+		("faces", sum(arrays.polygon_count for arrays in world.values())),
+		("placements", sum(row["placements"] or 0
+			for row in report.get("objects", []))),
+		("result", sorted(res)),
+		("timings", timings),
+		("peak_memory_mb", peak_memory_mb()),
+		("datablocks", collections.OrderedDict([
+			("before", pre_counts),
+			("after", _datablock_counts())]))])
+
+
+def run_in_blender(blender, faces, exporter, seed=0):
+	"""Run one case in a fresh background blender, returning its results."""
+	fd, case_out = tempfile.mkstemp(suffix=".json")
+	os.close(fd)
+	try:
+		cmd = [blender, "-b", "-y", "-P", os.path.abspath(__file__), "--",
+			"--run-case", exporter, str(faces), str(seed), case_out]
+		subprocess.check_call(cmd)
+		with open(case_out, 'r') as fd:
+			return json.load(fd, object_pairs_hook=collections.OrderedDict)
+	finally:
+		os.remove(case_out)
+
+
+# -----------------------------------------------------------------------------
+# Results and baseline
+# -----------------------------------------------------------------------------
+
+
+def case_key(case):
+	return "{}/{}/{}".format(case["mode"], case["exporter"], case["faces"])
+
+
+def compare(results, baseline, tolerance=0.2, min_delta=MIN_DELTA):
+	"""List phases of cases slower than in the baseline.
+
+	A phase regresses if slower by more than tolerance (relative), and by
+	more than min_delta seconds.
+	"""
+	previous = {case_key(case): case for case in baseline.get("cases", [])}
+	regressions = []
+	for case in results["cases"]:
+		base = previous.get(case_key(case))
+		if not base:
+			continue
+		for phase, value in case["timings"].items():
+			old = base["timings"].get(phase)
+			if old is None:
+				continue
+			if value - old > min_delta and value > old * (1 + tolerance):
+				regressions.append("{} {}: {:.3f}s, baseline {:.3f}s".format(
+					case_key(case), phase, value, old))
+	return regressions
+
+
+def write_json(path, data):
+	"""Write json atomically, replacing any old file."""
+	tmp_path = path + ".tmp"
+	with open(tmp_path, 'w') as fd:
+		json.dump(data, fd, indent=1)
+	os.replace(tmp_path, path)
+
+
+def print_results(results):
+	print("{:<30} {:>10} {:>8} {:>8} {:>8} {:>8} {:>9}".format(
+		"case", "placed", "faces_s", "inst_s", "clean_s", "total_s", "peak_mb"))
+	for case in results["cases"]:
+		timings = case["timings"]
+		peak = case.get("peak_memory_mb")
+		print("{:<30} {:>10} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.3f} {:>9}".format(
+			case_key(case), case["placements"], timings["face_process"],
+			timings["instancing"], timings["cleanup"], timings["total"],
+			"-" if peak is None else round(peak, 1)))
+
+
+def parse_args(args):
+	opts = {
+		"blender": None,
+		"sizes": DEFAULT_SIZES,
+		"exporters": DEFAULT_EXPORTERS,
+		"out": DEFAULT_OUT,
+		"baseline": DEFAULT_BASELINE,
+		"save_baseline": False,
+		"tolerance": 0.2,
+		"seed": 0}
+	ind = 0
+	while ind < len(args):
+		arg = args[ind]
+		if arg == "--save-baseline":
+			opts["save_baseline"] = True
+		elif arg == "--blender":
+			ind += 1
+			opts["blender"] = args[ind]
+		elif arg == "--sizes":
+			ind += 1
+			opts["sizes"] = [int(val) for val in args[ind].split(",")]
+		elif arg == "--exporters":
+			ind += 1
+			opts["exporters"] = args[ind].split(",")
+		elif arg in ("--out", "--baseline"):
+			ind += 1
+			opts[arg[2:]] = args[ind]
+		elif arg == "--tolerance":
+			ind += 1
+			opts["tolerance"] = float(args[ind])
+		elif arg == "--seed":
+			ind += 1
+			opts["seed"] = int(args[ind])
+		else:
+			raise ValueError("Unknown argument: "+arg)
+		ind += 1
+	return opts
+
+
+def main(args):
+	if "--run-case" in args:
+		# within blender, as launched by run_in_blender
+		ind = args.index("--run-case")
+		exporter, faces, seed, case_out = args[ind+1:ind+5]
+		write_json(case_out, run_blender_case(int(faces), exporter, int(seed)))
+		return 0
+
+	opts = parse_args(args)
+	results = collections.OrderedDict([
+		("version", BENCH_VERSION),
+		("time", time.strftime("%Y-%m-%d %H:%M:%S")),
+		("cases", [])])
+	for exporter in opts["exporters"]:
+		for faces in opts["sizes"]:
+			print("Benchmarking {} world of {} faces".format(exporter, faces))
+			if opts["blender"]:
+				case = run_in_blender(opts["blender"], faces, exporter, opts["seed"])
+			else:
+				case = run_engine_case(faces, exporter, opts["seed"])
+			results["cases"].append(case)
+
+	write_json(opts["out"], results)
+	print_results(results)
+	print("Results written to "+opts["out"])
+
+	if opts["save_baseline"]:
+		write_json(opts["baseline"], results)
+		print("Saved as baseline: "+opts["baseline"])
+		return 0
+	if not os.path.isfile(opts["baseline"]):
+		print("No baseline to compare against, see --save-baseline")
+		return 0
+	with open(opts["baseline"], 'r') as fd:
+		baseline = json.load(fd)
+	regressions = compare(results, baseline, opts["tolerance"])
+	for line in regressions:
+		print("REGRESSION "+line)
+	if not regressions:
+		print("No regressions against the baseline")
+	return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+	argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+	sys.exit(main(argv))